@@ -1,6 +1,7 @@
-import requests
+FIRECRAWL_TIMEOUT = 60
 
-def firecrawl_get(url_str):
+def firecrawl_get(url_str, timeout=FIRECRAWL_TIMEOUT):
+    import requests
     api_url = f"http://llmstxt.firecrawl.dev/{url_str}"
-    response = requests.get(api_url)
+    response = requests.get(api_url, timeout=timeout)
     return response.text
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""
+Batch llms.txt generation for many sites.
+
+Each site runs as a one-shot job on a dedicated CrawlScheduler, so at most `concurrency`
+crawls run at once, at most `per_domain` per registered domain (per host for IPs and
+localhost) and the in-flight memory estimate stays within budget; batch time is set by
+those limits, not by the sum of the crawls. Every site's result is appended to a JSONL
+file as soon as it finishes, and a batch restarted on the same file skips the sites
+that already succeeded.
+
+Sites are given as URLs or as objects with the per-site options of /generate:
+{"url", "id", "avoidSubstrings", "maxPages", "useLLM", "llmInstructions", "useSitemap"}.
+
+    python -m app.batch sites.txt --output results.jsonl --concurrency 8 --per-domain 1
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from urllib.parse import urlparse
+from app.domains import registered_domain
+from app.scheduler import CrawlScheduler, estimate_crawl_memory, CRAWL_MEMORY_BUDGET_BYTES
+from app.url_rules import validate_rules, ALLOW_REGEX_RULES
+
+BATCH_DIR = os.environ.get(
+    'LLMS_BATCH_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'batches'),
+)
+BATCH_CONCURRENCY = 8
+BATCH_PER_DOMAIN = 1
+MAX_BATCH_CONCURRENCY = 64
+DEFAULT_MAX_PAGES = 20
+
+def site_key(url):
+    """Key for the per-domain limit: the registered domain, or the host for IPs and localhost."""
+    netloc = urlparse(url).netloc.lower()
+    return registered_domain(netloc) or netloc
+
+def normalize_site(spec):
+    """Turn a URL or an options object into the settings create_llms needs."""
+    if isinstance(spec, str):
+        spec = {'url': spec}
+    url = (spec.get('url') or '').strip()
+    if not url:
+        raise ValueError(f'site without a url: {spec!r}')
+    avoid = spec.get('avoidSubstrings') or []
+    if isinstance(avoid, str):
+        avoid = [line.strip() for line in avoid.split('\n') if line.strip()]
+    validate_rules(avoid, allow_regex=ALLOW_REGEX_RULES)
+    return {
+        'id': str(spec.get('id') or url),
+        'url': url,
+        'avoid': avoid,
+        'max_pages': int(spec.get('maxPages') or DEFAULT_MAX_PAGES),
+        'use_llm': bool(spec.get('useLLM', False)),
+        'llm_instructions': spec.get('llmInstructions') or '',
+        'discovery': 'sitemap' if spec.get('useSitemap') else 'links',
+    }
+
+def load_sites(path):
+    """Read sites from a file: one URL or one JSON object per line; blank lines and # comments are skipped."""
+    sites = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            sites.append(json.loads(line) if line.startswith('{') else line)
+    return sites
+
+def completed_ids(output_path):
+    """Ids of the sites an earlier run of the batch finished successfully."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; that site is run again
+                continue
+            if record.get('status') == 'ok':
+                done.add(record['id'])
+    return done
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+class BatchRunner:
+    def __init__(self, sites, output_path, concurrency=BATCH_CONCURRENCY, per_domain=BATCH_PER_DOMAIN,
+                 memory_budget_bytes=CRAWL_MEMORY_BUDGET_BYTES, resume=True, on_result=None):
+        self.sites = []
+        seen = set()
+        for spec in sites:
+            site = normalize_site(spec)
+            if site['id'] not in seen:
+                seen.add(site['id'])
+                self.sites.append(site)
+        self.output_path = output_path
+        self.concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+        self.per_domain = max(1, per_domain)
+        self.memory_budget_bytes = memory_budget_bytes
+        self.resume = resume
+        self.on_result = on_result
+        self.counts = {'ok': 0, 'error': 0}
+        self._remaining = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._output = None
+
+    def run(self):
+        """Run every site not already done; returns a summary of the batch."""
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        done = completed_ids(self.output_path) if self.resume else set()
+        pending = [site for site in self.sites if site['id'] not in done]
+        print(f"Batch of {len(self.sites)} sites: {len(self.sites) - len(pending)} already done, {len(pending)} to run "
+              f"({self.concurrency} at a time, {self.per_domain} per domain)")
+        self._remaining = len(pending)
+        scheduler = CrawlScheduler(max_workers=self.concurrency, max_per_domain=self.per_domain,
+                                   memory_budget_bytes=self.memory_budget_bytes,
+                                   name=f"batch-{os.path.splitext(os.path.basename(self.output_path))[0]}")
+        with open(self.output_path, 'a' if self.resume else 'w', encoding='utf-8') as self._output:
+            if self._output.tell() and not _ends_with_newline(self.output_path):
+                # Finish a line cut short by a crash so the next record starts on its own line
+                self._output.write('\n')
+            scheduler.start()
+            try:
+                for index, site in enumerate(pending):
+                    scheduler.add_job(f"batch-site-{index}", partial(self._run_site, site), None,
+                                      domain=site_key(site['url']), memory_estimate=estimate_crawl_memory(site['max_pages']))
+                with self._cond:
+                    self._cond.wait_for(lambda: self._remaining == 0)
+            finally:
+                scheduler.shutdown()
+        return {'total': len(self.sites), 'skipped': len(self.sites) - len(pending), 'ok': self.counts['ok'],
+                'errors': self.counts['error'], 'elapsed_seconds': round(time.perf_counter() - start, 3)}
+
+    def _run_site(self, site):
+        from app.crawler import create_llms
+        start = time.perf_counter()
+        record = {'id': site['id'], 'url': site['url']}
+        try:
+            markdown, markdown_llm, new_url_hashmap, _, _ = create_llms(
+                site['url'], site['avoid'], site['use_llm'], site['llm_instructions'], max_pages=site['max_pages'],
+                discovery=site['discovery'])
+            record.update(status='ok', pages=len(new_url_hashmap), llms_txt=markdown, llms_txt_llm=markdown_llm)
+        except Exception as e:
+            print(f"Error generating llms.txt for {site['url']} in batch: {e}")
+            record.update(status='error', error=str(e))
+        record['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+        record['finished_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            self._write(record)
+            if self.on_result is not None:
+                self.on_result(record)
+        finally:
+            with self._cond:
+                self.counts[record['status']] += 1
+                self._remaining -= 1
+                self._cond.notify_all()
+
+    def _write(self, record):
+        line = json.dumps(record) + '\n'
+        with self._write_lock:
+            self._output.write(line)
+            self._output.flush()
+            os.fsync(self._output.fileno())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sites', help='file with one URL or JSON object of site options per line')
+    parser.add_argument('--output', required=True, help='JSONL file results are appended to')
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY, help='sites crawled at once')
+    parser.add_argument('--per-domain', type=int, default=BATCH_PER_DOMAIN, help='sites of one registered domain crawled at once')
+    parser.add_argument('--no-resume', action='store_true', help='start over instead of skipping sites already done')
+    args = parser.parse_args()
+    runner = BatchRunner(load_sites(args.sites), args.output, args.concurrency, args.per_domain, resume=not args.no_resume)
+    print(json.dumps(runner.run()))
+
+if __name__ == '__main__':
+    main()
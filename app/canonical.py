@@ -0,0 +1,56 @@
+"""
+URL canonicalization for crawl de-duplication.
+
+url_key() maps the many spellings of one page to a single key: scheme, `www.`,
+default ports, letter case of the host, dot segments, repeated or trailing slashes,
+index files, percent-encoded unreserved characters and default-locale prefixes
+(/en/docs is /docs) are all normalized away. Keys are only used to decide whether a
+page was already seen; pages are still fetched and reported under the URL they were
+discovered with.
+"""
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+URL_KEY_CACHE_SIZE = 1 << 16
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+INDEX_FILES = ('index.html', 'index.htm', 'index.php')
+# Locale prefixes that sites serve as aliases of their unprefixed default-language pages
+DEFAULT_LOCALE_PREFIXES = {'en', 'en-us'}
+
+UNRESERVED_ESCAPE_RE = re.compile(r'%(2[dD]|2[eE]|5[fF]|7[eE]|3[0-9]|[46][1-9a-fA-F]|[57][0-9aA])')
+
+def _unescape_unreserved(path):
+    return UNRESERVED_ESCAPE_RE.sub(lambda match: chr(int(match.group(1), 16)), path)
+
+def _normalize_path(path):
+    segments = []
+    for segment in _unescape_unreserved(path).split('/'):
+        if segment in ('', '.'):
+            continue
+        if segment == '..':
+            if segments:
+                segments.pop()
+            continue
+        segments.append(segment)
+    if segments and segments[-1].lower() in INDEX_FILES:
+        segments.pop()
+    if segments and segments[0].lower() in DEFAULT_LOCALE_PREFIXES:
+        segments.pop(0)
+    return '/' + '/'.join(segments)
+
+@lru_cache(maxsize=URL_KEY_CACHE_SIZE)
+def url_key(url):
+    """Return the canonical key of a URL (host and path only; scheme and query are ignored)."""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{port}"
+    return host + _normalize_path(parts.path)
@@ -0,0 +1,73 @@
+"""
+Precompressed response bodies with strong ETags.
+
+Results are compressed once when they are stored, not on every request: gzip always,
+brotli too when the optional `brotli` package is installed. negotiate() picks the best
+stored encoding for a request's Accept-Encoding header.
+"""
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+def strong_etag(data):
+    """Entity tag of a body's bytes (without quotes)."""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+def precompress(data):
+    """Return the encoded variants of data: {'gzip': bytes, 'br': bytes or None}."""
+    return {
+        # mtime=0 keeps the gzip bytes, and so their ETag, stable for the same body
+        'gzip': gzip.compress(data, GZIP_LEVEL, mtime=0),
+        'br': brotli.compress(data, quality=BROTLI_QUALITY) if brotli is not None else None,
+    }
+
+def _accepted(accept_encoding):
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+def negotiate(accept_encoding, available):
+    """Choose 'br', 'gzip' or None (identity) from the encodings available for a body."""
+    accepted = _accepted(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in ('br', 'gzip'):
+        if available.get(coding) is None:
+            continue
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def etag_matches(if_none_match, etags):
+    """True if an If-None-Match header matches any of the given entity tags (weak comparison)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag.strip('"') in etags:
+            return True
+    return False
@@ -0,0 +1,179 @@
+"""
+Scheduled runs shared by every process using the same task database.
+
+One process at a time holds the scheduler lease (a row of the `leases` table with an
+expiry, renewed on every tick) and is the leader: it turns each task that is due into a
+pending run. Every process running a Coordinator claims pending runs as it has free crawl
+workers and runs them on its CrawlScheduler, which keeps its per-process worker and
+memory limits; at most one claimed run per domain exists across all processes. Runs are
+created and claimed up to one poll ahead of their due time and started by the
+CrawlScheduler at that time, so polling does not delay them.
+
+Claims are leases too. Their holder renews them while the crawls run and, when a run
+ends, marks it done and moves its task to the next due time in the same transaction.
+A process that dies stops renewing: its runs are claimed again by another once their
+leases expire, and another process takes over as leader once the scheduler lease does.
+Each claim increments the run's attempt number, and a run is only marked done by the
+attempt that holds it, so every scheduled run is recorded done exactly once; a run
+whose process died mid-crawl is crawled again from the start.
+
+Work on a task outside its schedule (a rebuild) claims a run of the task too, through
+claim_task_run: the claim is refused while a run of the task is claimed, and scheduled
+runs of the task are not claimed until it is finished, so the two never overlap. Such a
+claim is not run again if its process dies; it just stops blocking once its lease expires.
+
+SQLite leases work across the processes of one machine, or across machines only when the
+database is on storage with working file locks.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from functools import partial
+from app import metrics
+
+LEASE_SECONDS = float(os.environ.get('LLMS_LEASE_SECONDS', 15))
+POLL_SECONDS = 1.0
+SCHEDULER_LEASE = 'scheduler'
+# How long finished runs are kept in task_runs
+RUN_HISTORY_SECONDS = 24 * 60 * 60
+
+def new_worker_id():
+    """Unique id of this process: host, pid and a random suffix (pids are reused)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class Coordinator:
+    """Leader election and run claiming for one process; runs are executed by run_task(task_id)."""
+    def __init__(self, store, scheduler, run_task, worker_id=None, lease_seconds=LEASE_SECONDS, poll_seconds=POLL_SECONDS):
+        self.store = store
+        # The process's started CrawlScheduler; claimed runs are one-shot jobs on it
+        self.scheduler = scheduler
+        # run_task(task_id) runs the task and returns its next interval in seconds, or None if it no longer exists
+        self.run_task = run_task
+        self.worker_id = worker_id or new_worker_id()
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.is_leader = False
+        self._held = {}   # run_id -> claimed run not finished yet
+        self._lock = threading.Lock()
+        self._claiming = True
+        self._stopped = False
+        self._last_prune = 0.0
+        # Set when a run finishes or on shutdown, to claim or stop without waiting for the next poll
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='coordinator', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop_claiming(self):
+        """Claim no new runs; runs already claimed still run and their leases are still renewed."""
+        self._claiming = False
+
+    def shutdown(self):
+        """Stop, give up the scheduler lease and hand back the runs claimed but not started."""
+        self._claiming = False
+        self._stopped = True
+        self._wake.set()
+        if self._thread.ident is not None:
+            self._thread.join()
+        if self.is_leader:
+            self.store.release_lease(SCHEDULER_LEASE, self.worker_id)
+            self.is_leader = False
+            metrics.SCHEDULER_LEADER.set(0)
+        self.store.release_runs(self.worker_id)
+
+    def held_runs(self):
+        with self._lock:
+            return len(self._held)
+
+    def _loop(self):
+        while not self._stopped:
+            self._wake.clear()
+            try:
+                self._tick(time.time())
+            except Exception as e:
+                print(f"Coordinator tick failed: {e}")
+            self._wake.wait(self.poll_seconds)
+
+    def _tick(self, now):
+        was_leader = self.is_leader
+        self.is_leader = self.store.acquire_lease(SCHEDULER_LEASE, self.worker_id, self.lease_seconds, now)
+        if self.is_leader != was_leader:
+            print(f"{'Became' if self.is_leader else 'No longer'} the scheduler leader: {self.worker_id}")
+            metrics.SCHEDULER_LEADER.set(1 if self.is_leader else 0)
+        if self.is_leader:
+            self.store.enqueue_due_runs(now + self.poll_seconds)
+            if now - self._last_prune > RUN_HISTORY_SECONDS / 24:
+                self.store.prune_runs(now - RUN_HISTORY_SECONDS)
+                self._last_prune = now
+        held = self.held_runs()
+        if held:
+            self.store.renew_run_leases(self.worker_id, now + self.lease_seconds)
+        while self._claiming and held < self.scheduler.max_workers:
+            run = self.store.claim_run(self.worker_id, now, self.lease_seconds, now + self.poll_seconds)
+            if run is None:
+                break
+            with self._lock:
+                self._held[run['run_id']] = run
+            held += 1
+            metrics.add(metrics.TASK_RUNS, 1, 'claimed')
+            # Started at its due time; the scheduler's lag covers any wait for a claim
+            self.scheduler.add_job(f"run_{run['run_id']}", partial(self._execute, run), None, domain=run['domain'],
+                                   memory_estimate=run['memory_estimate'], first_run=run['due_at'])
+
+    def _execute(self, run):
+        started = time.time()
+        interval = None
+        try:
+            interval = self.run_task(run['task_id'])
+        finally:
+            # Missed runs are coalesced: a run that overran its interval is followed at once
+            next_due = None if interval is None else max(started + interval, time.time())
+            try:
+                done = self.store.finish_run(run, self.worker_id, started, next_due)
+            finally:
+                with self._lock:
+                    self._held.pop(run['run_id'], None)
+                self._wake.set()
+            if done:
+                metrics.add(metrics.TASK_RUNS, 1, 'done')
+            elif interval is not None:
+                metrics.add(metrics.TASK_RUNS, 1, 'lost')
+                print(f"Run {run['run_id']} not recorded: its claim expired and was taken over, or its task was deleted")
+
+class TaskRunClaim:
+    """A run of one task claimed outside its schedule; its lease is renewed by a thread until finish()."""
+    def __init__(self, store, run, worker_id, lease_seconds=LEASE_SECONDS):
+        self.store = store
+        self.run = run
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.started = time.time()
+        self._finished = threading.Event()
+        self._thread = threading.Thread(target=self._renew, name='run-lease', daemon=True)
+        self._thread.start()
+
+    @property
+    def task_id(self):
+        return self.run['task_id']
+
+    def _renew(self):
+        while not self._finished.wait(self.lease_seconds / 3):
+            try:
+                self.store.renew_run_leases(self.worker_id, time.time() + self.lease_seconds)
+            except Exception as e:
+                print(f"Renewing the lease of run {self.run['run_id']} failed: {e}")
+
+    def finish(self):
+        """Record the run done, which lets the task's scheduled runs go ahead; returns False if its claim was lost."""
+        self._finished.set()
+        self._thread.join()
+        return self.store.finish_run(self.run, self.worker_id, self.started)
+
+def claim_task_run(store, task_id, kind, lease_seconds=LEASE_SECONDS):
+    """Claim a run of kind for task_id now; returns its TaskRunClaim, or None if a run of the task is claimed already."""
+    worker_id = new_worker_id()
+    run = store.claim_task_run(task_id, kind, worker_id, time.time(), lease_seconds)
+    return TaskRunClaim(store, run, worker_id, lease_seconds) if run is not None else None
@@ -1,25 +1,83 @@
-import requests
+import asyncio
+import httpx
+# httpx imports its anyio backend on first use; concurrent first crawls on several threads would
+# import it at the same time and can see it partially initialized, so it is imported with this module
+try:
+    import anyio._backends._asyncio  # noqa: F401
+except ImportError:
+    pass
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import tldextract
 import hashlib
-import re
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import multiprocessing
+import os
+import threading
+import time
 import math
-from typing import List
 from datetime import datetime, date, timedelta
-from openai import OpenAI
+from app.fingerprint import fingerprint_text
+from app.fast_extract import extract_fast
+from app.domains import DomainFilter, registered_domain
+from app.url_rules import compile_avoid_rules
+from app.sitemap import discover_sitemap_urls
+from app.canonical import url_key
+from app.minhash import minhash, near_duplicate, MinHashIndex
+from app.llm_cache import get_llm_cache, llm_cache_key
+from app.llm_chunks import split_llms, chunk_sections, merge_refined, estimate_tokens
+from app.snapshots import get_snapshot_store
+from app.full_text import PageTextSpool, save_llms_full
+from app.revisit import is_due, observe, new_history
+from app import metrics
 
 MAX_PAGES = 20
 MAX_DEPTH = 5
+MAX_CONCURRENCY = 32
+MAX_CONCURRENCY_PER_HOST = 16
+REQUEST_TIMEOUT = 5
+# 'soup' builds a BeautifulSoup tree per page; 'fast' streams the bytes through lxml without one
+EXTRACTION_MODE = 'soup'
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+# 'links' follows <a> links breadth-first; 'sitemap' crawls the URLs listed in robots.txt/sitemap.xml
+DISCOVERY_MODE = 'links'
+# Upper bound of the default number of parse processes per server process
+MAX_DEFAULT_PARSE_WORKERS = 4
+
+def default_parse_workers():
+    """
+    Parse processes for one server process: its share of the cores among the WEB_CONCURRENCY
+    server processes (gunicorn's worker count setting), at most MAX_DEFAULT_PARSE_WORKERS.
+    0, when there are more server processes than cores, parses inline.
+    """
+    server_processes = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+    return min(MAX_DEFAULT_PARSE_WORKERS, (os.cpu_count() or 1) // server_processes)
+
+# Processes for the parse/hash stage, shared by every crawl in this process; 0 parses inline
+PARSE_WORKERS = int(os.environ.get('LLMS_PARSE_WORKERS', default_parse_workers()))
+LLM_MODEL = "gpt-4o"
+LLM_CHUNK_TOKENS = 2500
+LLM_MAX_WORKERS = 8
+CHUNK_INSTRUCTIONS = """
+        This is one part of a larger llms.txt. The title and description are given for context only:
+        return just the improved ## sections of this part, without the # title or > description.
+        """
 
 class PageNode:
+    """
+    One crawled (or discovered) page. Nodes use __slots__ and leaves share an empty
+    tuple until their first child, so large trees cost little more than their strings.
+    """
+    __slots__ = ('url', 'title', 'description', 'index', 'children', 'content_hash')
+
     def __init__(self, url, index):
         self.url = url
         self.title = None
         self.description = ""
         self.index = index
-        self.children: List[PageNode] = []
+        self.children = ()
         self.content_hash = None
 
     def update(self, title, description):
@@ -27,137 +85,99 @@ class PageNode:
         self.description = description
 
     def add_child(self, child_node):
-        self.children.append(child_node)
+        if self.children:
+            self.children.append(child_node)
+        else:
+            self.children = [child_node]
 
-    def print_tree(self):
-        printed_tree=''
+    def iter_tree(self):
+        """Yield the outline of the crawled tree one line at a time (depth-first)."""
         node_stack = [(self, 0)]  # (node, indent_level)
         while node_stack:
             node, indent = node_stack.pop()
             prefix = "**" * indent
-            printed_tree += (f"{prefix}- {node.url} -- {node.title}\n")
-            # printed_tree += (f"{prefix}  Title: {node.title}")
-            # printed_tree += (f"{prefix}  Index: {node.index}")
-            # printed_tree += (f"{prefix}  Description: {node.description}")
-
+            yield f"{prefix}- {node.url} -- {node.title}\n"
             for child in node.children:
                 if child.title is not None:
                     node_stack.append((child, indent + 1))
-        return printed_tree
-    
-    def print_tree_as_markdown(self):
-        printed_tree=''
-        printed_tree+=(f"# {self.title}\n")
-        printed_tree+=(f"> {self.description}\n")
+
+    def print_tree(self):
+        return ''.join(self.iter_tree())
+
+    def iter_markdown(self):
+        """Yield the llms.txt markdown in chunks: the header, then one chunk per section."""
+        yield self.markdown_header()
         for child in self.children:
             if child.title is not None:
-                printed_tree+=(f"## {child.title}\n")
-                printed_tree+=(f"- [{child.title}]({child.url}): {child.description}\n")
-                for grandkid in child.children:
-                    if grandkid.title is not None:
-                        printed_tree+=(f"- [{grandkid.title}]({grandkid.url}): {grandkid.description}\n")
+                yield child.markdown_section()
 
-        return printed_tree
+    def write_markdown(self, sink):
+        """Stream the llms.txt markdown to a file-like sink without building the whole string."""
+        for chunk in self.iter_markdown():
+            sink.write(chunk)
+
+    def print_tree_as_markdown(self):
+        return ''.join(self.iter_markdown())
+
+    def markdown_header(self):
+        return f"# {self.title}\n> {self.description}\n"
+
+    def markdown_section(self):
+        """Render this node as a `##` section listing itself and its crawled children."""
+        lines = [f"## {self.title}\n", f"- [{self.title}]({self.url}): {self.description}\n"]
+        for grandkid in self.children:
+            if grandkid.title is not None:
+                lines.append(f"- [{grandkid.title}]({grandkid.url}): {grandkid.description}\n")
+        return ''.join(lines)
+
+    def section_signature(self):
+        """
+        Identify the pages that markdown_section renders, with their content and the title and
+        description it shows: the content hash leaves out <meta>, where descriptions come from.
+        """
+        members = [self] + [child for child in self.children if child.title is not None]
+        return generate_content_hash('\n'.join(repr((member.url, member.content_hash, member.title, member.description))
+                                               for member in members))
+
+class ChangeSet:
+    """
+    Per-URL differences between two crawls; truthy when anything was added, removed or modified.
+    A page whose content hash changed but whose title and description did not, and whose
+    MinHash signature is a near-duplicate of the previous one (a small volatile diff), is not modified.
+    """
+    def __init__(self, added=None, removed=None, modified=None):
+        self.added = added or []
+        self.removed = removed or []
+        self.modified = modified or []
+
+    @classmethod
+    def between(cls, prev_url_hashmap, new_url_hashmap):
+        prev_url_hashmap = prev_url_hashmap or {}
+        added, modified = [], []
+        for url, entry in new_url_hashmap.items():
+            if url not in prev_url_hashmap:
+                added.append(url)
+            elif page_hash(prev_url_hashmap[url]) != page_hash(entry) and not near_unchanged(prev_url_hashmap[url], entry):
+                modified.append(url)
+        removed = [url for url in prev_url_hashmap if url not in new_url_hashmap]
+        return cls(added, removed, modified)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+    def to_dict(self):
+        return {'added': self.added, 'removed': self.removed, 'modified': self.modified}
 
 import hashlib
-import re
 from bs4 import BeautifulSoup
 
 def clean_html_for_hashing(soup, debug=False):
     """
     Clean HTML content by removing dynamic/volatile elements before hashing.
     Returns cleaned HTML string ready for hashing.
+    Works in a single walk over the existing parse tree (see app/fingerprint.py).
     """
-    # Make a copy to avoid modifying the original
-    cleaned_soup = BeautifulSoup(str(soup), 'html.parser')
-    
-    # Remove script and style tags entirely
-    for tag in cleaned_soup(['script', 'style', 'noscript']):
-        tag.decompose()
-    
-    # Remove meta tags (often contain timestamps, cache info, etc.)
-    for tag in cleaned_soup.find_all('meta'):
-        tag.decompose()
-    
-    # Remove common dynamic elements - expanded list
-    dynamic_selectors = [
-        # Time-based elements
-        '[data-timestamp]', '[data-time]', '[data-date]',
-        '.timestamp', '.date-updated', '.last-modified', '.time',
-        
-        # Session and tracking
-        '[data-session]', '[data-csrf]', '[data-token]', '[data-nonce]',
-        '.csrf-token', '[name="csrf-token"]', '[name="_token"]',
-        
-        # Analytics and ads
-        '[data-ga]', '[data-gtm]', '[data-analytics]', '[data-track]',
-        '.google-ads', '.advertisement', '.ad-banner', '.tracking-pixel',
-        '[data-ad]', '.ads', '.adsense',
-        
-        # Social media widgets
-        '.facebook-like', '.twitter-tweet', '.instagram-media',
-        '.social-widget', '[data-social]',
-        
-        # Comments and dynamic content
-        '#comments', '.comments-section', '.disqus-thread',
-        '.comment-count', '.comment-form',
-        
-        # Live counters and stats
-        '.view-count', '.visitor-count', '.online-users',
-        '.counter', '.stat-number', '[data-count]',
-        
-        # Forms with dynamic tokens
-        'input[name="csrf-token"]', 'input[name="_token"]',
-        'input[type="hidden"][name*="token"]',
-        
-        # Random/dynamic IDs
-        '[id*="random"]', '[id*="temp"]', '[class*="random"]',
-        '[class*="temp"]', '[data-random]'
-    ]
-    
-    # Remove elements matching dynamic selectors
-    for selector in dynamic_selectors:
-        for element in cleaned_soup.select(selector):
-            element.decompose()
-    
-    # Remove ALL attributes except the most essential ones
-    # This is aggressive but eliminates most dynamic content
-    keep_attrs = {'href', 'src', 'alt', 'title'}  # Only keep truly content-related attributes
-    
-    for tag in cleaned_soup.find_all():
-        attrs_to_remove = []
-        for attr in tag.attrs:
-            if attr not in keep_attrs:
-                attrs_to_remove.append(attr)
-        
-        for attr in attrs_to_remove:
-            del tag.attrs[attr]
-    
-    # Remove form elements entirely (they often have dynamic tokens)
-    for tag in cleaned_soup(['form', 'input', 'textarea', 'select', 'button']):
-        tag.decompose()
-    
-    # Get the cleaned HTML text
-    html_text = str(cleaned_soup)
-    
-    # More aggressive text normalization
-    # Remove all newlines and normalize whitespace
-    html_text = re.sub(r'\s+', ' ', html_text)
-    html_text = re.sub(r'>\s+<', '><', html_text)
-    
-    # Remove HTML comments
-    html_text = re.sub(r'<!--.*?-->', '', html_text, flags=re.DOTALL)
-    
-    # Remove common dynamic patterns in text
-    # Remove timestamps, dates, session IDs
-    html_text = re.sub(r'\b\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}[Z\+\-\d:]*\b', '', html_text)  # ISO dates
-    html_text = re.sub(r'\b[a-f0-9]{32,}\b', '', html_text, re.I)  # Long hex strings (hashes, tokens)
-    html_text = re.sub(r'\b[A-Za-z0-9]{20,}\b', '', html_text)  # Long random strings
-    
-    # Strip leading/trailing whitespace
-    html_text = html_text.strip()
-    
-    return html_text
+    return fingerprint_text(soup)
 
 def generate_content_hash(cleaned_html):
     """Generate SHA-256 hash of cleaned HTML content."""
@@ -168,6 +188,7 @@ def debug_content_differences(url):
     Helper function to debug what's changing between requests.
     Run this to see what content is different between two requests.
     """
+    import requests
     
     print("Fetching first version...")
     response1 = requests.get(url, timeout=5)
@@ -233,82 +254,630 @@ def get_description(soup, fallback_text):
 
 
 def is_same_domain(base_url, target_url):
-    base_domain = tldextract.extract(base_url).registered_domain
-    target_domain = tldextract.extract(target_url).registered_domain
+    base_domain = registered_domain(urlparse(base_url).netloc)
+    target_domain = registered_domain(urlparse(target_url).netloc)
     return base_domain == target_domain
 
 def clean_url(url):
     parsed_url = urlparse(url)
     return parsed_url.scheme + "://" + parsed_url.netloc + parsed_url.path
 
-def crawl_site_as_tree(root_url, avoid_substrings, prev_url_hashmap=None, max_pages=MAX_PAGES, max_depth=MAX_DEPTH):
+class HostLimiter:
+    """Caps in-flight requests globally and per host."""
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_concurrency_per_host=MAX_CONCURRENCY_PER_HOST):
+        self.global_semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.host_semaphores = {}
+
+    def for_host(self, url):
+        host = urlparse(url).netloc
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.max_concurrency_per_host)
+        return self.host_semaphores[host]
+
+def page_hash(entry):
+    """Return the content hash of a new_url_hashmap entry (bare hash strings from older maps are accepted)."""
+    if isinstance(entry, dict):
+        return entry.get('content_hash')
+    return entry
+
+def near_unchanged(prev_entry, entry):
+    """True if entry differs from prev_entry only by a small volatile diff in the page body."""
+    if not isinstance(prev_entry, dict) or not isinstance(entry, dict):
+        return False
+    return (prev_entry.get('title') == entry.get('title') and prev_entry.get('description') == entry.get('description')
+            and near_duplicate(prev_entry.get('minhash'), entry.get('minhash')))
+
+class PageDeduplicator:
+    """
+    Recognizes pages already kept in this crawl: by the canonical key of a declared
+    <link rel=canonical>, or as a near-duplicate (same title, similar MinHash signature).
+    """
+    def __init__(self):
+        self.kept_keys = {}
+        # One LSH index per title: near-duplicates must share a title, and templated sites give
+        # every page a similar signature, which would make a single index scan all pages
+        self.indexes = {}
+
+    def duplicate_of(self, url, page):
+        """Return the URL of the kept page this page duplicates, or None."""
+        canonical = page.get('canonical')
+        if canonical:
+            key = url_key(canonical)
+            if key != url_key(url) and key in self.kept_keys:
+                return self.kept_keys[key]
+        index = self.indexes.get(page['title'])
+        if index is not None and page.get('minhash') is not None:
+            for _, other_url in index.candidates(page['minhash']):
+                if other_url != url:
+                    return other_url
+        return None
+
+    def keep(self, url, page):
+        self.kept_keys.setdefault(url_key(url), url)
+        if page.get('canonical'):
+            self.kept_keys.setdefault(url_key(page['canonical']), url)
+        if page.get('minhash') is not None:
+            self.indexes.setdefault(page['title'], MinHashIndex()).add(page['minhash'], url)
+
+def collect_links(hrefs, url):
+    """Resolve hrefs against the page URL, cleaning and de-duplicating them in document order."""
+    links = []
+    seen = set()
+    for href in hrefs:
+        full_url = clean_url(urljoin(url, href))
+        if full_url not in seen:
+            seen.add(full_url)
+            links.append(full_url)
+    return links
+
+# What parse_page extracts; a 304 rebuilds the same fields from the previous entry
+PAGE_KEYS = ('title', 'description', 'content_hash', 'minhash', 'canonical', 'links')
+
+def resolve_canonical(href, url):
+    """Resolve a <link rel=canonical> href against the page URL."""
+    if not href or not href.strip():
+        return None
+    return clean_url(urljoin(url, href.strip()))
+
+def parse_page(body, url, encoding=None, mode=EXTRACTION_MODE, full_text=False, timings=None):
+    """
+    Extract everything the crawl keeps about a page: title, description, content hash,
+    MinHash signature, declared canonical URL and outgoing links (and with full_text,
+    the page's visible text as 'text').
+    With a timings list, the seconds spent parsing and hashing are appended to it.
+    """
+    if mode == 'fast':
+        return parse_page_fast(body, url, encoding, full_text, timings)
+    start = time.perf_counter()
+    soup = BeautifulSoup(body.decode(encoding or 'utf-8', errors='replace'), 'html.parser')
+    title = soup.title.string.strip() if soup.title else "No Title"
+    # The same text as app.full_text.extract_text gives pages replayed from snapshots
+    texts = soup.get_text(separator=' ', strip=True)
+    parsed_at = time.perf_counter()
+    fingerprint = clean_html_for_hashing(soup)
+    content_hash = generate_content_hash(fingerprint)
+    signature = minhash(fingerprint)
+    hashed_at = time.perf_counter()
+    canonical_tag = soup.find('link', rel='canonical', href=True)
+    page = {
+        'title': title,
+        'description': get_description(soup, texts),
+        'content_hash': content_hash,
+        'minhash': signature,
+        'canonical': resolve_canonical(canonical_tag['href'], url) if canonical_tag else None,
+        'links': collect_links((link_tag['href'] for link_tag in soup.find_all('a', href=True)), url),
+    }
+    if full_text:
+        page['text'] = texts
+    if timings is not None:
+        timings.extend((parsed_at - start + time.perf_counter() - hashed_at, hashed_at - parsed_at))
+    return page
+
+def parse_page_fast(body, url, encoding=None, full_text=False, timings=None):
+    """parse_page without a document tree; the description fallback only reads the leading text."""
+    start = time.perf_counter()
+    page = extract_fast(body, encoding, full_text)
+    if page.meta_description and page.meta_description.strip():
+        description = page.meta_description.strip()
+    else:
+        description = get_first_sentence(page.fallback_text())
+    fingerprint = page.fingerprint.text()
+    parsed_at = time.perf_counter()
+    content_hash = generate_content_hash(fingerprint)
+    signature = minhash(fingerprint)
+    hashed_at = time.perf_counter()
+    parsed = {
+        'title': page.title.strip() if page.title is not None else "No Title",
+        'description': description,
+        'content_hash': content_hash,
+        'minhash': signature,
+        'canonical': resolve_canonical(page.canonical, url),
+        'links': collect_links(page.hrefs, url),
+    }
+    if full_text:
+        parsed['text'] = page.text()
+    if timings is not None:
+        timings.extend((parsed_at - start + time.perf_counter() - hashed_at, hashed_at - parsed_at))
+    return parsed
+
+def parse_page_timed(body, url, encoding, mode, full_text=False):
+    """parse_page returning (page, [parse_seconds, hash_seconds]), so pool workers can report their timings."""
+    timings = []
+    return parse_page(body, url, encoding, mode, full_text, timings), timings
+
+def conditional_headers(prev_entry):
+    """Build If-None-Match / If-Modified-Since headers from a previous new_url_hashmap entry."""
+    headers = {}
+    # Only revalidate when the previous entry holds enough data to rebuild the node on a 304
+    if not isinstance(prev_entry, dict) or 'links' not in prev_entry:
+        return headers
+    if prev_entry.get('etag'):
+        headers['If-None-Match'] = prev_entry['etag']
+    if prev_entry.get('last_modified'):
+        headers['If-Modified-Since'] = prev_entry['last_modified']
+    return headers
+
+async def fetch_page(client, limiter, url, prev_entry=None, max_bytes=MAX_PAGE_BYTES):
+    """
+    Stream a page, revalidating against prev_entry when it carries validators.
+    Returns (response, body) for 200 HTML pages with the body capped at max_bytes,
+    (response, None) for a 304, or None if the page is not usable.
+    """
+    headers = conditional_headers(prev_entry)
+    try:
+        async with limiter.for_host(url), limiter.global_semaphore:
+            with metrics.timed('fetch'):
+                async with client.stream('GET', url, headers=headers) as response:
+                    if response.status_code == 304 and headers:
+                        metrics.add(metrics.PAGES, 1, 'not_modified')
+                        return response, None
+                    if response.status_code != 200:
+                        return None
+                    if 'text/html' not in response.headers.get('Content-Type', ''):
+                        return None
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body += chunk
+                        if len(body) >= max_bytes:
+                            del body[max_bytes:]
+                            break
+                    metrics.add(metrics.PAGES, 1, 'fetched')
+                    metrics.add(metrics.DOWNLOADED_BYTES, len(body))
+                    return response, bytes(body)
+    except Exception:
+        return None
+
+_parse_pools = {}
+_parse_pools_lock = threading.Lock()
+
+def get_parse_pool(workers):
+    """Process-wide pool for the parse/hash stage, created on first use and shared by all crawls."""
+    with _parse_pools_lock:
+        pool = _parse_pools.get(workers)
+        if pool is None:
+            # forkserver: children never inherit the app's threads or locks mid-use
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver'))
+            _parse_pools[workers] = pool
+        return pool
+
+@atexit.register
+def shutdown_parse_pools():
+    """Stop the parse processes; they are started again on the next crawl."""
+    with _parse_pools_lock:
+        pools = list(_parse_pools.values())
+        _parse_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _discard_parse_pool(workers, pool):
+    with _parse_pools_lock:
+        if _parse_pools.get(workers) is pool:
+            del _parse_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def parse_in_pool(workers, body, url, encoding, mode, full_text=False):
+    """Run parse_page on raw bytes in the process pool (inline when workers is 0); only the compact result comes back."""
+    if not workers:
+        page, timings = parse_page_timed(body, url, encoding, mode, full_text)
+    else:
+        pool = get_parse_pool(workers)
+        try:
+            page, timings = await asyncio.get_running_loop().run_in_executor(
+                pool, parse_page_timed, body, url, encoding, mode, full_text)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time and parse this page here
+            _discard_parse_pool(workers, pool)
+            page, timings = parse_page_timed(body, url, encoding, mode, full_text)
+    metrics.observe_stage('parse', timings[0])
+    metrics.observe_stage('hash', timings[1])
+    return page
+
+async def fetch_and_parse(client, limiter, url, prev_entry, max_page_bytes, extraction_mode, parse_workers,
+                          snapshot_store=None, full_text=False):
+    """
+    Fetch stage followed by the parse/hash stage for one URL.
+    Returns (response, page), reusing prev_entry's page on a 304, or None if the page is not usable.
+    Fetched bodies are kept in snapshot_store, if given, under their content hash.
+    """
+    fetched = await fetch_page(client, limiter, url, prev_entry, max_page_bytes)
+    if fetched is None:
+        return None
+    response, body = fetched
+    if response.status_code == 304:
+        # Unchanged since the last crawl: skip download, parsing and hashing
+        return response, {key: prev_entry.get(key) for key in PAGE_KEYS}
+    try:
+        page = await parse_in_pool(parse_workers, body, url, response.charset_encoding, extraction_mode, full_text)
+    except Exception:
+        return None
+    if snapshot_store is not None:
+        try:
+            with metrics.timed('snapshot'):
+                await asyncio.to_thread(snapshot_store.put, page['content_hash'], body, response.charset_encoding)
+        except Exception as e:
+            print(f"Could not snapshot {url}: {e}")
+    return response, page
+
+class SnapshotResponse:
+    """
+    Stands in for the HTTP response of a page reused without a request (replayed from the
+    snapshot store, or not due for a revisit), carrying its stored validators.
+    """
+    status_code = 200
+
+    def __init__(self, prev_entry):
+        self.headers = {}
+        if prev_entry.get('etag'):
+            self.headers['ETag'] = prev_entry['etag']
+        if prev_entry.get('last_modified'):
+            self.headers['Last-Modified'] = prev_entry['last_modified']
+
+async def replay_page(snapshot_store, url, prev_entry, extraction_mode, parse_workers, full_text=False):
+    """
+    fetch_and_parse without the network, for a page whose body is in the snapshot store.
+    As on a 304, a previous entry holding every parsed field is reused as is; older entries are
+    re-parsed from the stored body.
+    Returns (SnapshotResponse, page), or None if the page was not crawled before or its body is gone.
+    """
+    if not isinstance(prev_entry, dict) or not prev_entry.get('content_hash'):
+        return None
+    if 'links' in prev_entry:
+        if not snapshot_store.contains(prev_entry['content_hash']):
+            return None
+        metrics.add(metrics.PAGES, 1, 'reused')
+        return SnapshotResponse(prev_entry), {key: prev_entry.get(key) for key in PAGE_KEYS}
+    stored = await asyncio.to_thread(snapshot_store.get, prev_entry['content_hash'])
+    if stored is None:
+        return None
+    metrics.add(metrics.PAGES, 1, 'reused')
+    body, encoding = stored
+    try:
+        return SnapshotResponse(prev_entry), await parse_in_pool(parse_workers, body, url, encoding, extraction_mode, full_text)
+    except Exception:
+        return None
+
+async def reuse_page(prev_entry):
+    """The previous crawl's page, for a URL not yet due for a revisit."""
+    metrics.add(metrics.PAGES, 1, 'reused')
+    return SnapshotResponse(prev_entry), {key: prev_entry.get(key) for key in PAGE_KEYS}
+
+def record_visit(entry, prev_entry, response, now):
+    """
+    Carry prev_entry's change history (see app.revisit) into entry, adding this crawl's visit
+    unless the page was reused without a request.
+    """
+    history = prev_entry.get('revisit') if isinstance(prev_entry, dict) else None
+    if isinstance(response, SnapshotResponse):
+        if history:
+            entry['revisit'] = history
+        return entry
+    if history is None:
+        entry['revisit'] = new_history(now)
+    else:
+        changed = page_hash(prev_entry) != page_hash(entry) and not near_unchanged(prev_entry, entry)
+        entry['revisit'] = observe(history, changed, now)
+    return entry
+
+def build_path_tree(root_node, urls):
+    """
+    Attach a PageNode for each URL under its nearest ancestor by URL path (the root when none),
+    shallowest paths first. Returns the new nodes in that order.
+    """
+    nodes = {root_node.url.rstrip('/'): root_node}
+    created = []
+    for url in sorted(urls, key=lambda url: urlparse(url).path.rstrip('/').count('/')):
+        key = url.rstrip('/')
+        if key in nodes:
+            continue
+        parent = root_node
+        ancestor = key
+        while True:
+            ancestor = ancestor.rsplit('/', 1)[0]
+            if ancestor.endswith(':/') or ancestor.endswith(':'):
+                break
+            if ancestor in nodes:
+                parent = nodes[ancestor]
+                break
+        node = PageNode(url, index=parent.index + 1)
+        parent.add_child(node)
+        nodes[key] = node
+        created.append(node)
+    return created
+
+async def crawl_sitemap(fetch, root_node, sitemap_urls, prev_url_hashmap, max_pages, on_page, deduplicator=None,
+                        full_text_spool=None, crawl_started=None):
+    """
+    Crawl the URLs listed in the site's sitemaps instead of following links, fetching each with
+    fetch(url, prev_entry). Pages whose <lastmod> matches the one stored with their previous entry
+    are reused without any request, and duplicates of kept pages are dropped when a deduplicator is given.
+    """
+    lastmods = dict(sitemap_urls)
+    nodes = [root_node] + build_path_tree(root_node, [url for url, _ in sitemap_urls if url != root_node.url])
+    nodes = nodes[:max_pages]
+    unchanged = []
+
+    async def visit(node):
+        prev_entry = prev_url_hashmap.get(node.url)
+        lastmod = lastmods.get(node.url)
+        if lastmod and isinstance(prev_entry, dict) and 'links' in prev_entry and prev_entry.get('lastmod') == lastmod:
+            unchanged.append(node.url)
+            metrics.add(metrics.PAGES, 1, 'reused')
+            return dict(prev_entry)
+        fetched = await fetch(node.url, prev_entry)
+        if fetched is None:
+            return None
+        response, page = fetched
+        validators = prev_entry if response.status_code == 304 else {}
+        return record_visit(dict(
+            page,
+            etag=response.headers.get('ETag') or validators.get('etag'),
+            last_modified=response.headers.get('Last-Modified') or validators.get('last_modified'),
+            lastmod=lastmod,
+        ), prev_entry, response, crawl_started or time.time())
+
+    new_url_hashmap = {}
+    duplicates = 0
+    entries = await asyncio.gather(*(visit(node) for node in nodes))
+    for node, entry in zip(nodes, entries):
+        if entry is None:
+            continue
+        text = entry.pop('text', None)
+        if deduplicator is not None:
+            if node is not root_node and deduplicator.duplicate_of(node.url, entry):
+                duplicates += 1
+                continue
+            deduplicator.keep(node.url, entry)
+        new_url_hashmap[node.url] = entry
+        if full_text_spool is not None and text is not None:
+            full_text_spool.add(node.url, text)
+        node.content_hash = entry['content_hash']
+        node.update(entry['title'], entry['description'])
+        if on_page is not None:
+            on_page({'url': node.url, 'title': entry['title'], 'description': entry['description'], 'depth': node.index})
+    print(f"{len(new_url_hashmap)} / {len(nodes)} sitemap pages crawled, {len(unchanged)} skipped by unchanged lastmod, "
+          f"{duplicates} duplicates dropped")
+    return new_url_hashmap
+
+def touch_snapshots(snapshot_store, new_url_hashmap):
+    """Keep the stored bodies of every page in a crawl fresh, including pages reused without a download."""
+    if snapshot_store is None:
+        return
+    try:
+        snapshot_store.touch({entry['content_hash'] for entry in new_url_hashmap.values()})
+    except Exception as e:
+        print(f"Could not refresh page snapshots: {e}")
+
+async def crawl_site_as_tree_async(root_url, avoid_substrings, prev_url_hashmap=None, max_pages=MAX_PAGES, max_depth=MAX_DEPTH,
+                                   max_concurrency=MAX_CONCURRENCY, max_concurrency_per_host=MAX_CONCURRENCY_PER_HOST,
+                                   extraction_mode=EXTRACTION_MODE, max_page_bytes=MAX_PAGE_BYTES, on_page=None,
+                                   parse_workers=PARSE_WORKERS, discovery=DISCOVERY_MODE, deduplicate=True,
+                                   snapshot_store=None, offline=False, full_text_spool=None, revisit_bounds=None):
+    """
+    Crawl root_url breadth-first into a PageNode tree.
+    With discovery='sitemap', the pages listed in the site's sitemaps are crawled instead
+    (falling back to following links when there are none).
+    With deduplicate, URLs are only fetched once per canonical key (see app.canonical) and
+    pages duplicating an already kept page (rel=canonical or near-duplicate) are dropped
+    without counting towards max_pages.
+    Pages are parsed and hashed in a pool of parse_workers processes (inline if 0).
+    Page bodies are kept in snapshot_store, if given. With offline, nothing is fetched: the crawl
+    is replayed from the bodies snapshot_store holds for the pages in prev_url_hashmap, and pages
+    without a stored body are skipped.
+    With a full_text_spool, the visible text of every page downloaded or re-parsed is added to it.
+    Each page's entry keeps its change history (see app.revisit). With revisit_bounds, a
+    (min_seconds, max_seconds) pair, previously crawled pages not yet due for a revisit are
+    reused without a request, so volatile pages are fetched more often than stable ones.
+    on_page, if given, is called with {url, title, description, depth} as each page is added.
+    """
+    crawl_started = time.time()
     cleaned_root = clean_url(root_url)
     root_domain = cleaned_root
     visited = set()
     queue = deque()
+    prev_url_hashmap = prev_url_hashmap or {}
 
     root_node = PageNode(cleaned_root, index=0)
     new_url_hashmap = {}
-    anything_changed = False
-    #print("crawling site with prev_url_hashmap: ", prev_url_hashmap is None)
     queue.append((root_node, cleaned_root, 0))
-    visited.add(cleaned_root)
+    # Canonical keys when deduplicating, so http/https, www and trailing-slash spellings are fetched once
+    seen_key = url_key if deduplicate else (lambda url: url)
+    visited.add(seen_key(cleaned_root))
+    deduplicator = PageDeduplicator() if deduplicate else None
+    duplicates = 0
     count = 0
     curr_depth_from_root = 0
+    limiter = HostLimiter(max_concurrency, max_concurrency_per_host)
+    domain_filter = DomainFilter(root_domain)
+    avoid_rules = compile_avoid_rules(avoid_substrings)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    if offline and snapshot_store is None:
+        raise ValueError('an offline crawl needs a snapshot_store to replay from')
 
-    while queue and count < max_pages and curr_depth_from_root < max_depth:
-        current_node, current_url, depth = queue.popleft()
+    # Fetches and parses for the head of the BFS frontier run concurrently, but results
+    # are processed in queue order so the tree matches a sequential crawl.
+    pending = deque()
+    not_due = 0
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, follow_redirects=True, limits=limits) as client:
+        def fetch(url, prev_entry):
+            nonlocal not_due
+            full_text = full_text_spool is not None
+            if offline:
+                return replay_page(snapshot_store, url, prev_entry, extraction_mode, parse_workers, full_text)
+            # The root is always fetched: it is where a site's new pages are found
+            if (revisit_bounds and url != cleaned_root and isinstance(prev_entry, dict) and 'links' in prev_entry
+                    and not is_due(prev_entry.get('revisit'), crawl_started, *revisit_bounds)):
+                not_due += 1
+                return reuse_page(prev_entry)
+            return fetch_and_parse(client, limiter, url, prev_entry, max_page_bytes, extraction_mode, parse_workers,
+                                   snapshot_store, full_text)
 
-        try:
-            response = requests.get(current_url, timeout=5)
-            if response.status_code != 200:
-                continue
-            if 'text/html' not in response.headers.get('Content-Type', ''):
-                continue
-            soup = BeautifulSoup(response.text, 'html.parser')
-        except Exception:
-            continue
+        if discovery == 'sitemap':
+            accept = lambda url: domain_filter.allows(url) and not avoid_rules.matches(clean_url(url))
+            if offline:
+                # The sitemap as it was seen by the previous crawl
+                sitemap_urls = [(url, entry.get('lastmod')) for url, entry in prev_url_hashmap.items()
+                                if isinstance(entry, dict) and 'lastmod' in entry and accept(url)][:max_pages]
+            else:
+                sitemap_urls = await discover_sitemap_urls(client, cleaned_root, max_pages, accept=accept)
+            if sitemap_urls:
+                # One URL per canonical key; the first spelling listed wins
+                by_key = {}
+                for url, lastmod in sitemap_urls:
+                    by_key.setdefault(seen_key(clean_url(url)), (clean_url(url), lastmod))
+                sitemap_urls = list(by_key.values())
+                new_url_hashmap = await crawl_sitemap(fetch, root_node, sitemap_urls, prev_url_hashmap, max_pages, on_page,
+                                                      deduplicator, full_text_spool, crawl_started)
+                if not_due:
+                    print(f"{not_due} pages not due for a revisit reused without a request")
+                touch_snapshots(snapshot_store, new_url_hashmap)
+                return root_node, new_url_hashmap, ChangeSet.between(prev_url_hashmap, new_url_hashmap)
+            print(f"No sitemap found for {cleaned_root}, following links instead")
 
-        title = soup.title.string.strip() if soup.title else "No Title"
-        texts = soup.get_text(separator=' ', strip=True)
-        description = get_description(soup, texts)
-        content_hash = generate_content_hash(clean_html_for_hashing(soup))
-        new_url_hashmap[current_url] = content_hash
-        if prev_url_hashmap and current_url in prev_url_hashmap and prev_url_hashmap[current_url] == content_hash:
-            anything_changed = False
-        else:
-            anything_changed = True
-            # if prev_url_hashmap:
-            #     print("something change in content")
-        current_node.content_hash = content_hash
-
-        current_node.update(title, description)
-        count += 1
-        if count % 10 == 0:
-            print(f"{count} / {max_pages} pages traversed")
-
-        if curr_depth_from_root < max_depth:
-            for link_tag in soup.find_all('a', href=True):
-                href = link_tag['href']
-                full_url = clean_url(urljoin(current_url, href))
-
-                if full_url in visited or not is_same_domain(root_domain, full_url):
-                    continue
+        while (queue or pending) and count < max_pages and curr_depth_from_root < max_depth:
+            while queue and len(pending) < max_pages - count:
+                node, url, depth = queue.popleft()
+                work = asyncio.ensure_future(fetch(url, prev_url_hashmap.get(url)))
+                pending.append((node, url, depth, work))
 
-                if any(substring in full_url for substring in avoid_substrings):
+            current_node, current_url, depth, work = pending.popleft()
+            fetched = await work
+            if fetched is None:
+                continue
+            response, page = fetched
+            text = page.pop('text', None)
+            prev_entry = prev_url_hashmap.get(current_url)
+            if deduplicator is not None:
+                if current_node is not root_node and deduplicator.duplicate_of(current_url, page):
+                    duplicates += 1
                     continue
+                deduplicator.keep(current_url, page)
+                if page.get('canonical'):
+                    visited.add(url_key(page['canonical']))
+
+            # A 304 may omit validators; keep the ones we revalidated with
+            validators = prev_entry if response.status_code == 304 else {}
+            new_url_hashmap[current_url] = record_visit(dict(
+                page,
+                etag=response.headers.get('ETag') or validators.get('etag'),
+                last_modified=response.headers.get('Last-Modified') or validators.get('last_modified'),
+            ), prev_entry, response, crawl_started)
+            if full_text_spool is not None and text is not None:
+                full_text_spool.add(current_url, text)
+            current_node.content_hash = page['content_hash']
+
+            current_node.update(page['title'], page['description'])
+            count += 1
+            if on_page is not None:
+                on_page({'url': current_url, 'title': page['title'], 'description': page['description'], 'depth': depth})
+            if count % 10 == 0:
+                print(f"{count} / {max_pages} pages traversed")
+
+            if curr_depth_from_root < max_depth:
+                for full_url in page['links']:
+                    if seen_key(full_url) in visited or not domain_filter.allows(full_url):
+                        continue
+
+                    if avoid_rules.matches(full_url):
+                        continue
 
-                child_node = PageNode(full_url, index=depth + 1)
-                current_node.add_child(child_node)
-                queue.append((child_node, full_url, depth + 1))
-                visited.add(full_url)
+                    child_node = PageNode(full_url, index=depth + 1)
+                    current_node.add_child(child_node)
+                    queue.append((child_node, full_url, depth + 1))
+                    visited.add(seen_key(full_url))
 
-    return root_node, new_url_hashmap, anything_changed
+    if duplicates:
+        print(f"{duplicates} duplicate pages dropped")
+    if not_due:
+        print(f"{not_due} pages not due for a revisit reused without a request")
+    touch_snapshots(snapshot_store, new_url_hashmap)
+    return root_node, new_url_hashmap, ChangeSet.between(prev_url_hashmap, new_url_hashmap)
+
+def crawl_site_as_tree(root_url, avoid_substrings, prev_url_hashmap=None, max_pages=MAX_PAGES, max_depth=MAX_DEPTH,
+                       max_concurrency=MAX_CONCURRENCY, max_concurrency_per_host=MAX_CONCURRENCY_PER_HOST,
+                       extraction_mode=EXTRACTION_MODE, max_page_bytes=MAX_PAGE_BYTES, on_page=None,
+                       parse_workers=PARSE_WORKERS, discovery=DISCOVERY_MODE, deduplicate=True,
+                       snapshot_store=None, offline=False, full_text_spool=None, revisit_bounds=None):
+    start = time.perf_counter()
+    result = asyncio.run(crawl_site_as_tree_async(root_url, avoid_substrings, prev_url_hashmap, max_pages, max_depth,
+                                                  max_concurrency, max_concurrency_per_host,
+                                                  extraction_mode, max_page_bytes, on_page, parse_workers, discovery,
+                                                  deduplicate, snapshot_store, offline, full_text_spool, revisit_bounds))
+    elapsed = time.perf_counter() - start
+    metrics.observe_stage('crawl', elapsed)
+    metrics.add(metrics.CRAWLS)
+    if elapsed > 0:
+        metrics.observe(metrics.CRAWL_PAGES_PER_SECOND, len(result[1]) / elapsed)
+    return result
 
 def tree_to_markdown_string(root_node):
     return root_node.print_tree_as_markdown()
 
-def refine_llms_with_openai(llms_str, llm_instructions=None):
+def write_tree_markdown(root_node, sink):
+    """Stream the llms.txt markdown for root_node to a file-like sink."""
+    root_node.write_markdown(sink)
+
+def render_markdown_incremental(root_node, prev_sections=None):
+    """
+    Render the llms.txt markdown, reusing the previous text of every section whose pages
+    are unchanged (same URLs, content hashes, titles and descriptions) since prev_sections.
+    Returns the markdown, the sections to keep for the next run and how many were re-rendered.
+    """
+    prev_sections = prev_sections or {}
+    sections = {}
+    parts = [root_node.markdown_header()]
+    rerendered = 0
+    for child in root_node.children:
+        if child.title is None:
+            continue
+        signature = child.section_signature()
+        previous = prev_sections.get(child.url)
+        if previous and previous['signature'] == signature:
+            text = previous['text']
+        else:
+            text = child.markdown_section()
+            rerendered += 1
+        sections[child.url] = {'signature': signature, 'text': text}
+        parts.append(text)
+    return ''.join(parts), sections, rerendered
+
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """Return the process-wide OpenAI client; openai is imported on first use, not at startup."""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            from openai import OpenAI
+            _openai_client = OpenAI()
+        return _openai_client
+
+def refine_llms_with_openai(llms_str, llm_instructions=None, max_chunk_tokens=LLM_CHUNK_TOKENS, max_workers=LLM_MAX_WORKERS):
+    """
+    Refine an llms.txt with the LLM. Files over max_chunk_tokens are split at `##` sections and
+    the chunks refined concurrently, then merged in order under the original title and description.
+    """
     system_instructions = """
         I will give you an llms.txt file containing this structure. Your job is to improve it.
         llms.txt file structure:
@@ -331,14 +900,45 @@ def refine_llms_with_openai(llms_str, llm_instructions=None):
         """
     if llm_instructions:
         system_instructions += f"\n\Further the website owner instructs: {llm_instructions}"
-    client = OpenAI()
     print(f'Starting to refine llms with openai with len: {len(llms_str)}')
-    if len(llms_str) > 10000:
-        print("llms_str is too long, truncating it")
-        llms_str = llms_str[:10000]
 
+    header, sections = split_llms(llms_str)
+    chunked = estimate_tokens(llms_str) > max_chunk_tokens and bool(sections)
+    if not chunked:
+        llm_requests = [(system_instructions, llms_str)]
+    else:
+        # Each chunk sees the header for context but only returns its own sections
+        chunk_instructions = system_instructions + CHUNK_INSTRUCTIONS
+        llm_requests = [(chunk_instructions, header + chunk) for chunk in chunk_sections(sections, max_chunk_tokens)]
+        print(f'Split llms into {len(llm_requests)} chunks of at most {max_chunk_tokens} tokens')
+
+    llm_cache = get_llm_cache()
+    keys = [llm_cache_key(LLM_MODEL, prompt, llm_instructions, text) for prompt, text in llm_requests]
+    results = [llm_cache.get(key) for key in keys]
+    misses = [i for i, result in enumerate(results) if result is None]
+    metrics.add(metrics.LLM_REQUESTS, len(results) - len(misses), 'cached')
+    if misses:
+        client = get_openai_client()
+        # The requests run on pool threads; they record into the caller's crawl profile
+        profile = metrics.current_profile()
+        def refine(i):
+            with metrics.profiling(profile):
+                return _responses_create(client, *llm_requests[i])
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as executor:
+            refined = executor.map(refine, misses)
+            for i, text in zip(misses, refined):
+                llm_cache.put(keys[i], text)
+                results[i] = text
+    print(f'Refined llms: {len(misses)} of {len(llm_requests)} requests sent to openai ({llm_cache.stats()})')
+
+    if not chunked:
+        return results[0]
+    return merge_refined(header, results)
+
+def _responses_create(client, system_instructions, llms_str):
+    start = time.perf_counter()
     response = client.responses.create(
-        model="gpt-4o",
+        model=LLM_MODEL,
         input=[
                 {
                 "role": "system",
@@ -361,19 +961,60 @@ def refine_llms_with_openai(llms_str, llm_instructions=None):
             ],
             temperature=1
     )
+    metrics.observe_stage('llm_request', time.perf_counter() - start)
+    metrics.add(metrics.LLM_REQUESTS, 1, 'sent')
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        metrics.add(metrics.LLM_TOKENS, usage.input_tokens or 0, 'input')
+        metrics.add(metrics.LLM_TOKENS, usage.output_tokens or 0, 'output')
     print(f'Refined llms with openai with len: {len(response.output_text)}')
     return response.output_text
 
-def create_llms(url_str, avoid_substrings=None, use_llm=False, llm_instructions=None, prev_url_hashmap=None, max_pages=20):
+def create_llms(url_str, avoid_substrings=None, use_llm=False, llm_instructions=None, prev_url_hashmap=None, max_pages=20,
+                extraction_mode=EXTRACTION_MODE, prev_sections=None, on_page=None, on_markdown=None,
+                discovery=DISCOVERY_MODE, snapshot_store=None, from_snapshot=False, full_text_path=None, revisit_bounds=None,
+                keep_output=None):
+    """
+    Crawl url_str and render its llms.txt, refined by the LLM if use_llm and anything changed.
+    Page bodies are kept in snapshot_store (the process-wide store by default). With from_snapshot,
+    the site is not fetched: the tree and llms.txt are rebuilt from the bodies stored for the pages
+    in prev_url_hashmap, e.g. to apply new avoid_substrings, max_pages or LLM instructions.
+    With full_text_path, llms-full.txt (the full text of every page, see app.full_text) is written there,
+    unless keep_output is given and returns False once the crawl is done (e.g. its task was deleted).
+    With revisit_bounds, pages not yet due for a revisit (see app.revisit) are reused without a request.
+    on_page is passed to the crawl; on_markdown is called with the plain markdown before LLM refinement starts.
+    """
     print("creating llms for ", url_str, " at time ", datetime.now())
     if avoid_substrings is None:
         avoid_substrings = []
-    rootnode, new_url_hashmap, anything_changed = crawl_site_as_tree(url_str, avoid_substrings, prev_url_hashmap, max_pages=max_pages)
-    markdown_str = tree_to_markdown_string(rootnode)
+    if snapshot_store is None:
+        snapshot_store = get_snapshot_store()
+    full_text_spool = PageTextSpool() if full_text_path else None
+    try:
+        rootnode, new_url_hashmap, changes = crawl_site_as_tree(url_str, avoid_substrings, prev_url_hashmap, max_pages=max_pages,
+                                                                extraction_mode=extraction_mode, on_page=on_page,
+                                                                discovery=discovery, snapshot_store=snapshot_store,
+                                                                offline=from_snapshot, full_text_spool=full_text_spool,
+                                                                revisit_bounds=revisit_bounds)
+        if full_text_spool is not None and (keep_output is None or keep_output()):
+            with metrics.timed('full_text'):
+                pages = save_llms_full(full_text_path, rootnode, full_text_spool, snapshot_store, extraction_mode)
+            print(f"Wrote llms-full.txt with {pages} pages to {full_text_path}")
+    finally:
+        if full_text_spool is not None:
+            full_text_spool.close()
+    with metrics.timed('render'):
+        markdown_str, sections, rerendered = render_markdown_incremental(rootnode, prev_sections)
+    print(f"{len(changes.added)} added, {len(changes.removed)} removed, {len(changes.modified)} modified pages; "
+          f"re-rendered {rerendered} of {len(sections)} sections")
+    if on_markdown is not None:
+        on_markdown(markdown_str)
     markdown_str_llm = None
-    if use_llm and anything_changed:
-        markdown_str_llm = refine_llms_with_openai(markdown_str, llm_instructions)
-    return markdown_str, markdown_str_llm, new_url_hashmap, anything_changed
+    # A rebuild exists to apply new settings, so it is refined even if no page changed
+    if use_llm and (changes or from_snapshot):
+        with metrics.timed('llm'):
+            markdown_str_llm = refine_llms_with_openai(markdown_str, llm_instructions)
+    return markdown_str, markdown_str_llm, new_url_hashmap, changes, sections
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+"""
+Registered-domain filtering for crawl links.
+
+Resolution is fully offline (the public suffix snapshot bundled with tldextract is
+used, never the network) and memoized per netloc, since a crawl sees the same few
+hosts over and over. The suffix data is loaded on the first lookup, not at import.
+"""
+from functools import lru_cache
+from urllib.parse import urlparse
+
+NETLOC_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=1)
+def get_extractor():
+    """Return the process-wide tldextract extractor, loading the suffix list on first use."""
+    import tldextract
+    # An empty suffix_list_urls makes tldextract fall back to its bundled snapshot
+    return tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+
+@lru_cache(maxsize=NETLOC_CACHE_SIZE)
+def registered_domain(netloc):
+    """Return the registered domain (e.g. example.co.uk) for a netloc."""
+    return get_extractor()(netloc).registered_domain
+
+class DomainFilter:
+    """Accepts URLs on the same registered domain as the crawl root."""
+    def __init__(self, root_url):
+        self.root_domain = registered_domain(urlparse(root_url).netloc)
+
+    def allows(self, url):
+        return registered_domain(urlparse(url).netloc) == self.root_domain
@@ -0,0 +1,122 @@
+"""
+Fast metadata-and-links extraction.
+
+Feeds raw page bytes through an lxml parser target, so no document tree is built.
+One pass collects the title, meta description, <link rel=canonical>, <a href> values,
+the content fingerprint and just enough leading text for a first-sentence description
+fallback (or, with full_text, all of the visible text for llms-full.txt).
+"""
+from lxml import etree
+from app.fingerprint import ContentFingerprinter
+
+# Stop collecting fallback text once this many characters have been seen
+FALLBACK_TEXT_CHARS = 2000
+FEED_CHUNK_BYTES = 64 * 1024
+
+# Text inside these elements is not part of the visible page text
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+class FastPageTarget:
+    """lxml parser target collecting everything the crawler needs from a page."""
+    def __init__(self, full_text=False):
+        self.title = None
+        self.meta_description = None
+        self.canonical = None
+        self.hrefs = []
+        self.fingerprint = ContentFingerprinter()
+        self.fallback_parts = []
+        self.fallback_chars = 0
+        self.fallback_done = False
+        self.full_text = full_text
+        self.text_parts = []
+        self.pending_text = []
+        self.in_title = False
+        self.title_parts = []
+        self.non_text_depth = 0
+
+    def start(self, tag, attrib):
+        self.flush_text()
+        if not isinstance(tag, str):
+            return
+        tag = tag.lower()
+        self.fingerprint.start(tag, attrib)
+        if tag == 'a' and 'href' in attrib:
+            self.hrefs.append(attrib['href'])
+        elif tag == 'title' and self.title is None:
+            self.in_title = True
+        elif tag == 'meta' and self.meta_description is None and attrib.get('name') == 'description':
+            self.meta_description = attrib.get('content')
+        elif tag == 'link' and self.canonical is None and 'canonical' in (attrib.get('rel') or '').lower().split():
+            self.canonical = attrib.get('href')
+        if tag in NON_TEXT_TAGS:
+            self.non_text_depth += 1
+
+    def end(self, tag):
+        self.flush_text()
+        if not isinstance(tag, str):
+            return
+        tag = tag.lower()
+        self.fingerprint.end(tag)
+        if tag == 'title' and self.in_title:
+            self.in_title = False
+            self.title = ''.join(self.title_parts)
+        if tag in NON_TEXT_TAGS and self.non_text_depth:
+            self.non_text_depth -= 1
+
+    def data(self, text):
+        self.fingerprint.data(text)
+        if self.in_title:
+            self.title_parts.append(text)
+        if (self.full_text or not self.fallback_done) and not self.non_text_depth:
+            self.pending_text.append(text)
+
+    def flush_text(self):
+        # lxml splits text at entities; join the pieces back into one text node
+        if not self.pending_text:
+            return
+        text = ''.join(self.pending_text).strip()
+        self.pending_text = []
+        if text and self.full_text:
+            self.text_parts.append(text)
+        if text and not self.fallback_done:
+            self.fallback_parts.append(text)
+            self.fallback_chars += len(text) + 1
+            # The fallback only ever uses the first sentence
+            if '. ' in text or text.endswith('.') or self.fallback_chars >= FALLBACK_TEXT_CHARS:
+                self.fallback_done = True
+
+    def comment(self, text):
+        self.flush_text()
+        self.fingerprint.comment(text)
+
+    def doctype(self, name, pubid, system):
+        self.fingerprint.doctype(name or 'html')
+
+    def close(self):
+        self.flush_text()
+        if self.in_title:
+            self.title = ''.join(self.title_parts)
+        return self
+
+    def fallback_text(self):
+        return ' '.join(self.fallback_parts)
+
+    def text(self):
+        """All visible text of the page (collected only with full_text)."""
+        return ' '.join(self.text_parts)
+
+def extract_fast(body, encoding=None, full_text=False):
+    """Parse page bytes in chunks and return the populated FastPageTarget."""
+    target = FastPageTarget(full_text)
+    # lxml raises on a document with nothing in it; keep it as a page without title or text, as soup mode does
+    if not body.strip():
+        return target.close()
+    parser = etree.HTMLParser(target=target, encoding=encoding, recover=True)
+    view = memoryview(body)
+    for offset in range(0, len(view), FEED_CHUNK_BYTES):
+        parser.feed(bytes(view[offset:offset + FEED_CHUNK_BYTES]))
+    try:
+        return parser.close()
+    except etree.XMLSyntaxError:
+        # No element at all, which some libxml2 versions also report for whitespace
+        return target.close()
@@ -0,0 +1,279 @@
+"""
+Single-pass content fingerprinting.
+
+Produces the same normalized content (and therefore the same SHA-256 content hash)
+as the original clean_html_for_hashing, but walks the parse tree once instead of
+re-serializing it, re-parsing it and running one select() pass per selector.
+"""
+import re
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+from bs4.formatter import HTMLFormatter
+
+# Elements that are always dropped along with their contents
+REMOVED_TAGS = {
+    'script', 'style', 'noscript', 'meta',
+    # Form elements often carry dynamic tokens
+    'form', 'input', 'textarea', 'select', 'button',
+}
+
+# Elements that usually hold dynamic/volatile content
+DYNAMIC_SELECTORS = [
+    # Time-based elements
+    '[data-timestamp]', '[data-time]', '[data-date]',
+    '.timestamp', '.date-updated', '.last-modified', '.time',
+
+    # Session and tracking
+    '[data-session]', '[data-csrf]', '[data-token]', '[data-nonce]',
+    '.csrf-token', '[name="csrf-token"]', '[name="_token"]',
+
+    # Analytics and ads
+    '[data-ga]', '[data-gtm]', '[data-analytics]', '[data-track]',
+    '.google-ads', '.advertisement', '.ad-banner', '.tracking-pixel',
+    '[data-ad]', '.ads', '.adsense',
+
+    # Social media widgets
+    '.facebook-like', '.twitter-tweet', '.instagram-media',
+    '.social-widget', '[data-social]',
+
+    # Comments and dynamic content
+    '#comments', '.comments-section', '.disqus-thread',
+    '.comment-count', '.comment-form',
+
+    # Live counters and stats
+    '.view-count', '.visitor-count', '.online-users',
+    '.counter', '.stat-number', '[data-count]',
+
+    # Forms with dynamic tokens
+    'input[name="csrf-token"]', 'input[name="_token"]',
+    'input[type="hidden"][name*="token"]',
+
+    # Random/dynamic IDs
+    '[id*="random"]', '[id*="temp"]', '[class*="random"]',
+    '[class*="temp"]', '[data-random]'
+]
+
+# Only truly content-related attributes survive normalization
+KEEP_ATTRS = {'href', 'src', 'alt', 'title'}
+
+# Attribute values HTML compares case-insensitively in selectors
+CASE_INSENSITIVE_ATTRS = {'type'}
+
+_SELECTOR_PART = re.compile(r'''
+    (?P<tag>^[a-zA-Z][\w-]*)
+  | \.(?P<cls>[\w-]+)
+  | \#(?P<id>[\w-]+)
+  | \[(?P<attr>[\w-]+)(?:(?P<op>\*?=)"(?P<value>[^"]*)")?\]
+''', re.VERBOSE)
+
+def compile_selector(selector):
+    """
+    Compile a simple CSS selector (tag, .class, #id, [attr], [attr="v"], [attr*="v"] and
+    compounds of these) into a list of (kind, key, value) tests that must all pass.
+    """
+    tests = []
+    pos = 0
+    while pos < len(selector):
+        match = _SELECTOR_PART.match(selector, pos)
+        if not match:
+            raise ValueError(f"Unsupported selector: {selector}")
+        if match.group('tag'):
+            tests.append(('tag', match.group('tag').lower(), None))
+        elif match.group('cls'):
+            tests.append(('class', 'class', match.group('cls')))
+        elif match.group('id'):
+            tests.append(('=', 'id', match.group('id')))
+        elif match.group('op'):
+            tests.append((match.group('op'), match.group('attr').lower(), match.group('value')))
+        else:
+            tests.append(('has', match.group('attr').lower(), None))
+        pos = match.end()
+    return tests
+
+COMPILED_SELECTORS = [compile_selector(selector) for selector in DYNAMIC_SELECTORS]
+
+def _index_selectors(compiled):
+    """
+    Split compiled selectors so an element only checks the rules that can apply to it:
+    bare [attr] and .class selectors become set lookups, the rest are grouped by the
+    attribute they require.
+    """
+    presence, classes, by_attr = set(), set(), {}
+    for tests in compiled:
+        if len(tests) == 1 and tests[0][0] == 'has':
+            presence.add(tests[0][1])
+        elif len(tests) == 1 and tests[0][0] == 'class':
+            classes.add(tests[0][2])
+        else:
+            key = next(test[1] for test in tests if test[0] != 'tag')
+            by_attr.setdefault(key, []).append(tests)
+    return presence, classes, by_attr
+
+PRESENCE_SELECTORS, CLASS_SELECTORS, SELECTORS_BY_ATTR = _index_selectors(COMPILED_SELECTORS)
+
+def _attr_string(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(value)
+    return value
+
+def _passes(test, name, attrs):
+    kind, key, expected = test
+    if kind == 'tag':
+        return name == key
+    value = attrs.get(key)
+    if value is None:
+        return False
+    if kind == 'has':
+        return True
+    if kind == 'class':
+        classes = value if isinstance(value, (list, tuple)) else value.split()
+        return expected in classes
+    value = _attr_string(value)
+    if key in CASE_INSENSITIVE_ATTRS:
+        value, expected = value.lower(), expected.lower()
+    if kind == '=':
+        return value == expected
+    return expected in value
+
+def is_volatile_element(name, attrs):
+    """Return True if an element (and its subtree) is excluded from the fingerprint."""
+    if name in REMOVED_TAGS:
+        return True
+    if not attrs:
+        return False
+    for key in attrs:
+        if key in PRESENCE_SELECTORS:
+            return True
+        if key == 'class':
+            value = attrs[key]
+            classes = value if isinstance(value, (list, tuple)) else value.split()
+            if not CLASS_SELECTORS.isdisjoint(classes):
+                return True
+        for tests in SELECTORS_BY_ATTR.get(key, ()):
+            if all(_passes(test, name, attrs) for test in tests):
+                return True
+    return False
+
+FORMATTER = HTMLFormatter.REGISTRY['minimal']
+
+def format_start_tag(name, attrs, empty=False, prefix=None):
+    """Serialize an opening tag the way BeautifulSoup does, keeping only KEEP_ATTRS."""
+    pieces = []
+    for key, value in sorted((k, v) for k, v in attrs.items() if k in KEEP_ATTRS):
+        if value is None:
+            pieces.append(key)
+        else:
+            text = FORMATTER.attribute_value(_attr_string(value))
+            pieces.append(key + '=' + FORMATTER.quoted_attribute_value(text))
+    attribute_string = ' ' + ' '.join(pieces) if pieces else ''
+    prefix = prefix + ':' if prefix else ''
+    void_slash = (FORMATTER.void_element_close_prefix or '') if empty else ''
+    return '<' + prefix + name + attribute_string + void_slash + '>'
+
+def serialize_for_hashing(soup, reparsed=False):
+    """
+    Serialize the non-volatile part of a parse tree in one walk.
+
+    The original implementation worked on a copy re-parsed from str(soup), which is the
+    same tree except where html.parser builds one it would not build from its own output:
+    void elements with children (e.g. from <br>...</br>). Such trees are re-parsed first,
+    so their fingerprints stay the same as before.
+    """
+    pieces = []
+    append = pieces.append
+    stack = [(None, iter(soup.contents), 0)]
+    while stack:
+        tag, children, start = stack[-1]
+        for child in children:
+            if isinstance(child, Tag):
+                if child.can_be_empty_element and child.contents and not reparsed:
+                    return serialize_for_hashing(BeautifulSoup(str(soup), 'html.parser'), reparsed=True)
+                if is_volatile_element(child.name, child.attrs):
+                    continue
+                if child.is_empty_element:
+                    append(format_start_tag(child.name, child.attrs, True, child.prefix))
+                    continue
+                stack.append((child, iter(child.contents), len(pieces)))
+                append(format_start_tag(child.name, child.attrs, False, child.prefix))
+                break
+            append(child.output_ready(FORMATTER))
+        else:
+            stack.pop()
+            if tag is None:
+                continue
+            if tag.can_be_empty_element and len(pieces) == start + 1:
+                # Every child was volatile: a void element left empty is serialized as one
+                pieces[start] = format_start_tag(tag.name, tag.attrs, True, tag.prefix)
+            else:
+                append('</' + (tag.prefix + ':' if tag.prefix else '') + tag.name + '>')
+    return ''.join(pieces)
+
+_WHITESPACE = re.compile(r'\s+')
+_BETWEEN_TAGS = re.compile(r'>\s+<')
+_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+_ISO_DATE = re.compile(r'\b\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}[Z\+\-\d:]*\b')
+_HEX_TOKEN = re.compile(r'\b[a-f0-9]{32,}\b')
+_RANDOM_TOKEN = re.compile(r'\b[A-Za-z0-9]{20,}\b')
+
+def normalize_for_hashing(html_text):
+    """Apply the text normalization used for content hashes."""
+    html_text = _WHITESPACE.sub(' ', html_text)
+    html_text = _BETWEEN_TAGS.sub('><', html_text)
+    html_text = _COMMENT.sub('', html_text)
+    html_text = _ISO_DATE.sub('', html_text)
+    # Hashes have always been computed with only the first two hex tokens removed
+    # (re.I was passed as the count argument); keep that so stored hashes stay valid.
+    html_text = _HEX_TOKEN.sub('', html_text, 2)
+    html_text = _RANDOM_TOKEN.sub('', html_text)
+    return html_text.strip()
+
+def fingerprint_text(soup):
+    """Return the normalized content string that content hashes are computed from."""
+    return normalize_for_hashing(serialize_for_hashing(soup))
+
+# Elements serialized without a closing tag
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+    'menuitem', 'meta', 'param', 'source', 'track', 'wbr',
+}
+
+class ContentFingerprinter:
+    """
+    Event-driven counterpart of serialize_for_hashing, for parsers that emit
+    start/end/data events (e.g. an lxml parser target) instead of building a tree.
+    Trees built by different parsers differ slightly, so hashes are only comparable
+    between pages fingerprinted the same way.
+    """
+    def __init__(self):
+        self.pieces = []
+        self.skip_depth = 0
+
+    def start(self, name, attrs):
+        if self.skip_depth:
+            self.skip_depth += 1
+        elif is_volatile_element(name, attrs):
+            self.skip_depth = 1
+        else:
+            self.pieces.append(format_start_tag(name, attrs, name in VOID_ELEMENTS))
+
+    def end(self, name):
+        if self.skip_depth:
+            self.skip_depth -= 1
+        elif name not in VOID_ELEMENTS:
+            self.pieces.append('</' + name + '>')
+
+    def data(self, text):
+        if not self.skip_depth:
+            # Same escaping as the 'minimal' formatter, without a regex call per text node
+            self.pieces.append(text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'))
+
+    def comment(self, text):
+        if not self.skip_depth:
+            self.pieces.append('<!--' + text + '-->')
+
+    def doctype(self, name):
+        self.pieces.append('<!DOCTYPE ' + name + '>')
+
+    def text(self):
+        """Return the normalized content string that content hashes are computed from."""
+        return normalize_for_hashing(''.join(self.pieces))
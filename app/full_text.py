@@ -0,0 +1,119 @@
+"""
+llms-full.txt: the full visible text of every crawled page, in tree order.
+
+The crawl spools each page's text to a temporary file as soon as the page is parsed,
+so page text never accumulates in memory. The output is then written to its sink one
+page at a time in tree order (pre-order, children in link order). Pages the crawl
+reused without downloading them (a 304, an unchanged sitemap <lastmod>, a snapshot
+replay) have their text extracted from the body kept in the snapshot store, with the
+crawl's extraction mode, so their text reads the same as that of downloaded pages.
+"""
+import os
+import tempfile
+
+FULL_TEXT_DIR = os.environ.get(
+    'LLMS_FULL_TEXT_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'full'),
+)
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+class PageTextSpool:
+    """Append-only temporary file of page texts, read back by URL."""
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._spans = {}  # url -> (offset, length)
+        self._end = 0
+
+    def add(self, url, text):
+        data = text.encode('utf-8')
+        self._file.seek(self._end)
+        self._file.write(data)
+        self._spans[url] = (self._end, len(data))
+        self._end += len(data)
+
+    def get(self, url):
+        span = self._spans.get(url)
+        if span is None:
+            return None
+        self._file.seek(span[0])
+        return self._file.read(span[1]).decode('utf-8')
+
+    def __len__(self):
+        return len(self._spans)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_crawled_pages(root_node):
+    """Yield the crawled nodes of a tree in pre-order, children in link order."""
+    stack = [root_node]
+    while stack:
+        node = stack.pop()
+        if node.title is None:
+            continue
+        yield node
+        stack.extend(reversed(node.children))
+
+def extract_text(body, encoding=None, extraction_mode='fast'):
+    """A page's visible text as app.crawler.parse_page gives it in extraction_mode ('soup' or 'fast')."""
+    if extraction_mode == 'fast':
+        from app.fast_extract import extract_fast
+        return extract_fast(body, encoding, full_text=True).text()
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(body.decode(encoding or 'utf-8', errors='replace'), 'html.parser')
+    return soup.get_text(separator=' ', strip=True)
+
+def text_from_snapshot(snapshot_store, content_hash, extraction_mode='fast'):
+    stored = snapshot_store.get(content_hash)
+    if stored is None:
+        return None
+    body, encoding = stored
+    return extract_text(body, encoding, extraction_mode)
+
+def write_llms_full(root_node, spool, sink, snapshot_store=None, extraction_mode='fast'):
+    """
+    Write llms-full.txt for a crawled tree to a file-like sink; returns the number of pages written.
+    Pages not in the spool are extracted from snapshot_store in the crawl's extraction_mode.
+    """
+    pages = 0
+    for node in iter_crawled_pages(root_node):
+        text = spool.get(node.url)
+        if text is None and snapshot_store is not None and node.content_hash:
+            text = text_from_snapshot(snapshot_store, node.content_hash, extraction_mode)
+        if text is None:
+            continue
+        sink.write(f"# {node.title}\nSource: {node.url}\n\n{text}\n\n")
+        pages += 1
+    return pages
+
+def save_llms_full(path, root_node, spool, snapshot_store=None, extraction_mode='fast'):
+    """Write llms-full.txt to path, replacing any previous version only once it is complete."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # A unique temporary file per writer: two runs of one task may write at once, in one process or several
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', dir=directory,
+                                     prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False) as sink:
+        tmp_path = sink.name
+        try:
+            pages = write_llms_full(root_node, spool, sink, snapshot_store, extraction_mode)
+        except BaseException:
+            sink.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+    return pages
+
+def iter_file_chunks(path, chunk_bytes=DOWNLOAD_CHUNK_BYTES):
+    """Yield a file's bytes in chunks, for a chunked HTTP download."""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                return
+            yield chunk
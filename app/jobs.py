@@ -0,0 +1,206 @@
+"""
+Background jobs for long-running requests such as /generate.
+
+A job runs on a bounded thread pool and records an ordered list of events (pages as
+they are crawled, each output as it becomes ready, and a final 'done'). Clients read
+the events either by long-polling with the last sequence number they saw, or as a
+server-sent event stream.
+
+A job runs in the process that created it, but its state and events are also written to
+the task database as they happen, so every server process sharing it can answer a poll
+or event stream for any job. The creating process wakes its readers at once; the others
+poll the database every JOB_POLL_SECONDS. Jobs are dropped JOB_TTL_SECONDS after they
+finish, together with any files they wrote, and a job whose process died before it
+finished is dropped JOB_ORPHAN_SECONDS after it started.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_JOB_WORKERS = 4
+JOB_TTL_SECONDS = 3600
+JOB_ORPHAN_SECONDS = 24 * 3600
+JOB_POLL_SECONDS = 0.25
+SSE_HEARTBEAT_SECONDS = 15
+
+class JobEvents:
+    """Event reading shared by jobs of this process and jobs read from the store."""
+    def sse_stream(self, after=0):
+        """Yield server-sent events until the job is done, with comment heartbeats while idle."""
+        while True:
+            events = self.wait_events(after, SSE_HEARTBEAT_SECONDS)
+            if not events:
+                if self.done and after >= self.last_event:
+                    return
+                yield ': keep-alive\n\n'
+                continue
+            for event in events:
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+                after = event['seq']
+                if event['type'] == 'done':
+                    return
+
+    @property
+    def done(self):
+        return self.status != 'running'
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'error': self.error,
+            'pages': self.pages,
+            'outputs': self.outputs,
+            'last_event': self.last_event,
+        }
+
+class Job(JobEvents):
+    """A job running in this process; with a store, everything it publishes is written there too."""
+    def __init__(self, job_id, store=None):
+        self.job_id = job_id
+        self.store = store
+        self.status = 'running'
+        self.error = None
+        self.outputs = {}
+        self.pages = 0
+        self.events = []
+        self.files = []   # written by the job and deleted with it
+        self.created = time.time()
+        self.finished = None
+        self._cond = threading.Condition()
+        if store is not None:
+            store.create_job(job_id, self.created)
+
+    @property
+    def last_event(self):
+        return len(self.events)
+
+    def publish(self, event_type, data, **fields):
+        """Append an event, store it with the job's changed fields, and wake every waiting reader."""
+        with self._cond:
+            event = {'seq': len(self.events) + 1, 'type': event_type, 'data': data}
+            self.events.append(event)
+            if self.store is not None:
+                self.store.add_job_event(self.job_id, event, **fields)
+            self._cond.notify_all()
+
+    def page(self, page):
+        self.pages += 1
+        self.publish('page', page, pages=self.pages)
+
+    def set_output(self, name, text):
+        self.outputs[name] = text
+        self.publish('output', {'name': name, 'text': text}, outputs=self.outputs)
+
+    def add_file(self, path):
+        """Record a file the job writes, so it can be downloaded from any process and is deleted with the job."""
+        self.files.append(path)
+        if self.store is not None:
+            self.store.update_job(self.job_id, files=self.files)
+
+    def finish(self, error=None):
+        with self._cond:
+            if self.done:
+                return
+            self.status = 'error' if error else 'completed'
+            self.error = error
+            self.finished = time.time()
+            self.publish('done', {'status': self.status, 'error': error},
+                         status=self.status, error=error, finished=self.finished)
+
+    def wait_events(self, after=0, timeout=None):
+        """Return the events after sequence number `after`, blocking up to timeout for new ones."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > after or self.done, timeout)
+            return self.events[after:]
+
+class StoredJob(JobEvents):
+    """A job another process is running (or ran), read from the store."""
+    def __init__(self, store, state):
+        self.store = store
+        self.job_id = state['job_id']
+        self._load(state)
+
+    def _load(self, state):
+        self.status = state['status']
+        self.error = state['error']
+        self.pages = state['pages']
+        self.outputs = state['outputs']
+        self.files = state['files']
+        self.last_event = state['last_event']
+        self.created = state['created']
+        self.finished = state['finished']
+
+    def wait_events(self, after=0, timeout=None):
+        """Return the events after sequence number `after`, polling the store up to timeout for new ones."""
+        deadline = time.time() + (timeout or 0)
+        while True:
+            events = self.store.load_job_events(self.job_id, after)
+            state = self.store.load_job(self.job_id)
+            if state is not None:
+                self._load(state)
+            else:
+                self.status, self.error = 'error', 'The job expired'
+            if events or state is None or self.done or time.time() >= deadline:
+                return events
+            time.sleep(min(JOB_POLL_SECONDS, max(0.0, deadline - time.time())))
+
+class JobManager:
+    def __init__(self, store=None, max_workers=MAX_JOB_WORKERS, ttl_seconds=JOB_TTL_SECONDS):
+        # The task database, shared with the other server processes; None keeps jobs in this process only
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.ttl_seconds = ttl_seconds
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn(job, *args, **kwargs) in the background; the job finishes when fn returns or raises."""
+        self._prune()
+        job = Job(str(uuid.uuid4()), self.store)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        self.executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            fn(job, *args, **kwargs)
+        except Exception as e:
+            print(f"Error in job {job.job_id}: {e}")
+            job.finish(str(e))
+        else:
+            job.finish()
+
+    def _prune(self):
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self.jobs.items() if job.finished and job.finished < cutoff]
+            files = [path for job_id in expired for path in self.jobs.pop(job_id).files]
+        if self.store is not None:
+            # Jobs of every process, this one's included
+            files = self.store.prune_jobs(cutoff, now - JOB_ORPHAN_SECONDS)
+        for path in files:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def get(self, job_id):
+        """The job, whichever process sharing the store runs it; None if there is no such job."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is not None or self.store is None:
+            return job
+        state = self.store.load_job(job_id)
+        return StoredJob(self.store, state) if state is not None else None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        # Readers in other processes would otherwise wait for jobs that can no longer finish
+        with self._lock:
+            running = [job for job in self.jobs.values() if not job.done]
+        for job in running:
+            job.finish('The server process running this job shut down')
@@ -0,0 +1,83 @@
+"""
+Split an llms.txt document into token-budgeted chunks and merge refined chunks back.
+
+The document is cut at `##` section boundaries. The `#` title, the `>` description
+and any details before the first section form the header; it is kept verbatim in
+the merged output, and each chunk only carries it as context. Sections are packed
+greedily into chunks of at most max_tokens (estimated). A single section larger than
+the budget is split between its link lines, repeating its `##` heading.
+"""
+import re
+
+CHARS_PER_TOKEN = 4
+DEFAULT_CHUNK_TOKENS = 2500
+OPTIONAL_SECTION = '## Optional'
+
+SECTION_RE = re.compile(r'^## ', re.MULTILINE)
+
+def estimate_tokens(text):
+    """Rough token count; English markdown averages about four characters per token."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def split_llms(llms_str):
+    """Return (header, sections) where every section starts with its `##` line."""
+    starts = [match.start() for match in SECTION_RE.finditer(llms_str)]
+    if not starts:
+        return llms_str, []
+    header = llms_str[:starts[0]]
+    bounds = starts + [len(llms_str)]
+    sections = [llms_str[bounds[i]:bounds[i + 1]] for i in range(len(starts))]
+    return header, sections
+
+def _split_section(section, max_tokens):
+    """Split one oversized section between lines, repeating its heading on every piece."""
+    heading, _, body = section.partition('\n')
+    heading += '\n'
+    pieces, current = [], heading
+    for line in body.splitlines(keepends=True):
+        if current != heading and estimate_tokens(current + line) > max_tokens:
+            pieces.append(current)
+            current = heading
+        current += line
+    pieces.append(current)
+    return pieces
+
+def chunk_sections(sections, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Greedily pack whole sections into chunks of at most max_tokens each."""
+    chunks, current = [], ''
+    for section in sections:
+        pieces = _split_section(section, max_tokens) if estimate_tokens(section) > max_tokens else [section]
+        for piece in pieces:
+            if current and estimate_tokens(current + piece) > max_tokens:
+                chunks.append(current)
+                current = ''
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def merge_refined(header, refined_chunks):
+    """
+    Reassemble refined chunks in order under the original header.
+
+    Anything a chunk emits before its first `##` (a repeated title or description) is
+    dropped. Sections with the same heading, e.g. an "## Optional" produced by several
+    chunks, are merged in place of the first one, and "## Optional" is kept last.
+    """
+    order, bodies = [], {}
+    for chunk in refined_chunks:
+        _, sections = split_llms(chunk.strip() + '\n')
+        for section in sections:
+            heading, _, body = section.partition('\n')
+            heading = heading.strip()
+            if heading not in bodies:
+                order.append(heading)
+                bodies[heading] = ''
+            bodies[heading] += body.strip('\n') + '\n' if body.strip() else ''
+    if OPTIONAL_SECTION in bodies:
+        order.remove(OPTIONAL_SECTION)
+        order.append(OPTIONAL_SECTION)
+    merged = header.rstrip('\n') + '\n'
+    for heading in order:
+        merged += f"{heading}\n{bodies[heading]}"
+    return merged
@@ -0,0 +1,281 @@
+"""
+Crawl instrumentation: process-wide metrics in Prometheus text format, and optional
+per-crawl profiles.
+
+Hot paths call timed(stage) around each stage (crawl, fetch, parse, hash, snapshot,
+render, full_text, llm and each llm_request) and add(counter) for bytes, pages and tokens. Both feed the
+process-wide metrics when LLMS_METRICS is on (the default) and the crawl's profile when
+one is active (see profiling()). With metrics off and no profile they return at once,
+so instrumentation costs a flag check per call.
+
+Metrics live in the memory of the process that recorded them; each worker process of a
+multi-process server exposes its own.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('LLMS_METRICS', '1') != '0'
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _format_labels(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def remove(self, *label_values):
+        with self._lock:
+            self._values.pop(label_values, None)
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self, *label_values):
+        """(count, sum) of the observations with these label values."""
+        with self._lock:
+            series = self._series.get(label_values)
+            return (series[-1], series[-2]) if series else (0, 0.0)
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        samples = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', _format_labels(self.labels + ('le',), key + (bound,)), cumulative))
+            samples.append((f'{self.name}_bucket', _format_labels(self.labels + ('le',), key + ('+Inf',)), values[-1]))
+            samples.append((f'{self.name}_sum', _format_labels(self.labels, key), values[-2]))
+            samples.append((f'{self.name}_count', _format_labels(self.labels, key), values[-1]))
+        return samples
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def on_collect(self, key, callback):
+        """Call callback before each render (to refresh gauges), until remove_collector(key)."""
+        with self._lock:
+            self._collectors[key] = callback
+
+    def remove_collector(self, key):
+        with self._lock:
+            self._collectors.pop(key, None)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            collectors = list(self._collectors.values())
+        for callback in collectors:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'llms_stage_seconds', 'Time spent in each crawl stage (summed over concurrent work)', ('stage',)))
+PAGES = REGISTRY.register(Counter(
+    'llms_pages_total', 'Pages crawled, by how they were obtained: fetched, not_modified (304) or reused without a request',
+    ('result',)))
+DOWNLOADED_BYTES = REGISTRY.register(Counter('llms_downloaded_bytes_total', 'Page body bytes downloaded'))
+CRAWLS = REGISTRY.register(Counter('llms_crawls_total', 'Crawls finished'))
+CRAWL_PAGES_PER_SECOND = REGISTRY.register(Histogram(
+    'llms_crawl_pages_per_second', 'Pages per second of each finished crawl', buckets=RATE_BUCKETS))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    'llms_llm_requests_total', 'LLM refinement requests, by whether they were sent or answered from the cache', ('result',)))
+LLM_TOKENS = REGISTRY.register(Counter('llms_llm_tokens_total', 'LLM tokens used, by kind (input or output)', ('kind',)))
+SCHEDULER_JOBS = REGISTRY.register(Gauge(
+    'llms_scheduler_jobs', 'Scheduler jobs by state: scheduled, running or waiting for admission', ('scheduler', 'state')))
+SCHEDULER_MEMORY = REGISTRY.register(Gauge(
+    'llms_scheduler_memory_in_flight_bytes', 'Estimated memory of the crawls a scheduler is running', ('scheduler',)))
+SCHEDULER_LAG = REGISTRY.register(Histogram(
+    'llms_scheduler_lag_seconds', 'Delay between a job being due and starting', ('scheduler',)))
+SCHEDULER_LEADER = REGISTRY.register(Gauge(
+    'llms_scheduler_leader', '1 while this process holds the scheduler lease and creates the due task runs'))
+TASK_RUNS = REGISTRY.register(Counter(
+    'llms_task_runs_total', 'Scheduled task runs of this process: claimed, done, or lost (claim taken over or task deleted before the run finished)',
+    ('result',)))
+
+# Profile counters fed by add(), keyed by the counter and its label
+PROFILE_COUNTERS = {
+    (PAGES, 'fetched'): 'pages_fetched',
+    (PAGES, 'not_modified'): 'pages_not_modified',
+    (PAGES, 'reused'): 'pages_reused',
+    (DOWNLOADED_BYTES, None): 'downloaded_bytes',
+    (LLM_REQUESTS, 'sent'): 'llm_requests',
+    (LLM_REQUESTS, 'cached'): 'llm_cached',
+    (LLM_TOKENS, 'input'): 'llm_input_tokens',
+    (LLM_TOKENS, 'output'): 'llm_output_tokens',
+}
+
+class CrawlProfile:
+    """Per-stage time and counters of one crawl; stage seconds are summed over concurrent work."""
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add(self, name, amount):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def to_dict(self):
+        with self._lock:
+            stages = {stage: {'count': count, 'seconds': round(seconds, 4)} for stage, (count, seconds) in self.stages.items()}
+            counters = dict(self.counters)
+        crawl = stages.get('crawl')
+        pages = sum(counters.get(name, 0) for name in ('pages_fetched', 'pages_not_modified', 'pages_reused'))
+        return {
+            'started': self.started,
+            'stages': stages,
+            'counters': counters,
+            'pages_per_second': round(pages / crawl['seconds'], 2) if crawl and crawl['seconds'] else None,
+        }
+
+_profile = contextvars.ContextVar('crawl_profile', default=None)
+
+def current_profile():
+    return _profile.get()
+
+@contextmanager
+def profiling(profile):
+    """Record into profile, in this context, everything instrumented (None profiles nothing)."""
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+def observe_stage(stage, seconds):
+    if ENABLED:
+        STAGE_SECONDS.observe(seconds, stage)
+    profile = _profile.get()
+    if profile is not None:
+        profile.add_stage(stage, seconds)
+
+class _Timer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.stage, time.perf_counter() - self.start)
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+def timed(stage):
+    """Context manager timing one stage; a shared no-op when nothing is recording."""
+    if not ENABLED and _profile.get() is None:
+        return _NULL_TIMER
+    return _Timer(stage)
+
+def add(counter, amount=1, label=None):
+    """Add to a counter (with its one label value, if it has one) and to the active profile."""
+    if ENABLED:
+        if label is None:
+            counter.inc(amount)
+        else:
+            counter.inc(amount, label)
+    profile = _profile.get()
+    if profile is not None:
+        name = PROFILE_COUNTERS.get((counter, label))
+        if name is not None:
+            profile.add(name, amount)
+
+def observe(histogram, value, *label_values):
+    if ENABLED:
+        histogram.observe(value, *label_values)
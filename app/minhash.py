@@ -0,0 +1,91 @@
+"""
+MinHash signatures and a banded LSH index for near-duplicate pages.
+
+A page's signature is a one-permutation MinHash over the word 3-shingles of its
+visible text (taken from the same volatile-free serialization as content_hash): each
+shingle hash falls into one of MINHASH_BINS bins and every bin keeps its minimum.
+The fraction of equal bins between two signatures estimates the Jaccard similarity of
+the pages' shingle sets; pages at NEAR_DUPLICATE_SIMILARITY or above are
+near-duplicates. Only the low 16 bits of each minimum are kept (b-bit MinHash), so a
+signature is a 256-character hex string.
+
+The index splits signatures into LSH_BANDS bands. Pages sharing any whole band are
+candidates, which catches pages at 0.9 similarity 99% of the time while a lookup only
+compares against the few pages sharing a band instead of scanning every page.
+"""
+import hashlib
+import re
+
+MINHASH_BINS = 64
+LSH_BANDS = 8
+NEAR_DUPLICATE_SIMILARITY = 0.8
+SHINGLE_SIZE = 3
+# Pages with fewer distinct shingles are too short for a meaningful signature
+MIN_SHINGLES = 8
+
+HEX_PER_BIN = 4
+BIN_BITS = MINHASH_BINS.bit_length() - 1
+TAG_RE = re.compile(r'<[^>]*>')
+TOKEN_RE = re.compile(r'\w+')
+
+def minhash(fingerprint):
+    """MinHash signature of the text in a fingerprint_text() serialization, or None for very short pages."""
+    tokens = TOKEN_RE.findall(TAG_RE.sub(' ', fingerprint).lower())
+    shingles = set(zip(*(tokens[i:] for i in range(SHINGLE_SIZE))))
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    empty = 1 << 64
+    mins = [empty] * MINHASH_BINS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(' '.join(shingle).encode('utf-8'), digest_size=8).digest(), 'big')
+        slot = value & (MINHASH_BINS - 1)
+        value >>= BIN_BITS
+        if value < mins[slot]:
+            mins[slot] = value
+    # Densify: an empty bin borrows the minimum of the next non-empty bin
+    for slot in range(MINHASH_BINS):
+        offset = 1
+        while mins[slot] == empty:
+            mins[slot] = mins[(slot + offset) % MINHASH_BINS]
+            offset += 1
+    return ''.join(f'{value & 0xffff:04x}' for value in mins)
+
+def _bins(signature):
+    return [signature[i:i + HEX_PER_BIN] for i in range(0, len(signature), HEX_PER_BIN)]
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the pages behind two signatures."""
+    return sum(x == y for x, y in zip(_bins(a), _bins(b))) / MINHASH_BINS
+
+def near_duplicate(a, b, threshold=NEAR_DUPLICATE_SIMILARITY):
+    return a is not None and b is not None and similarity(a, b) >= threshold
+
+class MinHashIndex:
+    """Banded LSH index over MinHash signatures; lookups touch only the entries sharing a band."""
+    def __init__(self, threshold=NEAR_DUPLICATE_SIMILARITY, bands=LSH_BANDS):
+        self.threshold = threshold
+        self.band_width = HEX_PER_BIN * MINHASH_BINS // bands
+        self.tables = [{} for _ in range(bands)]
+        self.size = 0
+
+    def _band_values(self, signature):
+        return [signature[i * self.band_width:(i + 1) * self.band_width] for i in range(len(self.tables))]
+
+    def add(self, signature, key):
+        for table, band in zip(self.tables, self._band_values(signature)):
+            table.setdefault(band, []).append((signature, key))
+        self.size += 1
+
+    def candidates(self, signature):
+        """Yield (signature, key) for every indexed entry at or above the similarity threshold."""
+        checked = set()
+        for table, band in zip(self.tables, self._band_values(signature)):
+            for other, key in table.get(band, ()):
+                if key in checked:
+                    continue
+                checked.add(key)
+                if similarity(signature, other) >= self.threshold:
+                    yield other, key
+
+    def __len__(self):
+        return self.size
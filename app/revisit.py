@@ -0,0 +1,63 @@
+"""
+Adaptive revisit intervals from observed change rates.
+
+Each task, and each URL it crawls, keeps a short change history: how many times it was
+seen to change and over how many seconds of observation. Changes are modelled as a
+Poisson process whose rate is estimated as changes / observed seconds. Intervals are
+planned with half a change added as a prior, which keeps a page that has not changed
+yet from being written off after one quiet visit. Older observations decay, so a page that starts changing is
+picked up within a few visits.
+
+The revisit interval aims for REVISIT_CHANGE_FRACTION expected changes between visits,
+within [min_seconds, max_seconds], and moves like an exponential backoff: it at most
+doubles after a visit that found no change and at least halves after one that did, so a
+page that changes on every visit is back at min_seconds within a few visits however long
+it was quiet. Visits are timed by when the crawl started, so a page is due on each run
+of a task scheduled at its interval.
+"""
+import os
+
+DEFAULT_MAX_INTERVAL_SECONDS = int(os.environ.get('LLMS_MAX_RECRAWL_SECONDS', 24 * 60 * 60))
+REVISIT_CHANGE_FRACTION = 0.5
+PRIOR_CHANGES = 0.5
+# Weight kept by the older history at each new observation (about the last five visits count)
+HISTORY_DECAY = 0.8
+
+def new_history(now):
+    """History of something first seen at now."""
+    return {'checked_at': now, 'changes': 0.0, 'observed_seconds': 0.0, 'last_elapsed': 0.0, 'changed': False}
+
+def observe(history, changed, now):
+    """Return the history after a visit at now that found the content changed or not."""
+    if not history:
+        return new_history(now)
+    elapsed = max(0.0, now - history['checked_at'])
+    return {
+        'checked_at': now,
+        'changes': history['changes'] * HISTORY_DECAY + (1.0 if changed else 0.0),
+        'observed_seconds': history['observed_seconds'] * HISTORY_DECAY + elapsed,
+        'last_elapsed': elapsed,
+        'changed': bool(changed),
+    }
+
+def change_rate(history):
+    """Estimated changes per second, or None before anything has been observed."""
+    if not history or history['observed_seconds'] <= 0:
+        return None
+    return history['changes'] / history['observed_seconds']
+
+def revisit_interval(history, min_seconds, max_seconds):
+    """Seconds to wait before the next visit."""
+    if not history or history['observed_seconds'] <= 0:
+        return min_seconds
+    interval = REVISIT_CHANGE_FRACTION * history['observed_seconds'] / (history['changes'] + PRIOR_CHANGES)
+    last_elapsed = history.get('last_elapsed') or 0.0
+    if last_elapsed:
+        interval = min(interval, last_elapsed / 2 if history.get('changed') else last_elapsed * 2)
+    return max(min_seconds, min(max_seconds, interval))
+
+def is_due(history, now, min_seconds, max_seconds):
+    """True if a visit at now is due (always for something without a history)."""
+    if not history:
+        return True
+    return now - history['checked_at'] >= revisit_interval(history, min_seconds, max_seconds)
@@ -0,0 +1,170 @@
+"""
+Interval scheduler for crawl tasks with a bounded worker pool and admission control.
+
+Jobs sit in a heap ordered by next due time. A dispatcher thread starts due jobs on a
+fixed number of crawl workers, as long as
+- fewer than max_per_domain crawls of the same registered domain are running, and
+- the memory estimated for the crawls in flight stays within memory_budget_bytes.
+A due job that cannot be admitted waits (in due order) until a running crawl finishes;
+runs are delayed, never dropped. A job is never run concurrently with itself; its next
+run is due interval seconds after the previous one started, or as soon as it finishes
+if it overran (the missed runs are coalesced). A job added without an interval runs
+once, under the same admission rules, and is then dropped.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import metrics
+
+CRAWL_WORKERS = int(os.environ.get('LLMS_CRAWL_WORKERS', 4))
+MAX_CRAWLS_PER_DOMAIN = 1
+CRAWL_MEMORY_BUDGET_BYTES = int(os.environ.get('LLMS_CRAWL_MEMORY_MB', 1024)) * 1024 * 1024
+# Rough per-crawl footprint: interpreter-side overhead plus parsed pages and tree nodes
+CRAWL_BASE_BYTES = 16 * 1024 * 1024
+CRAWL_BYTES_PER_PAGE = 512 * 1024
+
+def estimate_crawl_memory(max_pages):
+    """Estimated peak memory of one crawl of max_pages pages."""
+    return CRAWL_BASE_BYTES + CRAWL_BYTES_PER_PAGE * max_pages
+
+class ScheduledJob:
+    def __init__(self, job_id, func, interval_seconds, domain, memory_estimate, next_due):
+        self.job_id = job_id
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.domain = domain
+        self.memory_estimate = memory_estimate
+        self.next_due = next_due
+        self.removed = False
+
+class CrawlScheduler:
+    def __init__(self, max_workers=CRAWL_WORKERS, max_per_domain=MAX_CRAWLS_PER_DOMAIN,
+                 memory_budget_bytes=CRAWL_MEMORY_BUDGET_BYTES, name='tasks'):
+        # Labels this scheduler's queue depth and lag in /metrics
+        self.name = name
+        self.max_workers = max_workers
+        self.max_per_domain = max_per_domain
+        self.memory_budget_bytes = memory_budget_bytes
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='crawl')
+        self.jobs = {}
+        self._heap = []     # (next_due, seq, job) for jobs waiting for their due time
+        self._ready = []    # due jobs waiting for admission, in due order
+        self._seq = itertools.count()
+        self._running = 0
+        self._running_by_domain = {}
+        self._memory_in_flight = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._dispatch_loop, name='crawl-scheduler', daemon=True)
+
+    def start(self):
+        metrics.REGISTRY.on_collect(('scheduler', id(self)), self._report_metrics)
+        self._thread.start()
+
+    def shutdown(self, wait=True):
+        metrics.REGISTRY.remove_collector(('scheduler', id(self)))
+        for state in ('scheduled', 'running', 'waiting'):
+            metrics.SCHEDULER_JOBS.remove(self.name, state)
+        metrics.SCHEDULER_MEMORY.remove(self.name)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread.ident is not None:
+            self._thread.join()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def add_job(self, job_id, func, interval_seconds, domain, memory_estimate, first_run=None):
+        """
+        Schedule func every interval_seconds (first at first_run, default one interval from now), replacing job_id.
+        With interval_seconds None, func runs once, at first_run or as soon as it is admitted.
+        """
+        now = time.time()
+        if first_run is None:
+            first_run = now if interval_seconds is None else now + interval_seconds
+        job = ScheduledJob(job_id, func, interval_seconds, domain, memory_estimate, first_run)
+        with self._cond:
+            if job_id in self.jobs:
+                self.jobs[job_id].removed = True
+            self.jobs[job_id] = job
+            self._push(job)
+            self._cond.notify_all()
+        return job
+
+    def stats(self):
+        with self._cond:
+            return {
+                'scheduled': len(self.jobs),
+                'running': self._running,
+                'waiting_for_admission': sum(1 for job in self._ready if not job.removed),
+                'memory_in_flight': self._memory_in_flight,
+            }
+
+    def _report_metrics(self):
+        stats = self.stats()
+        metrics.SCHEDULER_JOBS.set(stats['scheduled'], self.name, 'scheduled')
+        metrics.SCHEDULER_JOBS.set(stats['running'], self.name, 'running')
+        metrics.SCHEDULER_JOBS.set(stats['waiting_for_admission'], self.name, 'waiting')
+        metrics.SCHEDULER_MEMORY.set(stats['memory_in_flight'], self.name)
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.next_due, next(self._seq), job))
+
+    def _admissible(self, job):
+        if self._running >= self.max_workers:
+            return False
+        if self._running_by_domain.get(job.domain, 0) >= self.max_per_domain:
+            return False
+        # An oversized job is still admitted when nothing else is running, so it cannot starve
+        return self._running == 0 or self._memory_in_flight + job.memory_estimate <= self.memory_budget_bytes
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while not self._stopped:
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    job = heapq.heappop(self._heap)[2]
+                    if not job.removed:
+                        self._ready.append(job)
+                waiting = []
+                for job in self._ready:
+                    if job.removed:
+                        continue
+                    if self._admissible(job):
+                        self._start(job)
+                    else:
+                        waiting.append(job)
+                self._ready = waiting
+                # Sleep until the next job is due; finishing crawls and new jobs wake us early
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._cond.wait(timeout)
+
+    def _start(self, job):
+        self._running += 1
+        self._running_by_domain[job.domain] = self._running_by_domain.get(job.domain, 0) + 1
+        self._memory_in_flight += job.memory_estimate
+        started = time.time()
+        metrics.observe(metrics.SCHEDULER_LAG, max(0.0, started - job.next_due), self.name)
+        self.executor.submit(self._run, job, started)
+
+    def _run(self, job, started):
+        try:
+            job.func()
+        except Exception as e:
+            print(f"Error in scheduled job {job.job_id}: {e}")
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._running_by_domain[job.domain] -= 1
+                if not self._running_by_domain[job.domain]:
+                    del self._running_by_domain[job.domain]
+                self._memory_in_flight -= job.memory_estimate
+                if job.interval_seconds is None:
+                    if self.jobs.get(job.job_id) is job:
+                        del self.jobs[job.job_id]
+                elif not job.removed:
+                    job.next_due = max(started + job.interval_seconds, time.time())
+                    self._push(job)
+                self._cond.notify_all()
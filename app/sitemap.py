@@ -0,0 +1,127 @@
+"""
+Sitemap discovery: robots.txt `Sitemap:` entries, sitemap indexes and (gzip-compressed) urlsets.
+
+Sitemaps are streamed: bodies are gunzipped incrementally and fed to an lxml pull
+parser chunk by chunk, and every <url> element is dropped once read, so a 50,000-URL
+sitemap never sits in memory as a tree.
+"""
+import zlib
+from urllib.parse import urljoin, urlparse
+from lxml import etree
+
+MAX_SITEMAPS = 50
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024  # the sitemaps.org limit for an uncompressed sitemap
+GZIP_MAGIC = b'\x1f\x8b'
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+def robots_sitemaps(robots_txt, base_url):
+    """Return the Sitemap: URLs listed in a robots.txt body."""
+    sitemaps = []
+    for line in robots_txt.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            sitemaps.append(urljoin(base_url, value.strip()))
+    return sitemaps
+
+class SitemapParser:
+    """Incremental sitemap parser; feed() raw (optionally gzipped) bytes, then close()."""
+    def __init__(self):
+        self.urls = []       # (loc, lastmod or None) from a <urlset>
+        self.sitemaps = []   # nested sitemap locations from a <sitemapindex>
+        self._parser = etree.XMLPullParser(events=('end',), resolve_entities=False, no_network=True, huge_tree=False)
+        self._gunzip = None
+        self._started = False
+        self._size = 0
+
+    def feed(self, data):
+        if not self._started:
+            self._started = True
+            if data[:2] == GZIP_MAGIC:
+                self._gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._gunzip is not None:
+            data = self._gunzip.decompress(data, MAX_SITEMAP_BYTES - self._size + 1)
+        self._size += len(data)
+        if self._size > MAX_SITEMAP_BYTES:
+            raise ValueError('sitemap exceeds the uncompressed size limit')
+        self._parser.feed(data)
+        self._drain()
+
+    def close(self):
+        self._parser.close()
+        self._drain()
+
+    def _drain(self):
+        for _, element in self._parser.read_events():
+            name = _local_name(element.tag)
+            if name not in ('url', 'sitemap'):
+                continue
+            loc = lastmod = None
+            for child in element:
+                child_name = _local_name(child.tag)
+                if child_name == 'loc' and child.text:
+                    loc = child.text.strip()
+                elif child_name == 'lastmod' and child.text:
+                    lastmod = child.text.strip()
+            if loc:
+                if name == 'url':
+                    self.urls.append((loc, lastmod))
+                else:
+                    self.sitemaps.append(loc)
+            # Drop the finished entry and any earlier siblings to keep memory flat
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+async def fetch_sitemap(client, url):
+    """Stream one sitemap; returns its SitemapParser, or None if it could not be read."""
+    parser = SitemapParser()
+    try:
+        async with client.stream('GET', url) as response:
+            if response.status_code != 200:
+                return None
+            async for chunk in response.aiter_raw():
+                parser.feed(chunk)
+        parser.close()
+    except Exception as e:
+        print(f"Skipping sitemap {url}: {e}")
+        return None
+    return parser
+
+async def discover_sitemap_urls(client, root_url, max_urls, accept=None, max_sitemaps=MAX_SITEMAPS):
+    """
+    Collect up to max_urls page URLs (those passing accept(url), if given) with their
+    <lastmod> from the site's sitemaps.
+    Sitemaps come from robots.txt, falling back to /sitemap.xml; sitemap indexes are
+    followed breadth-first up to max_sitemaps files. Returns a list of (url, lastmod).
+    """
+    parsed = urlparse(root_url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    queue = []
+    try:
+        response = await client.get(origin + '/robots.txt')
+        if response.status_code == 200:
+            queue = robots_sitemaps(response.text, origin)
+    except Exception:
+        pass
+    if not queue:
+        queue = [origin + '/sitemap.xml']
+
+    seen = set(queue)
+    found = []
+    fetched = 0
+    while queue and fetched < max_sitemaps and len(found) < max_urls:
+        sitemap_url = queue.pop(0)
+        fetched += 1
+        parser = await fetch_sitemap(client, sitemap_url)
+        if parser is None:
+            continue
+        urls = parser.urls if accept is None else [(url, lastmod) for url, lastmod in parser.urls if accept(url)]
+        found.extend(urls[:max_urls - len(found)])
+        for nested in parser.sitemaps:
+            if nested not in seen:
+                seen.add(nested)
+                queue.append(nested)
+    print(f"Discovered {len(found)} URLs from {fetched} sitemaps for {root_url}")
+    return found
@@ -0,0 +1,185 @@
+"""
+Content-addressed store of raw page bodies, so a task's llms.txt can be rebuilt without refetching.
+
+Each crawled page body is gzip-compressed into one file named after the page's content
+hash, so a page shared between runs or tasks is stored once. A SQLite index tracks each
+blob's size and last access; once the compressed total exceeds max_bytes the least
+recently used blobs are deleted. The total is kept in the index by triggers, so every
+process sharing the store sees the same one and evicts against it. A crawl's
+new_url_hashmap (url -> content_hash) together with this store is the snapshot that
+create_llms(..., from_snapshot=True) replays.
+
+The content hash is the page's fingerprint, which leaves out volatile parts (scripts,
+meta tags, forms, timestamps and the like; see app.fingerprint). Bodies that differ
+only in those parts share one blob, whichever was stored first: a page that only
+changed there keeps its earlier body, and so does the text llms-full.txt takes from it.
+Keying on the raw bytes instead would store a new blob on every crawl of a page with a
+changing timestamp. Titles, descriptions and links of replayed pages come from the
+crawl state, not from the blob.
+"""
+import gzip
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_SNAPSHOT_DIR = os.environ.get(
+    'LLMS_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'snapshots'),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get('LLMS_SNAPSHOT_MAX_MB', 512)) * 1024 * 1024
+COMPRESS_LEVEL = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_bodies (
+    content_hash TEXT PRIMARY KEY,
+    encoding TEXT,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS page_bodies_last_access ON page_bodies (last_access);
+CREATE TABLE IF NOT EXISTS page_bodies_total (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    stored_bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO page_bodies_total (id, stored_bytes) SELECT 0, COALESCE(SUM(stored_size), 0) FROM page_bodies;
+CREATE TRIGGER IF NOT EXISTS page_bodies_added AFTER INSERT ON page_bodies BEGIN
+    UPDATE page_bodies_total SET stored_bytes = stored_bytes + NEW.stored_size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS page_bodies_removed AFTER DELETE ON page_bodies BEGIN
+    UPDATE page_bodies_total SET stored_bytes = stored_bytes - OLD.stored_size WHERE id = 0;
+END;
+"""
+
+class SnapshotStore:
+    def __init__(self, path=DEFAULT_SNAPSHOT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, 'index.db'), timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        # One transaction, so no blob is added between the total being computed and its triggers being created
+        self._conn.executescript(f"BEGIN IMMEDIATE;{SCHEMA}COMMIT;")
+
+    def _stored_bytes(self):
+        return self._conn.execute("SELECT stored_bytes FROM page_bodies_total WHERE id = 0").fetchone()[0]
+
+    def _blob_path(self, content_hash):
+        return os.path.join(self.path, content_hash[:2], content_hash + '.gz')
+
+    def put(self, content_hash, body, encoding=None):
+        """Store a page body under its content hash; returns False if it was already stored."""
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE page_bodies SET last_access = ? WHERE content_hash = ?", (now, content_hash)
+            ).rowcount
+            self._conn.commit()
+        if updated:
+            return False
+        # Compress and write outside the lock; the rename makes the blob appear atomically
+        blob = gzip.compress(body, COMPRESS_LEVEL)
+        blob_path = self._blob_path(content_hash)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, blob_path)
+        evicted = []
+        with self._lock, self._conn:
+            # Taking the write lock first makes reading the total and evicting one step for every process
+            self._conn.execute('BEGIN IMMEDIATE')
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO page_bodies (content_hash, encoding, size, stored_size, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, encoding, len(body), len(blob), now),
+            ).rowcount
+            if inserted:
+                evicted = self._evict()
+        # Evicted blobs are removed once their rows are gone for good
+        for evicted_hash in evicted:
+            try:
+                os.remove(self._blob_path(evicted_hash))
+            except OSError:
+                pass
+        return bool(inserted)
+
+    def get(self, content_hash):
+        """Return (body, encoding) for a content hash, or None if it is not stored."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT encoding, stored_size FROM page_bodies WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE page_bodies SET last_access = ? WHERE content_hash = ?", (time.time(), content_hash))
+        if row is None:
+            self.misses += 1
+            return None
+        try:
+            with open(self._blob_path(content_hash), 'rb') as f:
+                body = gzip.decompress(f.read())
+        except (OSError, EOFError):
+            # The blob went missing or is corrupt; forget it
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM page_bodies WHERE content_hash = ?", (content_hash,))
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body, row[0]
+
+    def contains(self, content_hash):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM page_bodies WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row is not None
+
+    def touch(self, content_hashes):
+        """Mark blobs as recently used, e.g. pages a recrawl found unchanged without downloading them."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE page_bodies SET last_access = ? WHERE content_hash = ?",
+                                   ((now, content_hash) for content_hash in content_hashes))
+
+    def _evict(self):
+        """Delete the least recently used rows until the shared total fits max_bytes; returns their hashes."""
+        evicted = []
+        excess = self._stored_bytes() - self.max_bytes
+        while excess > 0:
+            rows = self._conn.execute(
+                "SELECT content_hash, stored_size FROM page_bodies ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for content_hash, stored_size in rows:
+                self._conn.execute("DELETE FROM page_bodies WHERE content_hash = ?", (content_hash,))
+                evicted.append(content_hash)
+                excess -= stored_size
+                if excess <= 0:
+                    break
+        self.evictions += len(evicted)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            (entries, raw_bytes) = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM page_bodies"
+            ).fetchone()
+            stored_bytes = self._stored_bytes()
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': entries,
+                'raw_bytes': raw_bytes, 'stored_bytes': stored_bytes}
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_snapshot_store():
+    """Return the process-wide snapshot store, creating it on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SnapshotStore()
+        return _default_store
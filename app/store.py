@@ -0,0 +1,597 @@
+"""
+Durable SQLite (WAL mode) store for scheduled tasks and their crawl state.
+
+Task metadata, the last generated llms.txt, its rendered sections and the per-URL
+hashes/validators (new_url_hashmap) live on disk, so tasks survive restarts and only the task being
+run has its hashmap loaded into memory. Each stored llms.txt is kept with its ETag, a version
+counter and precompressed bodies, so serving it costs no compression work.
+
+The same database coordinates the processes that share it (see app.coordination): named
+leases, each task's next due time, the runs due and which process has claimed them, and two
+counters so processes can tell what to reload: tasks_version, moved when a task is added,
+changed or deleted, and runs_version, moved when a run saves its task's status. Each saved
+status is stamped with the runs_version it moved to, so a process reloads only the tasks
+whose status changed since it last looked, not every task after every run.
+
+Background jobs (see app.jobs) keep their state and events here too, so any process can
+answer a poll or event stream of a job another process is running.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.compression import strong_etag, precompress
+
+DEFAULT_DB_PATH = os.environ.get(
+    'LLMS_DB_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'llms.db'),
+)
+
+# Hashmap entry fields stored in their own columns; everything else goes in `data`
+URL_STATE_COLUMNS = ('content_hash', 'etag', 'last_modified')
+
+TASK_COLUMNS = (
+    'task_id', 'base_url', 'trigger_interval_seconds', 'time_created', 'time_last_run', 'last_status',
+    'avoid_url_substring_list', 'use_llm', 'llm_instructions', 'anything_changed', 'max_pages', 'discovery', 'full_text',
+    'max_interval_seconds', 'revisit', 'profile', 'last_profile', 'last_changes', 'last_revisits',
+)
+# Columns written at the end of each run; the task's settings may have been changed meanwhile by another process
+RUN_STATE_COLUMNS = (
+    'time_last_run', 'last_status', 'anything_changed', 'revisit', 'last_profile', 'last_changes', 'last_revisits',
+)
+JSON_TASK_COLUMNS = ('avoid_url_substring_list', 'revisit', 'last_profile', 'last_changes', 'last_revisits')
+BOOL_TASK_COLUMNS = ('use_llm', 'anything_changed', 'full_text', 'profile')
+
+# Columns added after the first release, by table; older databases are migrated on open
+ADDED_TASK_COLUMNS = {
+    'discovery': "TEXT NOT NULL DEFAULT 'links'",
+    'full_text': "INTEGER NOT NULL DEFAULT 0",
+    'max_interval_seconds': "INTEGER",
+    'revisit': "TEXT",
+    'profile': "INTEGER NOT NULL DEFAULT 0",
+    'last_profile': "TEXT",
+    'last_changes': "TEXT",
+    'last_revisits': "TEXT",
+    'run_version': "INTEGER NOT NULL DEFAULT 0",
+}
+ADDED_RESULT_COLUMNS = {
+    'etag': "TEXT",
+    'result_gzip': "BLOB",
+    'result_br': "BLOB",
+    'version': "INTEGER NOT NULL DEFAULT 0",
+}
+ADDED_RUN_COLUMNS = {
+    'kind': "TEXT NOT NULL DEFAULT 'scheduled'",
+}
+ADDED_COLUMNS = {'tasks': ADDED_TASK_COLUMNS, 'task_results': ADDED_RESULT_COLUMNS, 'task_runs': ADDED_RUN_COLUMNS}
+
+# Condition of INSERT ... SELECT statements writing a task's crawl state (the task id is its last parameter), so a
+# run that finishes after its task was deleted leaves nothing behind
+TASK_EXISTS = "WHERE EXISTS (SELECT 1 FROM tasks WHERE task_id = ?)"
+
+# Job columns a job may update as it runs; the JSON ones are encoded on the way in and out
+JOB_COLUMNS = ('status', 'error', 'pages', 'outputs', 'files', 'finished')
+JSON_JOB_COLUMNS = ('outputs', 'files')
+
+# Characters of each result included in task summaries
+RESULT_PREVIEW_CHARS = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    base_url TEXT NOT NULL,
+    trigger_interval_seconds INTEGER NOT NULL,
+    time_created TEXT,
+    time_last_run TEXT,
+    last_status TEXT,
+    avoid_url_substring_list TEXT NOT NULL DEFAULT '[]',
+    use_llm INTEGER NOT NULL DEFAULT 0,
+    llm_instructions TEXT NOT NULL DEFAULT '',
+    anything_changed INTEGER NOT NULL DEFAULT 0,
+    max_pages INTEGER NOT NULL DEFAULT 20,
+    discovery TEXT NOT NULL DEFAULT 'links',
+    full_text INTEGER NOT NULL DEFAULT 0,
+    max_interval_seconds INTEGER,
+    revisit TEXT,
+    profile INTEGER NOT NULL DEFAULT 0,
+    last_profile TEXT,
+    last_changes TEXT,
+    last_revisits TEXT,
+    run_version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS task_results (
+    task_id TEXT PRIMARY KEY,
+    last_result TEXT,
+    etag TEXT,
+    result_gzip BLOB,
+    result_br BLOB,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS task_sections (
+    task_id TEXT PRIMARY KEY,
+    sections TEXT
+);
+CREATE TABLE IF NOT EXISTS url_state (
+    task_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    content_hash TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    data TEXT,
+    PRIMARY KEY (task_id, url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS url_state_content_hash ON url_state (content_hash);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_schedule (
+    task_id TEXT PRIMARY KEY,
+    domain TEXT,
+    memory_estimate INTEGER NOT NULL DEFAULT 0,
+    next_due REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_runs (
+    run_id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'scheduled',
+    due_at REAL NOT NULL,
+    domain TEXT,
+    memory_estimate INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    claimed_by TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS task_runs_open ON task_runs (status, due_at);
+CREATE INDEX IF NOT EXISTS task_runs_task ON task_runs (task_id, status);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'running',
+    error TEXT,
+    pages INTEGER NOT NULL DEFAULT 0,
+    outputs TEXT NOT NULL DEFAULT '{}',
+    files TEXT NOT NULL DEFAULT '[]',
+    last_event INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+"""
+
+class TaskStore:
+    """Thread-safe access to the task database; each thread gets its own connection."""
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column, definition in columns.items():
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            # On a column that older databases only have once migrated
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_run_version ON tasks (run_version)")
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _task_values(task, columns):
+        values = []
+        for column in columns:
+            value = getattr(task, column)
+            if column in JSON_TASK_COLUMNS:
+                value = json.dumps(value) if value is not None else None
+            values.append(value)
+        return values
+
+    @staticmethod
+    def _bump_version(conn, key):
+        """Move counter key of store_meta on by one and return its new value."""
+        conn.execute("INSERT INTO store_meta (key, value) VALUES (?, 1) "
+                     "ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,))
+        return conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()['value']
+
+    def versions(self):
+        """(tasks_version, runs_version), as moved by every process sharing the database."""
+        rows = dict(self.connection().execute(
+            "SELECT key, value FROM store_meta WHERE key IN ('tasks_version', 'runs_version')"
+        ).fetchall())
+        return rows.get('tasks_version', 0), rows.get('runs_version', 0)
+
+    @staticmethod
+    def _decode_task(row):
+        task = dict(row)
+        for column in JSON_TASK_COLUMNS:
+            if column in task:
+                task[column] = json.loads(task[column]) if task[column] else None
+        for column in BOOL_TASK_COLUMNS:
+            if column in task:
+                task[column] = bool(task[column])
+        return task
+
+    def save_task(self, task):
+        """Insert or update a task's metadata (not its result or hashmap)."""
+        placeholders = ', '.join('?' for _ in TASK_COLUMNS)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in TASK_COLUMNS[1:])
+        with self.connection() as conn:
+            conn.execute(
+                f"INSERT INTO tasks ({', '.join(TASK_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(task_id) DO UPDATE SET {updates}",
+                self._task_values(task, TASK_COLUMNS),
+            )
+            self._bump_version(conn, 'tasks_version')
+
+    def save_run_state(self, task):
+        """
+        Update only the status columns a run writes (RUN_STATE_COLUMNS), keeping the stored settings.
+        Moves runs_version, not tasks_version: other processes pick up just this task's status.
+        """
+        updates = ', '.join(f'{column} = ?' for column in RUN_STATE_COLUMNS)
+        with self.connection() as conn:
+            run_version = self._bump_version(conn, 'runs_version')
+            conn.execute(f"UPDATE tasks SET {updates}, run_version = ? WHERE task_id = ?",
+                         self._task_values(task, RUN_STATE_COLUMNS) + [run_version, task.task_id])
+
+    def load_tasks(self):
+        """Return every stored task's metadata as a dict, oldest first."""
+        rows = self.connection().execute(
+            f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks ORDER BY time_created, rowid"
+        ).fetchall()
+        return [self._decode_task(row) for row in rows]
+
+    def load_run_states(self, since):
+        """Return {task_id: RUN_STATE_COLUMNS values} of the tasks whose status was saved after runs_version since."""
+        rows = self.connection().execute(
+            f"SELECT task_id, {', '.join(RUN_STATE_COLUMNS)} FROM tasks WHERE run_version > ?", (since,)
+        ).fetchall()
+        states = {}
+        for row in rows:
+            state = self._decode_task(row)
+            states[state.pop('task_id')] = state
+        return states
+
+    def has_task(self, task_id):
+        return self.connection().execute("SELECT 1 FROM tasks WHERE task_id = ?", (task_id,)).fetchone() is not None
+
+    def delete_task(self, task_id):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+            conn.execute("DELETE FROM task_results WHERE task_id = ?", (task_id,))
+            conn.execute("DELETE FROM task_sections WHERE task_id = ?", (task_id,))
+            conn.execute("DELETE FROM url_state WHERE task_id = ?", (task_id,))
+            conn.execute("DELETE FROM task_schedule WHERE task_id = ?", (task_id,))
+            conn.execute("DELETE FROM task_runs WHERE task_id = ?", (task_id,))
+            self._bump_version(conn, 'tasks_version')
+
+    def get_result(self, task_id):
+        row = self.connection().execute(
+            "SELECT last_result FROM task_results WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return row['last_result'] if row else None
+
+    def set_result(self, task_id, result):
+        """
+        Store a task's llms.txt with its ETag and compressed bodies; the version only moves when it changes.
+        Like every write of a task's crawl state, it is dropped if the task was deleted meanwhile (returns False).
+        """
+        etag = result_gzip = result_br = None
+        if result is not None:
+            data = result.encode('utf-8')
+            etag = strong_etag(data)
+            encoded = precompress(data)
+            result_gzip, result_br = encoded['gzip'], encoded['br']
+        with self.connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO task_results (task_id, last_result, etag, result_gzip, result_br, version) "
+                f"SELECT ?, ?, ?, ?, ?, 1 {TASK_EXISTS} "
+                "ON CONFLICT(task_id) DO UPDATE SET last_result = excluded.last_result, etag = excluded.etag, "
+                "result_gzip = excluded.result_gzip, result_br = excluded.result_br, "
+                "version = task_results.version + (task_results.etag IS NOT excluded.etag)",
+                (task_id, result, etag, result_gzip, result_br, task_id),
+            )
+            return cursor.rowcount == 1
+
+    def get_served_result(self, task_id):
+        """
+        Return {etag, version, identity, gzip, br} for serving a task's llms.txt (br is None
+        without brotli), or None if it has no result. Results stored before ETags existed are
+        compressed on first use.
+        """
+        row = self.connection().execute(
+            "SELECT last_result, etag, result_gzip, result_br, version FROM task_results WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        if row is None or row['last_result'] is None:
+            return None
+        if row['etag'] is None or row['result_gzip'] is None:
+            self.set_result(task_id, row['last_result'])
+            return self.get_served_result(task_id)
+        return {'etag': row['etag'], 'version': row['version'], 'identity': row['last_result'].encode('utf-8'),
+                'gzip': row['result_gzip'], 'br': row['result_br']}
+
+    def result_summaries(self):
+        """Return {task_id: {etag, version, size, preview}} for every stored result, without the result bodies."""
+        rows = self.connection().execute(
+            "SELECT task_id, etag, version, length(CAST(last_result AS BLOB)) AS size, substr(last_result, 1, ?) AS preview "
+            "FROM task_results",
+            (RESULT_PREVIEW_CHARS,),
+        ).fetchall()
+        return {row['task_id']: {'etag': row['etag'], 'version': row['version'], 'size': row['size'] or 0,
+                                 'preview': row['preview']} for row in rows}
+
+    def get_sections(self, task_id):
+        """Return the rendered markdown sections kept from the task's last run."""
+        row = self.connection().execute(
+            "SELECT sections FROM task_sections WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return json.loads(row['sections']) if row and row['sections'] else None
+
+    def set_sections(self, task_id, sections):
+        with self.connection() as conn:
+            cursor = conn.execute(
+                f"INSERT INTO task_sections (task_id, sections) SELECT ?, ? {TASK_EXISTS} "
+                "ON CONFLICT(task_id) DO UPDATE SET sections = excluded.sections",
+                (task_id, json.dumps(sections), task_id),
+            )
+            return cursor.rowcount == 1
+
+    def load_url_hashmap(self, task_id):
+        """Rebuild a task's new_url_hashmap from its url_state rows (None if it has none)."""
+        rows = self.connection().execute(
+            "SELECT url, content_hash, etag, last_modified, data FROM url_state WHERE task_id = ?", (task_id,)
+        ).fetchall()
+        if not rows:
+            return None
+        hashmap = {}
+        for row in rows:
+            entry = json.loads(row['data']) if row['data'] else {}
+            for column in URL_STATE_COLUMNS:
+                entry[column] = row[column]
+            hashmap[row['url']] = entry
+        return hashmap
+
+    def replace_url_hashmap(self, task_id, hashmap):
+        """Replace a task's url_state with the given new_url_hashmap in one transaction; False if the task is gone."""
+        rows = []
+        for url, entry in (hashmap or {}).items():
+            if not isinstance(entry, dict):
+                entry = {'content_hash': entry}
+            data = {key: value for key, value in entry.items() if key not in URL_STATE_COLUMNS}
+            rows.append((task_id, url, entry.get('content_hash'), entry.get('etag'), entry.get('last_modified'),
+                         json.dumps(data) if data else None, task_id))
+        with self.connection() as conn:
+            # The DELETE takes the write lock, so the task cannot be deleted between it and the inserts
+            conn.execute("DELETE FROM url_state WHERE task_id = ?", (task_id,))
+            if not self.has_task(task_id):
+                return False
+            conn.executemany(
+                "INSERT INTO url_state (task_id, url, content_hash, etag, last_modified, data) "
+                f"SELECT ?, ?, ?, ?, ?, ? {TASK_EXISTS}",
+                rows,
+            )
+            return True
+
+    def acquire_lease(self, name, holder, seconds, now=None):
+        """Take or renew lease `name` for holder if it is free, expired or already holder's; True if holder now has it."""
+        now = time.time() if now is None else now
+        with self.connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                (name, holder, now + seconds, now),
+            )
+            return cursor.rowcount == 1
+
+    def release_lease(self, name, holder):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def lease_holder(self, name, now=None):
+        """Return who holds lease `name`, or None if nobody does."""
+        now = time.time() if now is None else now
+        row = self.connection().execute(
+            "SELECT holder FROM leases WHERE name = ? AND expires_at >= ?", (name, now)
+        ).fetchone()
+        return row['holder'] if row else None
+
+    def schedule_task(self, task_id, domain, memory_estimate, next_due):
+        """Put a task on the shared schedule at next_due; a task already on it keeps its due time."""
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT INTO task_schedule (task_id, domain, memory_estimate, next_due) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(task_id) DO UPDATE SET domain = excluded.domain, memory_estimate = excluded.memory_estimate",
+                (task_id, domain, memory_estimate, next_due),
+            )
+
+    def enqueue_due_runs(self, due_by):
+        """
+        Create a pending run for every task due by due_by that has no scheduled run open. Run ids are the
+        task and its due time, so a run is created once however many processes enqueue it.
+        """
+        with self.connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO task_runs (run_id, task_id, due_at, domain, memory_estimate) "
+                "SELECT s.task_id || '@' || printf('%.3f', s.next_due), s.task_id, s.next_due, s.domain, s.memory_estimate "
+                "FROM task_schedule s WHERE s.next_due <= ? AND NOT EXISTS ("
+                "SELECT 1 FROM task_runs r WHERE r.task_id = s.task_id AND r.kind = 'scheduled' "
+                "AND r.status IN ('pending', 'claimed'))",
+                (due_by,),
+            )
+            return cursor.rowcount
+
+    def claim_run(self, worker_id, now, lease_seconds, due_by=None):
+        """
+        Claim the earliest scheduled run due by due_by (default now) that is pending, or whose claim expired,
+        whose task has no other run claimed (a rebuild, see claim_task_run) and whose domain has no other
+        claimed run; returns it with its `attempt` number (the fencing token), or None.
+        """
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                "SELECT r.run_id, r.task_id, r.due_at, r.domain, r.memory_estimate, r.attempts FROM task_runs r "
+                "WHERE r.kind = 'scheduled' AND r.due_at <= ? "
+                "AND (r.status = 'pending' OR (r.status = 'claimed' AND r.lease_expires_at < ?)) "
+                "AND NOT EXISTS (SELECT 1 FROM task_runs o WHERE o.task_id = r.task_id AND o.run_id != r.run_id "
+                "AND o.status = 'claimed' AND o.lease_expires_at >= ?) "
+                "AND (r.domain IS NULL OR r.domain NOT IN (SELECT domain FROM task_runs WHERE status = 'claimed' "
+                "AND lease_expires_at >= ? AND domain IS NOT NULL)) "
+                "ORDER BY r.due_at LIMIT 1",
+                (now if due_by is None else due_by, now, now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE task_runs SET status = 'claimed', claimed_by = ?, lease_expires_at = ?, attempts = attempts + 1 "
+                "WHERE run_id = ?",
+                (worker_id, now + lease_seconds, row['run_id']),
+            )
+        run = dict(row)
+        run['attempt'] = run.pop('attempts') + 1
+        return run
+
+    def claim_task_run(self, task_id, kind, worker_id, now, lease_seconds):
+        """
+        Claim a run of kind (e.g. 'rebuild') of an existing task, started now, unless a run of the task is claimed
+        already; returns it like claim_run, or None. Scheduled runs of the task wait until it is finished.
+        """
+        run_id = f"{task_id}@{kind}-{now:.3f}-{os.urandom(4).hex()}"
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if conn.execute(
+                "SELECT 1 FROM task_runs WHERE task_id = ? AND status = 'claimed' AND lease_expires_at >= ?",
+                (task_id, now),
+            ).fetchone():
+                return None
+            inserted = conn.execute(
+                "INSERT INTO task_runs (run_id, task_id, kind, due_at, status, claimed_by, lease_expires_at, attempts) "
+                f"SELECT ?, ?, ?, ?, 'claimed', ?, ?, 1 {TASK_EXISTS}",
+                (run_id, task_id, kind, now, worker_id, now + lease_seconds, task_id),
+            ).rowcount
+        if not inserted:
+            return None
+        return {'run_id': run_id, 'task_id': task_id, 'due_at': now, 'domain': None, 'memory_estimate': 0, 'attempt': 1}
+
+    def renew_run_leases(self, worker_id, expires_at):
+        """Extend the leases of every run worker_id has claimed."""
+        with self.connection() as conn:
+            conn.execute(
+                "UPDATE task_runs SET lease_expires_at = ? WHERE claimed_by = ? AND status = 'claimed'",
+                (expires_at, worker_id),
+            )
+
+    def finish_run(self, run, worker_id, started_at, next_due=None):
+        """
+        Mark a claimed run done and move its task to next_due (None leaves the schedule alone).
+        Returns False, changing nothing, if the claim was lost to another worker meanwhile.
+        """
+        with self.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE task_runs SET status = 'done', started_at = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE run_id = ? AND claimed_by = ? AND attempts = ? AND status = 'claimed'",
+                (started_at, time.time(), run['run_id'], worker_id, run['attempt']),
+            )
+            if cursor.rowcount and next_due is not None:
+                conn.execute("UPDATE task_schedule SET next_due = ? WHERE task_id = ?", (next_due, run['task_id']))
+            return cursor.rowcount == 1
+
+    def release_runs(self, worker_id):
+        """Hand the runs worker_id claimed but did not finish back to the other workers."""
+        with self.connection() as conn:
+            conn.execute(
+                "UPDATE task_runs SET status = 'pending', claimed_by = NULL, lease_expires_at = NULL "
+                "WHERE claimed_by = ? AND status = 'claimed'",
+                (worker_id,),
+            )
+
+    def prune_runs(self, before):
+        """Delete the records of runs finished before `before`, and of unscheduled runs whose claim expired before then."""
+        with self.connection() as conn:
+            conn.execute("DELETE FROM task_runs WHERE (status = 'done' AND finished_at < ?) "
+                         "OR (kind != 'scheduled' AND status = 'claimed' AND lease_expires_at < ?)", (before, before))
+
+    def create_job(self, job_id, created):
+        with self.connection() as conn:
+            conn.execute("INSERT INTO jobs (job_id, created) VALUES (?, ?)", (job_id, created))
+
+    @staticmethod
+    def _job_updates(fields):
+        columns, values = [], []
+        for column, value in fields.items():
+            if column not in JOB_COLUMNS:
+                raise ValueError(f"Unknown job column: {column}")
+            columns.append(f'{column} = ?')
+            values.append(json.dumps(value) if column in JSON_JOB_COLUMNS else value)
+        return columns, values
+
+    def add_job_event(self, job_id, event, **fields):
+        """Append an event to a job and update the given JOB_COLUMNS of the job in one transaction."""
+        columns, values = self._job_updates(fields)
+        with self.connection() as conn:
+            conn.execute("INSERT INTO job_events (job_id, seq, type, data) VALUES (?, ?, ?, ?)",
+                         (job_id, event['seq'], event['type'], json.dumps(event['data'])))
+            conn.execute(f"UPDATE jobs SET {', '.join(columns + ['last_event = ?'])} WHERE job_id = ?",
+                         values + [event['seq'], job_id])
+
+    def update_job(self, job_id, **fields):
+        columns, values = self._job_updates(fields)
+        with self.connection() as conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(columns)} WHERE job_id = ?", values + [job_id])
+
+    def load_job(self, job_id):
+        """Return a job's state as a dict, or None if there is no such job."""
+        row = self.connection().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for column in JSON_JOB_COLUMNS:
+            job[column] = json.loads(job[column])
+        return job
+
+    def load_job_events(self, job_id, after=0):
+        """Return a job's events after sequence number `after`, in order."""
+        rows = self.connection().execute(
+            "SELECT seq, type, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+        ).fetchall()
+        return [{'seq': row['seq'], 'type': row['type'], 'data': json.loads(row['data'])} for row in rows]
+
+    def prune_jobs(self, finished_before, created_before):
+        """
+        Delete the jobs finished before finished_before, and those never finished (their process died)
+        created before created_before, with their events; returns the files the deleted jobs wrote.
+        """
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT job_id, files FROM jobs WHERE finished < ? OR (finished IS NULL AND created < ?)",
+                (finished_before, created_before),
+            ).fetchall()
+            for row in rows:
+                conn.execute("DELETE FROM job_events WHERE job_id = ?", (row['job_id'],))
+                conn.execute("DELETE FROM jobs WHERE job_id = ?", (row['job_id'],))
+        return [path for row in rows for path in json.loads(row['files'])]
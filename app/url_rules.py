@@ -0,0 +1,203 @@
+r"""
+Compiled URL exclusion rules.
+
+Each rule is one line of the "URL Substrings to Avoid" box:
+  /careers          plain substring (the default)
+  glob:*/tag/*      shell-style pattern matched against the whole URL
+  re:/page/\d+$     regular expression searched in the URL
+
+Plain substrings are compiled into a single Aho-Corasick automaton, so checking a
+URL costs time proportional to its length no matter how many rules there are.
+Glob and regex rules are combined into one compiled pattern.
+
+Rules come from users and are run against every discovered URL, so they are validated
+first (validate_rules): regex rules must compile, stay under a length cap and not nest
+repeats or alternations inside repeats (as in (a+)+), the usual sources of catastrophic
+backtracking.
+"""
+import fnmatch
+import os
+import re
+from collections import deque
+from functools import lru_cache
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+GLOB_PREFIX = 'glob:'
+REGEX_PREFIX = 're:'
+# Set LLMS_REGEX_RULES=0 to accept only substring and glob: rules from API callers
+ALLOW_REGEX_RULES = os.environ.get('LLMS_REGEX_RULES', '1') != '0'
+MAX_RULE_CHARS = 2000
+MAX_PATTERN_CHARS = 256
+# Distinct rule lists whose compiled matchers are kept (see compile_avoid_rules)
+MATCHER_CACHE_SIZE = 1024
+
+class InvalidRuleError(ValueError):
+    """An avoid rule that cannot be used; `rule` is the offending line."""
+    def __init__(self, rule, reason):
+        super().__init__(f"Invalid avoid rule {rule!r}: {reason}")
+        self.rule = rule
+        self.reason = reason
+
+class SubstringAutomaton:
+    """Aho-Corasick automaton answering "does the text contain any of the patterns?"."""
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.terminal = [False]
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append(False)
+            state = nxt
+        self.terminal[state] = True
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                # A state also matches if any suffix of it is a complete pattern
+                self.terminal[nxt] = self.terminal[nxt] or self.terminal[self.fail[nxt]]
+        # Transitions computed while searching are cached here, turning the
+        # automaton into a DFA lazily for the characters URLs actually use
+        self.delta = [dict(edges) for edges in self.goto]
+
+    def _transition(self, state, ch):
+        current = state
+        while True:
+            nxt = self.goto[current].get(ch)
+            if nxt is not None or current == 0:
+                nxt = nxt or 0
+                break
+            current = self.fail[current]
+        self.delta[state][ch] = nxt
+        return nxt
+
+    def search(self, text):
+        if self.terminal[0]:
+            return True
+        delta, terminal = self.delta, self.terminal
+        state = 0
+        for ch in text:
+            nxt = delta[state].get(ch)
+            if nxt is None:
+                nxt = self._transition(state, ch)
+            state = nxt
+            if terminal[state]:
+                return True
+        return False
+
+def _rule_to_regex(rule):
+    if rule.startswith(GLOB_PREFIX):
+        return fnmatch.translate(rule[len(GLOB_PREFIX):])
+    return rule[len(REGEX_PREFIX):]
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+def _backtracking_risk(items, in_repeat=False):
+    """
+    Why a parsed pattern could backtrack catastrophically, or None: a repeat or an
+    alternation inside a repeat, as in (a+)+, (.*a){20} or (a|aa)*.
+    """
+    for op, value in items:
+        if op in _REPEATS:
+            high, body = value[1], value[2]
+            if in_repeat and high > 1:
+                return "nested repeats such as (a+)+ can take exponential time"
+            reason = _backtracking_risk(body, in_repeat or high > 1)
+        elif op is sre_parse.BRANCH:
+            if in_repeat:
+                return "alternations inside repeats such as (a|aa)* can take exponential time"
+            reason = next(filter(None, (_backtracking_risk(branch, in_repeat) for branch in value[1])), None)
+        elif op is sre_parse.SUBPATTERN:
+            reason = _backtracking_risk(value[-1], in_repeat)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            reason = _backtracking_risk(value[1], in_repeat)
+        else:
+            reason = None
+        if reason:
+            return reason
+    return None
+
+def validate_rule(rule, allow_regex=True):
+    """Raise InvalidRuleError if a rule cannot be compiled or could make matching a URL take exponential time."""
+    if len(rule) > MAX_RULE_CHARS:
+        raise InvalidRuleError(rule, f"longer than {MAX_RULE_CHARS} characters")
+    if rule.startswith(GLOB_PREFIX):
+        if len(rule) - len(GLOB_PREFIX) > MAX_PATTERN_CHARS:
+            raise InvalidRuleError(rule, f"pattern longer than {MAX_PATTERN_CHARS} characters")
+        return
+    if not rule.startswith(REGEX_PREFIX):
+        return
+    if not allow_regex:
+        raise InvalidRuleError(rule, "re: rules are disabled (LLMS_REGEX_RULES=0); use a substring or glob: rule")
+    pattern = rule[len(REGEX_PREFIX):]
+    if len(pattern) > MAX_PATTERN_CHARS:
+        raise InvalidRuleError(rule, f"pattern longer than {MAX_PATTERN_CHARS} characters")
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, OverflowError, RecursionError) as e:
+        raise InvalidRuleError(rule, f"not a valid regular expression ({e})")
+    reason = _backtracking_risk(parsed)
+    if reason:
+        raise InvalidRuleError(rule, reason)
+
+def validate_rules(rules, allow_regex=True):
+    """Validate each rule in turn (see validate_rule); returns the rules."""
+    for rule in rules:
+        validate_rule(rule, allow_regex)
+    return rules
+
+class UrlRuleMatcher:
+    """A compiled set of avoid rules; compile once per task and reuse for every crawl. Raises InvalidRuleError."""
+    def __init__(self, rules=None):
+        self.rules = validate_rules([rule for rule in (rules or []) if rule])
+        substrings = [rule for rule in self.rules if not rule.startswith((GLOB_PREFIX, REGEX_PREFIX))]
+        patterns = [_rule_to_regex(rule) for rule in self.rules if rule.startswith((GLOB_PREFIX, REGEX_PREFIX))]
+        self.automaton = SubstringAutomaton(substrings) if substrings else None
+        self.pattern = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns)) if patterns else None
+
+    def matches(self, url):
+        """Return True if the URL hits any rule."""
+        if self.automaton is not None and self.automaton.search(url):
+            return True
+        if self.pattern is not None and self.pattern.search(url):
+            return True
+        return False
+
+    def __bool__(self):
+        return bool(self.rules)
+
+@lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def _cached_matcher(rules):
+    return UrlRuleMatcher(rules)
+
+def compile_avoid_rules(rules):
+    """
+    Return a UrlRuleMatcher for a list of rules, passing an already compiled matcher through.
+    Matchers are cached by rule list, so tasks with the same rules share one and reloading
+    tasks compiles nothing. Matching only adds idempotent entries to the automaton's
+    transition cache, so threads can share a matcher.
+    """
+    if isinstance(rules, UrlRuleMatcher):
+        return rules
+    return _cached_matcher(tuple(rules or ()))
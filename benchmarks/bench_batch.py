@@ -0,0 +1,61 @@
+"""
+Batch generation time against the fan-out limits, and resume after an interruption.
+
+Serves several fixture sites (one host each) and runs the same batch at growing
+concurrency: total time should fall with the limit instead of staying at the sum of
+the crawls. Then runs part of a batch, restarts it on the same results file and checks
+that the finished sites are skipped.
+
+    python -m benchmarks.bench_batch --sites 16 --pages 10 --concurrency 1 4 16
+"""
+import argparse
+import contextlib
+import json
+import os
+import tempfile
+
+# Many crawls share this process; parse in their threads rather than in a pool per crawl
+os.environ.setdefault('LLMS_PARSE_WORKERS', '0')
+
+from app.batch import BatchRunner  # noqa: E402  (reads LLMS_PARSE_WORKERS at import)
+from benchmarks.fixture_site import FixtureSite  # noqa: E402
+
+
+def run_batch(sites, output_path, concurrency, resume=True):
+    runner = BatchRunner(sites, output_path, concurrency=concurrency, per_domain=1, resume=resume)
+    return runner.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sites', type=int, default=16)
+    parser.add_argument('--pages', type=int, default=10, help='pages per site')
+    parser.add_argument('--delay', type=float, default=0.05, help='fixture response delay in seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack, tempfile.TemporaryDirectory() as path:
+        fixtures = [stack.enter_context(FixtureSite(page_count=args.pages, fanout=3, delay=args.delay))
+                    for _ in range(args.sites)]
+        sites = [{'id': f'site-{i}', 'url': fixture.url, 'maxPages': args.pages} for i, fixture in enumerate(fixtures)]
+
+        baseline = None
+        for concurrency in args.concurrency:
+            summary = run_batch(sites, os.path.join(path, f'batch-{concurrency}.jsonl'), concurrency, resume=False)
+            baseline = baseline or summary['elapsed_seconds']
+            print(f"concurrency {concurrency:3d}  {summary['ok']}/{summary['total']} sites ok in "
+                  f"{summary['elapsed_seconds']:6.2f}s ({baseline / summary['elapsed_seconds']:4.1f}x)")
+
+        output_path = os.path.join(path, 'resumed.jsonl')
+        half = run_batch(sites[:len(sites) // 2], output_path, max(args.concurrency))
+        resumed = run_batch(sites, output_path, max(args.concurrency))
+        with open(output_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert resumed['skipped'] == half['ok'], (half, resumed)
+        assert sorted(record['id'] for record in records) == sorted(site['id'] for site in sites)
+        print(f"resume      first run {half['ok']} sites, restart skipped {resumed['skipped']} and ran "
+              f"{resumed['ok'] + resumed['errors']}; {len(records)} records, one per site")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Scheduled runs shared by several server processes, with the leader killed midway.
+
+Creates tasks on local fixture sites in a temporary task database, then for each worker
+count starts that many processes running a TaskManager on the database (as gunicorn
+workers would) and lets them run the tasks for --duration seconds. With --kill-leader,
+the process holding the scheduler lease is killed (SIGKILL) halfway through, and the
+time until another process takes over is reported.
+
+Every run is checked from the database and the fixture servers:
+- runs done: runs recorded done in task_runs, each exactly once by construction;
+- crawls: root page requests, one per crawl started;
+- overlaps: runs of the same task that ran at the same time (must be 0);
+- extra crawls: crawls beyond the runs done. Only the runs the killed process had started
+  may be crawled again, so this must not exceed the runs reclaimed after the kill (it can be
+  negative when a crawl's root request failed to reach an overloaded fixture server).
+
+    python -m benchmarks.bench_coordination --workers 1 3 --tasks 24 --duration 20 --kill-leader
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixture_site import FixtureSite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker():
+    """Run a TaskManager until SIGTERM, like one server process."""
+    import threading
+    import run
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    manager = run.TaskManager()
+    print(f'worker {manager.coordinator.worker_id} ready', flush=True)
+    stop.wait()
+    manager.shutdown()
+    sys.exit(0)
+
+
+def holder_pid(store):
+    holder = store.lease_holder('scheduler')
+    return int(holder.split(':')[-2]) if holder else None
+
+
+def run_workers(count, args):
+    data_dir = tempfile.mkdtemp(prefix='bench_coordination_')
+    env = dict(os.environ, LLMS_DB_PATH=os.path.join(data_dir, 'llms.db'), LLMS_LEASE_SECONDS=str(args.lease),
+               LLMS_CRAWL_WORKERS=str(args.crawl_workers), LLMS_PARSE_WORKERS='0', LLMS_METRICS='0')
+    from app.store import TaskStore
+    store = TaskStore(env['LLMS_DB_PATH'])
+
+    sites = [FixtureSite(page_count=args.pages, fanout=3, delay=args.delay) for _ in range(args.sites)]
+    for site in sites:
+        site.__enter__()
+    import run
+    # Tasks are only created here; this process runs none of them
+    manager = run.TaskManager(store=store, run_scheduler=False)
+    for i in range(args.tasks):
+        manager.add_task(f'task-{i}', sites[i % len(sites)].url, args.interval, max_pages=args.pages,
+                         max_interval_seconds=args.interval)
+    manager.shutdown()
+
+    log = open(os.path.join(data_dir, 'workers.log'), 'w')
+    processes = [subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_coordination', '--worker'], cwd=ROOT, env=env,
+                                  stdout=log, stderr=subprocess.STDOUT) for _ in range(count)]
+    start = time.time()
+    failover = killed = None
+    try:
+        if args.kill_leader and count > 1:
+            time.sleep(args.duration / 2)
+            pid = holder_pid(store)
+            victim = next((p for p in processes if p.pid == pid), None)
+            if victim is not None:
+                victim.kill()
+                killed = time.time()
+                while time.time() - killed < args.lease * 4:
+                    new_pid = holder_pid(store)
+                    if new_pid and new_pid != pid:
+                        failover = time.time() - killed
+                        break
+                    time.sleep(0.05)
+        time.sleep(max(0.0, start + args.duration - time.time()))
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+        log.close()
+    elapsed = time.time() - start
+
+    conn = store.connection()
+    done = conn.execute("SELECT COUNT(*) FROM task_runs WHERE status = 'done'").fetchone()[0]
+    reclaimed = conn.execute('SELECT COUNT(*) FROM task_runs WHERE attempts > 1').fetchone()[0]
+    overlaps = conn.execute(
+        'SELECT COUNT(*) FROM task_runs a JOIN task_runs b ON a.task_id = b.task_id AND a.run_id < b.run_id '
+        "WHERE a.status = 'done' AND b.status = 'done' AND a.started_at < b.finished_at AND b.started_at < a.finished_at"
+    ).fetchone()[0]
+    lag = conn.execute("SELECT AVG(started_at - due_at) FROM task_runs WHERE status = 'done'").fetchone()[0] or 0.0
+    crawls = sum(site.root_requests for site in sites)
+    for site in sites:
+        site.__exit__(None, None, None)
+    return {
+        'workers': count, 'runs_per_second': done / elapsed, 'done': done, 'crawls': crawls, 'reclaimed': reclaimed,
+        'overlaps': overlaps, 'extra': crawls - done, 'lag': lag, 'failover': failover, 'killed': killed is not None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 3])
+    parser.add_argument('--tasks', type=int, default=24)
+    parser.add_argument('--sites', type=int, default=12)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--delay', type=float, default=0.02, help='fixture server latency per request')
+    parser.add_argument('--interval', type=int, default=1, help='seconds between runs of each task')
+    parser.add_argument('--crawl-workers', type=int, default=2, help='LLMS_CRAWL_WORKERS of each process')
+    parser.add_argument('--lease', type=float, default=3, help='LLMS_LEASE_SECONDS')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--kill-leader', action='store_true')
+    args = parser.parse_args()
+    if args.worker:
+        worker()
+
+    failed = False
+    for count in args.workers:
+        result = run_workers(count, args)
+        ok = result['overlaps'] == 0 and result['extra'] <= result['reclaimed']
+        failed |= not ok
+        failover = f"leader failover {result['failover']:.1f}s" if result['failover'] is not None else (
+            'leader killed, no failover' if result['killed'] else '')
+        print(f"{count:2d} workers {result['runs_per_second']:6.2f} runs/s  {result['done']:5d} runs done "
+              f"{result['crawls']:5d} crawls {result['reclaimed']:3d} reclaimed {result['extra']:3d} extra "
+              f"{result['overlaps']:3d} overlaps  lag {result['lag']:5.2f}s  {failover}  {'ok' if ok else 'FAILED'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Compare a sequential crawl (one request in flight) against the concurrent crawl engine.
+
+    python -m benchmarks.bench_crawl --pages 200 --delay 0.05
+"""
+import argparse
+import time
+
+from app.crawler import crawl_site_as_tree
+from benchmarks.fixture_site import FixtureSite
+
+
+def timed_crawl(url, pages, **kwargs):
+    start = time.perf_counter()
+    root, hashmap, _ = crawl_site_as_tree(url, [], max_pages=pages, **kwargs)
+    return time.perf_counter() - start, len(hashmap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--delay', type=float, default=0.05, help='server delay per request in seconds')
+    args = parser.parse_args()
+
+    with FixtureSite(page_count=args.pages, fanout=args.fanout, delay=args.delay) as site:
+        sequential, seq_pages = timed_crawl(site.url, args.pages, max_concurrency=1, max_concurrency_per_host=1)
+        concurrent, con_pages = timed_crawl(site.url, args.pages)
+
+    print(f'sequential: {seq_pages} pages in {sequential:.2f}s')
+    print(f'concurrent: {con_pages} pages in {concurrent:.2f}s')
+    print(f'speedup:    {sequential / concurrent:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
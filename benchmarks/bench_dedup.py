@@ -0,0 +1,92 @@
+"""
+URL canonicalization and near-duplicate detection.
+
+1. Crawl a fixture site whose links also appear under alias spellings, with and without
+   de-duplication, and count the distinct pages reached within the max_pages budget.
+2. Recrawl a site whose pages carry a fresh timestamp on every request and check that the
+   volatile diffs do not count as modifications (and so would not trigger an LLM run).
+3. Time the banded LSH index against a linear scan at 50k MinHash signatures.
+
+    python -m benchmarks.bench_dedup --pages 200 --index-size 50000
+"""
+import argparse
+import random
+import time
+
+from app.crawler import crawl_site_as_tree
+from app.minhash import MinHashIndex, similarity, MINHASH_BINS, NEAR_DUPLICATE_SIMILARITY
+from benchmarks.fixture_site import FixtureSite
+
+
+def distinct_pages(hashmap):
+    return len({entry['title'] for entry in hashmap.values()})
+
+
+def bench_aliases(args):
+    with FixtureSite(page_count=args.pages * 4, fanout=4, delay=0, filler=2, aliases=True) as site:
+        for deduplicate in (False, True):
+            served = site.requests_served
+            _, hashmap, _ = crawl_site_as_tree(site.url, [], max_pages=args.pages, deduplicate=deduplicate)
+            print(f'aliases   deduplicate={str(deduplicate):5s}: {len(hashmap):4d} pages kept, '
+                  f'{distinct_pages(hashmap):4d} distinct, {site.requests_served - served:4d} requests')
+
+
+def bench_volatile(args):
+    with FixtureSite(page_count=args.pages, fanout=4, delay=0, filler=2, volatile=True) as site:
+        _, hashmap, _ = crawl_site_as_tree(site.url, [], max_pages=args.pages)
+        _, new_hashmap, changes = crawl_site_as_tree(site.url, [], hashmap, max_pages=args.pages)
+        hash_changed = sum(1 for url, entry in new_hashmap.items() if hashmap[url]['content_hash'] != entry['content_hash'])
+        print(f'volatile  recrawl: {hash_changed} content hashes changed, {len(changes.modified)} pages modified, '
+              f'changes={bool(changes)}')
+
+
+def random_signature():
+    return ''.join(f'{random.getrandbits(16):04x}' for _ in range(MINHASH_BINS))
+
+
+def mutate(signature, bins):
+    parts = [signature[i:i + 4] for i in range(0, len(signature), 4)]
+    for slot in random.sample(range(MINHASH_BINS), bins):
+        parts[slot] = f'{random.getrandbits(16):04x}'
+    return ''.join(parts)
+
+
+def bench_index(args):
+    random.seed(0)
+    signatures = [random_signature() for _ in range(args.index_size)]
+    # Near-duplicates at 0.9+ similarity, plus unrelated pages
+    queries = [mutate(random.choice(signatures), random.randint(0, MINHASH_BINS // 10)) for _ in range(args.queries)]
+    queries += [random_signature() for _ in range(args.queries)]
+
+    index = MinHashIndex()
+    start = time.perf_counter()
+    for i, signature in enumerate(signatures):
+        index.add(signature, i)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lsh = [next(index.candidates(query), None) is not None for query in queries]
+    lsh_time = time.perf_counter() - start
+    start = time.perf_counter()
+    linear = [any(similarity(query, other) >= NEAR_DUPLICATE_SIMILARITY for other in signatures) for query in queries]
+    linear_time = time.perf_counter() - start
+
+    agree = sum(a == b for a, b in zip(lsh, linear))
+    print(f'index     {args.index_size} signatures: build {build * 1000:.0f} ms, '
+          f'LSH {lsh_time / len(queries) * 1e6:.1f} us/lookup, linear {linear_time / len(queries) * 1e3:.0f} ms/lookup, '
+          f'{sum(lsh)} / {sum(linear)} near-duplicates found, {agree} / {len(queries)} answers agree')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--index-size', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    bench_aliases(args)
+    bench_volatile(args)
+    bench_index(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare per-page CPU time and peak memory of the 'soup' and 'fast' extraction modes
+on a large synthetic documentation page.
+
+    python -m benchmarks.bench_extract --sections 2000
+"""
+import argparse
+import time
+import tracemalloc
+
+from app.crawler import parse_page
+
+
+def build_large_page(sections):
+    parts = [
+        '<!DOCTYPE html><html><head><title>Huge reference manual</title>',
+        '<meta name="description" content="Every API in one page.">',
+        '<style>.x{color:red}</style></head><body><nav>',
+    ]
+    parts.extend(f'<a href="/ref/{i}">Section {i}</a>' for i in range(0, sections, 10))
+    parts.append('</nav><main>')
+    for i in range(sections):
+        parts.append(
+            f'<section id="s{i}"><h2>Function number {i}</h2>'
+            f'<p>Function {i} takes <code>arg_{i}</code> and returns a value. '
+            'It is documented here at considerable length so that the page is large. '
+            'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor.</p>'
+            f'<pre>result = function_{i}(arg_{i})</pre><a href="/ref/{i}#example">Example</a></section>'
+        )
+    parts.append('</main></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def measure(body, mode, repeat):
+    tracemalloc.start()
+    page = parse_page(body, 'https://docs.example.com/ref/', 'utf-8', mode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse_page(body, 'https://docs.example.com/ref/', 'utf-8', mode)
+    elapsed = (time.perf_counter() - start) / repeat
+    return page, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sections', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    body = build_large_page(args.sections)
+    print(f'page size: {len(body) / 1024:.0f} KiB')
+    results = {}
+    for mode in ('soup', 'fast'):
+        page, elapsed, peak = measure(body, mode, args.repeat)
+        results[mode] = page
+        print(f'{mode:5s} {elapsed * 1000:8.1f} ms/page  peak {peak / 1024 / 1024:6.1f} MiB  '
+              f"{len(page['links'])} links  title={page['title']!r}")
+    same = all(results['soup'][key] == results['fast'][key] for key in ('title', 'description', 'links'))
+    print(f'title/description/links identical: {same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Check that the single-pass fingerprint matches the original clean_html_for_hashing
+on a corpus of fixture pages, and compare their cost.
+
+    python -m benchmarks.bench_fingerprint
+"""
+import argparse
+import glob
+import os
+import re
+import time
+
+from bs4 import BeautifulSoup
+
+from app.crawler import clean_html_for_hashing, generate_content_hash
+from app.fingerprint import DYNAMIC_SELECTORS
+from benchmarks.fixture_site import render_page
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'pages')
+
+
+def reference_clean_html_for_hashing(soup):
+    """The original re-serialize + re-parse implementation, used as the reference."""
+    # Make a copy to avoid modifying the original
+    cleaned_soup = BeautifulSoup(str(soup), 'html.parser')
+    
+    # Remove script and style tags entirely
+    for tag in cleaned_soup(['script', 'style', 'noscript']):
+        tag.decompose()
+    
+    # Remove meta tags (often contain timestamps, cache info, etc.)
+    for tag in cleaned_soup.find_all('meta'):
+        tag.decompose()
+    
+    # Remove elements matching dynamic selectors
+    for selector in DYNAMIC_SELECTORS:
+        for element in cleaned_soup.select(selector):
+            element.decompose()
+    
+    # Remove ALL attributes except the most essential ones
+    # This is aggressive but eliminates most dynamic content
+    keep_attrs = {'href', 'src', 'alt', 'title'}  # Only keep truly content-related attributes
+    
+    for tag in cleaned_soup.find_all():
+        attrs_to_remove = []
+        for attr in tag.attrs:
+            if attr not in keep_attrs:
+                attrs_to_remove.append(attr)
+        
+        for attr in attrs_to_remove:
+            del tag.attrs[attr]
+    
+    # Remove form elements entirely (they often have dynamic tokens)
+    for tag in cleaned_soup(['form', 'input', 'textarea', 'select', 'button']):
+        tag.decompose()
+    
+    # Get the cleaned HTML text
+    html_text = str(cleaned_soup)
+    
+    # More aggressive text normalization
+    # Remove all newlines and normalize whitespace
+    html_text = re.sub(r'\s+', ' ', html_text)
+    html_text = re.sub(r'>\s+<', '><', html_text)
+    
+    # Remove HTML comments
+    html_text = re.sub(r'<!--.*?-->', '', html_text, flags=re.DOTALL)
+    
+    # Remove common dynamic patterns in text
+    # Remove timestamps, dates, session IDs
+    html_text = re.sub(r'\b\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}[Z\+\-\d:]*\b', '', html_text)  # ISO dates
+    html_text = re.sub(r'\b[a-f0-9]{32,}\b', '', html_text, re.I)  # Long hex strings (hashes, tokens)
+    html_text = re.sub(r'\b[A-Za-z0-9]{20,}\b', '', html_text)  # Long random strings
+    
+    # Strip leading/trailing whitespace
+    html_text = html_text.strip()
+    
+    return html_text
+
+
+def load_corpus(generated=50):
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(PAGES_DIR, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            corpus[os.path.basename(path)] = f.read()
+    for page_id in range(generated):
+        corpus[f'generated/{page_id}'] = render_page(page_id, generated, 5)
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    soups = {name: BeautifulSoup(html, 'html.parser') for name, html in corpus.items()}
+
+    mismatches = [
+        name for name, soup in soups.items()
+        if generate_content_hash(clean_html_for_hashing(soup)) != generate_content_hash(reference_clean_html_for_hashing(soup))
+    ]
+    for name in mismatches:
+        print(f'MISMATCH: {name}')
+    print(f'{len(soups) - len(mismatches)}/{len(soups)} pages hash identically')
+
+    for label, func in (('reference', reference_clean_html_for_hashing), ('single-pass', clean_html_for_hashing)):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for soup in soups.values():
+                func(soup)
+        elapsed = time.perf_counter() - start
+        print(f'{label:12s} {elapsed * 1000 / (args.repeat * len(soups)):.3f} ms/page')
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
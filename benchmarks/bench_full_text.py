@@ -0,0 +1,73 @@
+"""
+llms-full.txt memory at growing site sizes.
+
+Crawls a synthetic site of each size with the page-text spool, then writes llms-full.txt
+to a file in tree order. Reports the Python heap peak of the write stage against joining
+the same output into one string: the streamed write should stay flat as the site grows,
+the joined string grows with it.
+
+    python -m benchmarks.bench_full_text --sizes 1000 10000
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app.crawler import crawl_site_as_tree
+from app.full_text import PageTextSpool, iter_crawled_pages, write_llms_full
+from benchmarks.fixture_site import FixtureSite
+
+
+def measure(func):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def join_in_memory(root, spool):
+    """The accumulate-then-write alternative: the whole output as one string."""
+    return ''.join(f'# {node.title}\nSource: {node.url}\n\n{spool.get(node.url)}\n\n' for node in iter_crawled_pages(root))
+
+
+def bench_size(size, args):
+    with FixtureSite(page_count=size, fanout=args.fanout, delay=0, filler=args.filler) as site, \
+            PageTextSpool() as spool, tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        root, hashmap, _ = crawl_site_as_tree(site.url, [], max_pages=size, max_depth=args.max_depth, extraction_mode='fast',
+                                              parse_workers=0, full_text_spool=spool)
+        crawl_time = time.perf_counter() - start
+
+        output_path = os.path.join(path, 'llms-full.txt')
+        def write():
+            with open(output_path, 'w', encoding='utf-8') as sink:
+                return write_llms_full(root, spool, sink)
+        pages, write_time, write_peak = measure(write)
+        joined, join_time, join_peak = measure(lambda: join_in_memory(root, spool))
+        assert joined == open(output_path, encoding='utf-8').read()
+
+        print(f'{size:6d} pages  crawled {len(hashmap)} pages with the text spool in {crawl_time:5.1f}s; '
+              f'llms-full.txt {os.path.getsize(output_path) / 2**20:5.1f} MiB, {pages} pages: '
+              f'streamed {write_time * 1000:6.0f} ms peak {write_peak / 2**20:5.2f} MiB | '
+              f'joined {join_time * 1000:6.0f} ms peak {join_peak / 2**20:5.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--fanout', type=int, default=10)
+    parser.add_argument('--max-depth', type=int, default=6)
+    parser.add_argument('--filler', type=int, default=5, help='filler paragraphs per page')
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench_size(size, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Repeat the same LLM refinement against a local fake OpenAI endpoint and compare
+the first (miss) and repeated (hit) latencies.
+
+    python -m benchmarks.bench_llm_cache --latency 1.0
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fake_openai import FakeOpenAI
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=1.0, help='fake API latency in seconds')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAI(latency=args.latency) as fake:
+        os.environ['LLMS_CACHE_PATH'] = os.path.join(tmp, 'llm_cache.db')
+        os.environ['OPENAI_BASE_URL'] = fake.url
+        os.environ.setdefault('OPENAI_API_KEY', 'fake-key')
+        # Imported after the environment is set so the cache lands in the temp dir
+        from app.crawler import refine_llms_with_openai
+        from app.llm_cache import get_llm_cache
+
+        llms = '# Example\n> An example site.\n## Docs\n- [Docs](https://example.com/docs): Docs.\n'
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            refine_llms_with_openai(llms, 'Emphasize the docs')
+            timings.append(time.perf_counter() - start)
+
+        print(f'first call (miss):   {timings[0] * 1000:8.1f} ms')
+        print(f'repeat calls (hits): {sum(timings[1:]) / len(timings[1:]) * 1000:8.1f} ms avg')
+        print(f'API requests made:   {fake.requests_served}')
+        print(f'cache stats:         {get_llm_cache().stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Refine a large llms.txt in one request vs. in concurrent `##`-section chunks, against
+a local fake OpenAI endpoint whose latency grows with the prompt size.
+
+    python -m benchmarks.bench_llm_chunks --sections 300 --latency 0.5 --per-kchar 0.05
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from benchmarks.fake_openai import FakeOpenAI
+
+
+def build_llms(sections, links_per_section):
+    llms = '# Example Docs\n> Documentation for the example product.\n'
+    for s in range(sections):
+        llms += f'## Section {s}\n'
+        for l in range(links_per_section):
+            llms += f'- [Page {s}.{l}](https://example.com/s{s}/p{l}): Describes page {l} of section {s}.\n'
+    return llms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sections', type=int, default=300)
+    parser.add_argument('--links', type=int, default=5, help='links per section')
+    parser.add_argument('--latency', type=float, default=0.5, help='fixed fake API latency in seconds')
+    parser.add_argument('--per-kchar', type=float, default=0.05, help='extra latency per 1000 input characters')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAI(latency=args.latency, per_kchar=args.per_kchar) as fake:
+        os.environ['LLMS_CACHE_PATH'] = os.path.join(tmp, 'llm_cache.db')
+        os.environ['OPENAI_BASE_URL'] = fake.url
+        os.environ.setdefault('OPENAI_API_KEY', 'fake-key')
+        from app.crawler import refine_llms_with_openai
+
+        llms = build_llms(args.sections, args.links)
+        urls = set(re.findall(r'\]\((\S+)\)', llms))
+        print(f'llms.txt: {len(llms)} chars, {args.sections} sections, {len(urls)} links')
+
+        for label, kwargs in [('single request', {'max_chunk_tokens': 10 ** 9}),
+                              ('chunked', {'max_workers': args.workers})]:
+            served = fake.requests_served
+            start = time.perf_counter()
+            refined = refine_llms_with_openai(llms, llm_instructions=label, **kwargs)
+            elapsed = time.perf_counter() - start
+            complete = urls <= set(re.findall(r'\]\((\S+)\)', refined))
+            print(f'{label:15s} {elapsed:7.2f}s  requests={fake.requests_served - served:3d}  '
+                  f"all links kept={complete}  header kept={refined.startswith(llms.split('## ', 1)[0])}")
+
+
+if __name__ == '__main__':
+    main()
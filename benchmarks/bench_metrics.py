@@ -0,0 +1,66 @@
+"""
+Cost of crawl instrumentation.
+
+Times the per-call cost of a stage timer and a counter with metrics off, on, and on with
+a crawl profile active, then crawls the same fixture site with metrics off and on and
+prints the Prometheus output of the instrumented crawl.
+
+    python -m benchmarks.bench_metrics --calls 200000 --pages 300
+"""
+import argparse
+import time
+
+from app import metrics
+from app.crawler import crawl_site_as_tree
+from benchmarks.fixture_site import FixtureSite
+
+
+def per_call(calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        with metrics.timed('bench'):
+            pass
+        metrics.add(metrics.DOWNLOADED_BYTES, 1)
+    return (time.perf_counter() - start) / calls
+
+
+def crawl(site, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        crawl_site_as_tree(site.url, [], max_pages=pages, max_depth=10, extraction_mode='fast', parse_workers=0)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    metrics.ENABLED = False
+    off = per_call(args.calls)
+    metrics.ENABLED = True
+    on = per_call(args.calls)
+    with metrics.profiling(metrics.CrawlProfile()):
+        profiled = per_call(args.calls)
+    print(f'timer + counter per call: off {off * 1e9:6.0f} ns | on {on * 1e9:6.0f} ns | on + profile {profiled * 1e9:6.0f} ns')
+
+    with FixtureSite(page_count=args.pages, fanout=5, delay=0) as site:
+        crawl(site, args.pages, 1)  # warm up the server, imports and caches
+        metrics.ENABLED = False
+        crawl_off = crawl(site, args.pages, args.repeat)
+        metrics.ENABLED = True
+        crawl_on = crawl(site, args.pages, args.repeat)
+    print(f'crawl of {args.pages} pages (best of {args.repeat}): metrics off {crawl_off:6.3f}s | on {crawl_on:6.3f}s '
+          f'({(crawl_on / crawl_off - 1) * 100:+.1f}%)')
+    print()
+    print('\n'.join(line for line in metrics.REGISTRY.render().splitlines()
+                    if not line.startswith('#') and '_bucket' not in line))
+
+
+if __name__ == '__main__':
+    main()
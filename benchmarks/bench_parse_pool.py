@@ -0,0 +1,46 @@
+"""
+Crawl throughput with the parse/hash stage inline (serialized on the GIL) vs in a
+process pool, with several crawls running at once as scheduled tasks do.
+
+    python -m benchmarks.bench_parse_pool --crawls 4 --pages 100 --filler 200 --workers 1,2,4,8,16
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.crawler import crawl_site_as_tree, get_parse_pool
+from benchmarks.fixture_site import FixtureSite
+
+
+def run_crawls(url, crawls, pages, parse_workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=crawls) as executor:
+        results = list(executor.map(
+            lambda _: crawl_site_as_tree(url, [], max_pages=pages, parse_workers=parse_workers), range(crawls)))
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(len(hashmap) for _, hashmap, _ in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--crawls', type=int, default=4, help='concurrent crawls')
+    parser.add_argument('--pages', type=int, default=100, help='pages per crawl')
+    parser.add_argument('--filler', type=int, default=200, help='filler paragraphs per page')
+    parser.add_argument('--workers', default=','.join(str(n) for n in (1, 2, 4, 8, 16) if n <= (os.cpu_count() or 1)) or '1',
+                        help='comma-separated parse pool sizes to compare with inline parsing')
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} cores, {args.crawls} concurrent crawls x {args.pages} pages, {args.filler} filler paragraphs')
+    with FixtureSite(page_count=args.pages, fanout=5, delay=0, filler=args.filler) as site:
+        baseline, pages = run_crawls(site.url, args.crawls, args.pages, 0)
+        print(f'inline parsing:        {pages / baseline:7.1f} pages/s ({baseline:.2f}s)')
+        for workers in [int(n) for n in args.workers.split(',')]:
+            list(get_parse_pool(workers).map(int, range(workers * 4)))  # start the pool outside the timing
+            elapsed, pages = run_crawls(site.url, args.crawls, args.pages, workers)
+            print(f'{workers:2d} parse processes:   {pages / elapsed:7.1f} pages/s ({elapsed:.2f}s, '
+                  f'{baseline / elapsed:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
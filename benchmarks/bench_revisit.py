@@ -0,0 +1,90 @@
+"""
+Fetch volume and change-detection delay of fixed against adaptive recrawl intervals.
+
+Simulates a task over a number of days on a simulated clock: each page changes as a
+Poisson process at its own rate (a few volatile pages, most changing about monthly).
+Every task run fetches the root and, with adaptive intervals, only the pages due for a
+revisit (app.revisit), then moves its next run to the task's effective interval. Reports
+pages fetched per day and how long after each change it was picked up.
+
+    python -m benchmarks.bench_revisit --days 30 --pages 100 --min-interval 70
+"""
+import argparse
+import random
+
+from app.revisit import is_due, observe, new_history, revisit_interval, change_rate
+
+
+class Page:
+    def __init__(self, rate_per_day, days, rng):
+        # Change times over the whole run, drawn up front so both policies see the same site
+        self.changes, t = [], 0.0
+        while rate_per_day:
+            t += rng.expovariate(rate_per_day / 86400)
+            if t >= days * 86400:
+                break
+            self.changes.append(t)
+        self.seen = 0      # changes already picked up
+        self.history = None
+
+
+def simulate(rates, days, min_interval, max_interval, adaptive, seed):
+    pages = [Page(rate, days, random.Random(seed + i)) for i, rate in enumerate(rates)]
+    task_history = new_history(0.0)
+    fetches, runs, delays = 0, 0, []
+    t = 0.0
+    while t < days * 86400:
+        runs += 1
+        task_changed = False
+        for index, page in enumerate(pages):
+            if adaptive and index and not is_due(page.history, t, min_interval, max_interval):
+                continue
+            fetches += 1
+            pending = [change for change in page.changes[page.seen:] if change <= t]
+            if pending:
+                delays.append(t - pending[0])
+                page.seen += len(pending)
+            changed = bool(pending) and page.history is not None
+            page.history = observe(page.history, changed, t)
+            task_changed |= changed
+        task_history = observe(task_history, task_changed, t)
+        t += revisit_interval(task_history, min_interval, max_interval) if adaptive else min_interval
+    delays.sort()
+    return {
+        'runs_per_day': runs / days,
+        'fetches_per_day': fetches / days,
+        'changes': len(delays),
+        'p50_delay': delays[len(delays) // 2] if delays else 0,
+        'p95_delay': delays[int(len(delays) * 0.95)] if delays else 0,
+        'task_interval': revisit_interval(task_history, min_interval, max_interval) if adaptive else min_interval,
+        'task_rate_per_day': (change_rate(task_history) or 0) * 86400,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--volatile', type=int, default=5, help='pages changing --volatile-rate times a day')
+    parser.add_argument('--volatile-rate', type=float, default=24.0)
+    parser.add_argument('--stable-rate', type=float, default=1 / 30, help='changes a day of the other pages')
+    parser.add_argument('--min-interval', type=float, default=70)
+    parser.add_argument('--max-interval', type=float, default=86400)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sites = {
+        'mixed site': [args.volatile_rate] * args.volatile + [args.stable_rate] * (args.pages - args.volatile),
+        'stable site': [args.stable_rate] * args.pages,
+    }
+    for name, rates in sites.items():
+        for adaptive in (False, True):
+            result = simulate(rates, args.days, args.min_interval, args.max_interval, adaptive, args.seed)
+            print(f"{name:12s} {'adaptive' if adaptive else 'fixed':8s} {result['runs_per_day']:7.0f} runs/day "
+                  f"{result['fetches_per_day']:9.0f} fetches/day  {result['changes']:5d} updates found "
+                  f"after p50 {result['p50_delay'] / 60:6.1f} min p95 {result['p95_delay'] / 60:6.1f} min  "
+                  f"(task every {result['task_interval']:.0f}s, {result['task_rate_per_day']:.1f} changes/day)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Schedule hundreds of simulated crawl tasks on the CrawlScheduler and check that
+workers, per-domain caps and the memory budget hold, and that no run is dropped.
+
+    python -m benchmarks.bench_scheduler --tasks 300 --domains 40 --duration 10
+"""
+import argparse
+import random
+import threading
+import time
+
+from app.scheduler import CrawlScheduler, estimate_crawl_memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tasks', type=int, default=300)
+    parser.add_argument('--domains', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--interval', type=float, default=2.0, help='task interval in seconds')
+    parser.add_argument('--crawl-time', type=float, default=0.05, help='simulated crawl duration in seconds')
+    parser.add_argument('--memory-mb', type=int, default=256, help='memory budget for crawls in flight')
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    random.seed(0)
+    scheduler = CrawlScheduler(max_workers=args.workers, memory_budget_bytes=args.memory_mb * 1024 * 1024)
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0, 'memory': 0, 'peak_memory': 0, 'runs': 0, 'by_domain': {}, 'peak_domain': 0}
+    lateness = []
+
+    def make_job(domain, memory, due):
+        expected = [due]
+
+        def job():
+            with lock:
+                lateness.append(time.time() - expected[0])
+                state['running'] += 1
+                state['memory'] += memory
+                state['by_domain'][domain] = state['by_domain'].get(domain, 0) + 1
+                state['peak'] = max(state['peak'], state['running'])
+                state['peak_memory'] = max(state['peak_memory'], state['memory'])
+                state['peak_domain'] = max(state['peak_domain'], state['by_domain'][domain])
+            started = time.time()
+            time.sleep(args.crawl_time * random.uniform(0.5, 1.5))
+            with lock:
+                state['running'] -= 1
+                state['memory'] -= memory
+                state['by_domain'][domain] -= 1
+                state['runs'] += 1
+            expected[0] = started + args.interval
+        return job
+
+    scheduler.start()
+    start = time.time()
+    for i in range(args.tasks):
+        memory = estimate_crawl_memory(random.choice([20, 50, 100, 200]))
+        due = start + random.uniform(0, args.interval)
+        scheduler.add_job(f'task{i}', make_job(f'site{i % args.domains}.com', memory, due), args.interval,
+                          domain=f'site{i % args.domains}.com', memory_estimate=memory, first_run=due)
+    time.sleep(args.duration)
+    scheduler.shutdown(wait=True)
+
+    lateness.sort()
+    ideal = args.tasks * args.duration / args.interval
+    print(f'tasks={args.tasks} domains={args.domains} workers={args.workers} budget={args.memory_mb}MiB')
+    print(f"runs completed:      {state['runs']} (ideal without contention ~{ideal:.0f})")
+    print(f"peak concurrency:    {state['peak']} (limit {args.workers})")
+    print(f"peak per domain:     {state['peak_domain']} (limit {scheduler.max_per_domain})")
+    print(f"peak memory est.:    {state['peak_memory'] / 2 ** 20:.0f} MiB (budget {args.memory_mb} MiB)")
+    print(f'start lateness:      p50={lateness[len(lateness) // 2] * 1000:.0f}ms '
+          f'p99={lateness[int(len(lateness) * 0.99)] * 1000:.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Bytes and time per dashboard poll and per llms.txt download.
+
+Fills a temporary task database with tasks holding realistic results and crawl state,
+then compares through the Flask test client:
+- the full /scheduled-tasks listing, the ?summary=1 listing and a revalidated (304) one;
+- /llms/<task_id>.txt as identity, gzip and a revalidated (304) response.
+
+    python -m benchmarks.bench_serving --tasks 100 --pages 500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix='bench_serving_')
+os.environ['LLMS_DB_PATH'] = os.path.join(DATA_DIR, 'llms.db')
+
+import run  # noqa: E402  (reads LLMS_DB_PATH when the app is created)
+
+
+def fake_result(task, pages):
+    lines = [f'# Site {task}', f'> Documentation for site {task}', '## Docs']
+    lines += [f'- [Page {i}](https://site{task}.example.com/docs/page-{i}): Reference for page {i} of site {task}.'
+              for i in range(pages)]
+    return '\n'.join(lines) + '\n'
+
+
+def fake_hashmap(task, pages):
+    return {f'https://site{task}.example.com/docs/page-{i}': {
+        'title': f'Page {i}', 'description': f'Reference for page {i}.', 'content_hash': f'{task:08x}{i:024x}',
+        'etag': f'"{i}"', 'last_modified': None, 'minhash': None, 'canonical': None,
+        'links': [f'https://site{task}.example.com/docs/page-{j}' for j in range(i + 1, min(i + 6, pages))],
+    } for i in range(pages)}
+
+
+def request(client, url, repeat, headers=None):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, headers=headers or {})
+        body = response.get_data()
+    return response, len(body), (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=500, help='pages per task')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Without the scheduler, nothing crawls the fake sites
+    app = run.create_app(run_scheduler=False)
+    for task in range(args.tasks):
+        run.task_manager.add_task(f'task-{task}', f'https://site{task}.example.com/', 10 ** 7, fake_result(task, args.pages),
+                                  new_url_hashmap=fake_hashmap(task, args.pages), max_pages=args.pages)
+    client = app.test_client()
+
+    _, size, elapsed = request(client, '/scheduled-tasks', args.repeat)
+    print(f'listing  full          {size / 1024:10.1f} KiB {elapsed * 1000:8.1f} ms')
+    response, size, elapsed = request(client, '/scheduled-tasks?summary=1', args.repeat)
+    print(f'listing  summary       {size / 1024:10.1f} KiB {elapsed * 1000:8.1f} ms')
+    response, size, elapsed = request(client, '/scheduled-tasks?summary=1', args.repeat,
+                                      {'If-None-Match': response.headers['ETag']})
+    print(f'listing  summary 304   {size / 1024:10.1f} KiB {elapsed * 1000:8.1f} ms  (status {response.status_code})')
+
+    url = '/llms/task-0.txt'
+    response, size, elapsed = request(client, url, args.repeat)
+    print(f'llms.txt identity      {size / 1024:10.1f} KiB {elapsed * 1000:8.1f} ms')
+    response, size, elapsed = request(client, url, args.repeat, {'Accept-Encoding': 'gzip, br'})
+    print(f"llms.txt {response.headers.get('Content-Encoding'):13s} {size / 1024:10.1f} KiB {elapsed * 1000:8.1f} ms")
+    response, size, elapsed = request(client, url, args.repeat,
+                                      {'Accept-Encoding': 'gzip, br', 'If-None-Match': response.headers['ETag']})
+    print(f'llms.txt 304           {size / 1024:10.1f} KiB {elapsed * 1000:8.1f} ms  (status {response.status_code})')
+    run.task_manager.shutdown()
+    run.job_manager.shutdown()
+    run.firecrawl_executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
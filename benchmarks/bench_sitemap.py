@@ -0,0 +1,41 @@
+"""
+Link-following vs sitemap discovery on a deep fixture site: requests, pages found and
+time for a first crawl, then for a recrawl after a few pages changed.
+
+    python -m benchmarks.bench_sitemap --pages 500 --changed 10
+"""
+import argparse
+import time
+
+from app.crawler import crawl_site_as_tree
+from benchmarks.fixture_site import FixtureSite
+
+
+def crawl(site, args, discovery, prev=None):
+    served = site.requests_served
+    start = time.perf_counter()
+    _, hashmap, changes = crawl_site_as_tree(site.url, [], prev, max_pages=args.pages, discovery=discovery)
+    elapsed = time.perf_counter() - start
+    return hashmap, changes, site.requests_served - served, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--fanout', type=int, default=3)
+    parser.add_argument('--delay', type=float, default=0.02, help='server delay per request in seconds')
+    parser.add_argument('--changed', type=int, default=10, help='pages changed before the recrawl')
+    args = parser.parse_args()
+
+    for discovery in ('links', 'sitemap'):
+        with FixtureSite(page_count=args.pages, fanout=args.fanout, delay=args.delay, sitemaps=True) as site:
+            hashmap, _, requests, elapsed = crawl(site, args, discovery)
+            print(f'{discovery:8s} first crawl: {len(hashmap):4d} pages, {requests:4d} requests, {elapsed:6.2f}s')
+            for page_id in range(1, args.changed + 1):
+                site.revisions[page_id] = 1
+            hashmap, changes, requests, elapsed = crawl(site, args, discovery, hashmap)
+            print(f'{discovery:8s} recrawl:     {len(changes.modified):4d} modified, {requests:4d} requests, {elapsed:6.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Rebuilding llms.txt from page snapshots instead of recrawling.
+
+1. Crawl a fixture site with a snapshot store, then crawl it again as a second task
+   and check that its pages are stored once.
+2. Change avoid_substrings and max_pages and rebuild from the snapshot alone; compare
+   time, requests and output with a full recrawl using the same settings.
+3. Shrink the store's size bound and check that least recently used blobs are evicted.
+
+    python -m benchmarks.bench_snapshot --pages 300 --delay 0.02
+"""
+import argparse
+import tempfile
+import time
+
+from app.crawler import create_llms
+from app.snapshots import SnapshotStore
+from benchmarks.fixture_site import FixtureSite
+
+
+def run(site, store, avoid, max_pages, prev=None, from_snapshot=False):
+    served = site.requests_served
+    start = time.perf_counter()
+    markdown, _, hashmap, _, _ = create_llms(site.url, avoid, prev_url_hashmap=prev, max_pages=max_pages,
+                                             snapshot_store=store, from_snapshot=from_snapshot)
+    return markdown, hashmap, site.requests_served - served, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--fanout', type=int, default=3)
+    parser.add_argument('--filler', type=int, default=20, help='filler paragraphs per page')
+    parser.add_argument('--delay', type=float, default=0.02, help='server delay per request in seconds')
+    args = parser.parse_args()
+    avoid = ['/page/2']
+    max_pages = args.pages // 2
+
+    with tempfile.TemporaryDirectory() as path, \
+            FixtureSite(page_count=args.pages, fanout=args.fanout, delay=args.delay, filler=args.filler) as site:
+        store = SnapshotStore(path)
+        _, hashmap, requests, elapsed = run(site, store, [], args.pages)
+        first = store.stats()
+        print(f"crawl          {len(hashmap):4d} pages, {requests:4d} requests, {elapsed:6.2f}s; stored {first['entries']} bodies, "
+              f"{first['raw_bytes'] / 1024:.0f} KiB raw -> {first['stored_bytes'] / 1024:.0f} KiB gzip")
+        run(site, store, [], args.pages)
+        print(f"second task    stored bodies {first['entries']} -> {store.stats()['entries']}")
+
+        rebuilt, _, requests, elapsed = run(site, store, avoid, max_pages, prev=hashmap, from_snapshot=True)
+        print(f'rebuild        avoid={avoid} max_pages={max_pages}: {requests:4d} requests, {elapsed:6.2f}s')
+        recrawled, _, requests, elapsed = run(site, store, avoid, max_pages)
+        print(f'recrawl        avoid={avoid} max_pages={max_pages}: {requests:4d} requests, {elapsed:6.2f}s; '
+              f'identical output: {rebuilt == recrawled}')
+
+        store.max_bytes = store.stats()['stored_bytes'] // 2
+        store.put('f' * 64, b'<html>one more page</html>')
+        after = store.stats()
+        print(f"evict          bound {store.max_bytes / 1024:.0f} KiB: {after['evictions']} evicted, "
+              f"{after['entries']} bodies / {after['stored_bytes'] / 1024:.0f} KiB kept")
+
+
+if __name__ == '__main__':
+    main()
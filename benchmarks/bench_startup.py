@@ -0,0 +1,80 @@
+"""
+Cold start time and baseline memory of a server process.
+
+Each case runs in a fresh interpreter and reports wall time from interpreter start to
+ready, and the resident set size at that point:
+- import: `import run` alone;
+- web worker: create_app() without the scheduler, as a worker that only serves requests;
+- scheduler: create_app() with the scheduler started;
+- eager: the web worker with the crawler, openai and the tldextract suffix data loaded up
+  front, i.e. what every worker paid before they were loaded on first use;
+- first crawl use: the extra time to load them later, paid once per process by the first
+  request or scheduled run that crawls.
+
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRELUDE = """
+import time
+start = time.perf_counter()
+"""
+REPORT = """
+elapsed = time.perf_counter() - start
+rss = 0
+try:
+    with open('/proc/self/status') as f:
+        rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:'))
+except OSError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+import json
+print(json.dumps({'seconds': elapsed, 'rss': rss}))
+"""
+LOAD_CRAWL_DEPENDENCIES = """
+import app.crawler
+from app.domains import registered_domain
+registered_domain('www.example.com')
+import openai
+"""
+
+CASES = {
+    'import': 'import run\n',
+    'web worker': 'import run\nrun.create_app(run_scheduler=False)\n',
+    'scheduler': 'import run\nrun.create_app(run_scheduler=True)\n',
+    'eager': 'import run\n' + LOAD_CRAWL_DEPENDENCIES + 'run.create_app(run_scheduler=False)\n',
+    'first crawl use': 'import run\nrun.create_app(run_scheduler=False)\nstart = time.perf_counter()\n' + LOAD_CRAWL_DEPENDENCIES,
+}
+
+
+def measure(code, env):
+    output = subprocess.run([sys.executable, '-c', PRELUDE + code + REPORT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, LLMS_DB_PATH=os.path.join(data_dir, 'llms.db'))
+        for name in CASES:
+            measure(CASES[name], env)  # warm the page cache and bytecode
+        for name, code in CASES.items():
+            runs = sorted((measure(code, env) for _ in range(args.repeat)), key=lambda run: run['seconds'])
+            median = runs[len(runs) // 2]
+            print(f"{name:16s} {median['seconds'] * 1000:8.1f} ms (median of {args.repeat}) "
+                  f"{median['rss'] / 2 ** 20:7.1f} MiB RSS")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Page tree memory and rendering cost at 1k, 10k and 100k nodes.
+
+Builds the same synthetic tree (sections of 100 pages under one root) with the previous
+dict-backed node and the __slots__ PageNode, then renders llms.txt both by repeated
+`str +=` (the previous renderer) and by streaming chunks to a file sink. Reports the
+tree's memory, the render time and the peak memory allocated while rendering.
+
+    python -m benchmarks.bench_tree --sizes 1000 10000 100000
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+from app.crawler import PageNode
+
+SECTION_SIZE = 100
+
+
+class DictPageNode:
+    """The previous PageNode layout: a per-instance __dict__ and a list per node."""
+    def __init__(self, url, index):
+        self.url = url
+        self.title = None
+        self.description = ''
+        self.index = index
+        self.children = []
+        self.content_hash = None
+
+    def add_child(self, child_node):
+        self.children.append(child_node)
+
+
+def build_tree(node_class, size):
+    root = node_class('https://example.com/', 0)
+    root.title, root.description = 'Example', 'An example site'
+    section = root
+    for index in range(1, size):
+        node = node_class(f'https://example.com/docs/section-{index // SECTION_SIZE}/page-{index}', index)
+        node.title = f'Page {index}'
+        node.description = f'Reference documentation for page {index} of the example site.'
+        node.content_hash = f'{index:032x}'
+        if index % SECTION_SIZE == 1:
+            root.add_child(node)
+            section = node
+        else:
+            section.add_child(node)
+    return root
+
+
+def render_concat(root):
+    """The previous renderer: grow one string with +=."""
+    printed_tree = f'# {root.title}\n> {root.description}\n'
+    for child in root.children:
+        if child.title is not None:
+            section = f'## {child.title}\n'
+            section += f'- [{child.title}]({child.url}): {child.description}\n'
+            for grandkid in child.children:
+                if grandkid.title is not None:
+                    section += f'- [{grandkid.title}]({grandkid.url}): {grandkid.description}\n'
+            printed_tree += section
+    return printed_tree
+
+
+def measure(func):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current, peak
+
+
+def bench_size(size):
+    dict_tree, _, dict_bytes, _ = measure(lambda: build_tree(DictPageNode, size))
+    slot_tree, _, slot_bytes, _ = measure(lambda: build_tree(PageNode, size))
+    print(f'{size:7d} nodes  tree memory: dict {dict_bytes / 2**20:7.1f} MiB, '
+          f'slots {slot_bytes / 2**20:7.1f} MiB ({1 - slot_bytes / dict_bytes:.0%} smaller)')
+    del dict_tree
+
+    text, concat_time, _, concat_peak = measure(lambda: render_concat(slot_tree))
+    _, join_time, _, join_peak = measure(slot_tree.print_tree_as_markdown)
+    with open(os.devnull, 'w') as sink:
+        _, stream_time, _, stream_peak = measure(lambda: slot_tree.write_markdown(sink))
+    assert text == slot_tree.print_tree_as_markdown()
+    print(f"{'':14s} render ({len(text) / 2**20:.1f} MiB):   += {concat_time * 1000:7.1f} ms peak {concat_peak / 2**20:6.1f} MiB | "
+          f'join {join_time * 1000:7.1f} ms peak {join_peak / 2**20:6.1f} MiB | '
+          f'stream {stream_time * 1000:7.1f} ms peak {stream_peak / 2**20:6.2f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench_size(size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Microbenchmark: checking URLs against many avoid rules with any(substring in url)
+versus the compiled UrlRuleMatcher.
+
+    python -m benchmarks.bench_url_rules --rules 1000 --urls 100000
+"""
+import argparse
+import random
+import string
+import time
+
+from app.url_rules import UrlRuleMatcher
+
+
+def random_segment(rng, length):
+    return ''.join(rng.choice(string.ascii_lowercase + '-') for _ in range(length))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rules', type=int, default=1000)
+    parser.add_argument('--urls', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = [f'/{random_segment(rng, rng.randint(4, 12))}' for _ in range(args.rules)]
+    urls = []
+    for _ in range(args.urls):
+        path = '/'.join(random_segment(rng, rng.randint(3, 10)) for _ in range(rng.randint(1, 5)))
+        # Roughly 5% of URLs hit a rule
+        if rng.random() < 0.05:
+            path += rng.choice(rules)
+        urls.append(f'https://www.example.com/{path}')
+
+    start = time.perf_counter()
+    expected = [any(rule in url for rule in rules) for url in urls]
+    linear = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = UrlRuleMatcher(rules)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [matcher.matches(url) for url in urls]
+    compiled = time.perf_counter() - start
+
+    assert actual == expected, 'compiled matcher disagrees with any(substring in url)'
+    print(f'{args.rules} rules x {args.urls} URLs, {sum(expected)} matches')
+    print(f'any(substring in url): {linear:.2f}s')
+    print(f'UrlRuleMatcher:        {compiled:.2f}s (+{compile_time * 1000:.1f}ms compile)')
+    print(f'speedup:               {linear / compiled:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Local stand-in for the OpenAI Responses API, with injectable latency.
+
+Point the client at it with OPENAI_BASE_URL=<fake.url> (and any OPENAI_API_KEY).
+It "refines" the user input by returning it unchanged, and counts requests. Latency is
+latency + per_kchar * (input length / 1000), so larger prompts take longer to answer.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from benchmarks.fixture_site import FixtureServer
+
+
+def response_body(text, model):
+    return {
+        'id': 'resp_fake',
+        'object': 'response',
+        'created_at': int(time.time()),
+        'model': model,
+        'status': 'completed',
+        'parallel_tool_calls': True,
+        'tool_choice': 'auto',
+        'tools': [],
+        'output': [{
+            'type': 'message',
+            'id': 'msg_fake',
+            'role': 'assistant',
+            'status': 'completed',
+            'content': [{'type': 'output_text', 'text': text, 'annotations': []}],
+        }],
+        'usage': {
+            'input_tokens': len(text) // 4,
+            'output_tokens': len(text) // 4,
+            'total_tokens': len(text) // 2,
+            'input_tokens_details': {'cached_tokens': 0},
+            'output_tokens_details': {'reasoning_tokens': 0},
+        },
+    }
+
+
+class FakeOpenAI:
+    """Runs the fake API on a background thread; use as a context manager."""
+    def __init__(self, latency=0.5, per_kchar=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.per_kchar = per_kchar
+        self.requests_served = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                with fake._lock:
+                    fake.requests_served += 1
+                    fake._in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake._in_flight)
+                try:
+                    user_text = request['input'][-1]['content'][0]['text']
+                    time.sleep(fake.latency + fake.per_kchar * len(user_text) / 1000)
+                    body = json.dumps(response_body(user_text, request.get('model', 'gpt-4o'))).encode('utf-8')
+                finally:
+                    with fake._lock:
+                        fake._in_flight -= 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = FixtureServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
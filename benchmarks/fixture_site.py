@@ -0,0 +1,201 @@
+"""
+Local fixture site for benchmarks.
+
+Serves a synthetic site where page N links to its `fanout` children, with an
+artificial per-request delay to stand in for a slow origin server. `filler` adds
+that many paragraphs of body text per page to make parsing CPU-heavy. With
+`sitemaps`, robots.txt points at a sitemap index of gzipped urlsets whose
+<lastmod> follows each page's revision. With `aliases`, every link also appears
+under alias spellings (trailing slash, /en/ prefix, index.html, and a /print/
+copy that differs by one line and has no rel=canonical). With `volatile`, every
+response carries a fresh render timestamp; a fraction between 0 and 1 makes only that
+share of the pages (a fixed, evenly spread set) volatile.
+"""
+import gzip
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+FILLER_PARAGRAPH = (
+    '<div class="content"><p>Lorem ipsum dolor sit amet, <a href="#top">consectetur</a> adipiscing elit, '
+    'sed do <strong>eiusmod tempor</strong> incididunt ut labore et dolore magna aliqua. Ut enim ad minim '
+    'veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat.</p></div>'
+)
+
+
+ALIAS_SPELLINGS = ('/page/{id}', '/page/{id}/', '/en/page/{id}', '/page/{id}/index.html', '/print/page/{id}')
+
+
+def render_page(page_id, page_count, fanout, revision=0, filler=0, aliases=False, printable=False, volatile=False):
+    children = [page_id * fanout + i for i in range(1, fanout + 1)]
+    spellings = ALIAS_SPELLINGS if aliases else ALIAS_SPELLINGS[:1]
+    links = ''.join(f'<li><a href="{spelling.format(id=child)}">Page {child}</a></li>'
+                    for child in children if child < page_count for spelling in spellings)
+    canonical = f'<link rel="canonical" href="{"/page/" + str(page_id) if page_id else "/"}">' if aliases and not printable else ''
+    return (
+        '<!DOCTYPE html><html><head>'
+        f'<title>Fixture page {page_id}</title>'
+        + canonical +
+        f'<meta name="description" content="Synthetic fixture page number {page_id}.">'
+        '</head><body>'
+        f'<h1>Fixture page {page_id}</h1>'
+        f'<p>This is page {page_id} of the synthetic benchmark site. It exists to be crawled.</p>'
+        + (f'<p>Revision {revision}.</p>' if revision else '') +
+        f'<ul>{links}</ul>'
+        + FILLER_PARAGRAPH * filler
+        + ('<p>Printer-friendly version.</p>' if printable else '')
+        + (f'<p>Rendered at {time.time():.6f}</p>' if volatile else '') +
+        '</body></html>'
+    )
+
+
+SITEMAP_PAGE_SIZE = 100
+
+
+def filler_for_page_bytes(page_bytes):
+    """Filler paragraphs that bring a page to about page_bytes."""
+    return max(0, round((page_bytes - 600) / len(FILLER_PARAGRAPH)))
+
+
+def is_volatile(page_id, volatile):
+    """True if page_id is in the `volatile` share of pages (True and 1 mean every page)."""
+    if not volatile:
+        return False
+    # Knuth's multiplicative hash spreads the volatile pages evenly over the id space
+    return (page_id * 2654435761 % 2 ** 32) / 2 ** 32 < float(volatile)
+
+
+def page_lastmod(revision):
+    return f'2024-01-{1 + revision % 28:02d}T00:00:00+00:00'
+
+
+def render_sitemap_index(base_url, page_count):
+    sitemaps = ''.join(
+        f'<sitemap><loc>{base_url}/sitemaps/pages-{i}.xml.gz</loc></sitemap>'
+        for i in range((page_count + SITEMAP_PAGE_SIZE - 1) // SITEMAP_PAGE_SIZE)
+    )
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{sitemaps}</sitemapindex>')
+
+
+def render_urlset(base_url, page_ids, revisions):
+    urls = ''.join(
+        f"<url><loc>{base_url}/{'page/' + str(page_id) if page_id else ''}</loc>"
+        f'<lastmod>{page_lastmod(revisions.get(page_id, 0))}</lastmod></url>'
+        for page_id in page_ids
+    )
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops bursts of concurrent connects (1s SYN retry)
+    request_queue_size = 128
+
+
+class FixtureSite:
+    """Runs a fixture site on a background thread; use as a context manager."""
+    def __init__(self, page_count=200, fanout=5, delay=0.05, filler=0, sitemaps=False, aliases=False, volatile=False,
+                 host='127.0.0.1', port=0):
+        self.page_count = page_count
+        self.aliases = aliases
+        self.volatile = volatile
+        self.filler = filler
+        self.sitemaps = sitemaps
+        self.sitemap_requests = 0
+        self.fanout = fanout
+        self.delay = delay
+        self.requests_served = 0
+        self.not_modified_served = 0
+        # Requests for the root page: one per crawl, since every crawl starts there; counted exactly, under a lock
+        self.root_requests = 0
+        self._root_lock = threading.Lock()
+        # page_id -> revision number; bump one to change that page's content
+        self.revisions = {}
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests_served += 1
+                if site.delay:
+                    time.sleep(site.delay)
+                if site.sitemaps and self.serve_sitemap():
+                    return
+                path, printable = self.path, False
+                if site.aliases:
+                    printable = path.startswith('/print/')
+                    path = path[len('/print'):] if printable else path
+                    path = path[len('/en'):] if path.startswith('/en/') else path
+                    path = path[:-len('index.html')] if path.endswith('/index.html') else path
+                if path in ('/', ''):
+                    page_id = 0
+                    with site._root_lock:
+                        site.root_requests += 1
+                elif path.startswith('/page/'):
+                    try:
+                        page_id = int(path[len('/page/'):].strip('/'))
+                    except ValueError:
+                        page_id = -1
+                else:
+                    page_id = -1
+                if not 0 <= page_id < site.page_count:
+                    self.send_error(404)
+                    return
+                body = render_page(page_id, site.page_count, site.fanout, site.revisions.get(page_id, 0),
+                                   site.filler, site.aliases, printable, is_volatile(page_id, site.volatile)).encode('utf-8')
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    site.not_modified_served += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def serve_sitemap(self):
+                if self.path == '/robots.txt':
+                    body, content_type = f'User-agent: *\nSitemap: {site.url}sitemap_index.xml\n', 'text/plain'
+                elif self.path == '/sitemap_index.xml':
+                    body, content_type = render_sitemap_index(site.url.rstrip('/'), site.page_count), 'application/xml'
+                elif self.path.startswith('/sitemaps/pages-') and self.path.endswith('.xml.gz'):
+                    start = int(self.path[len('/sitemaps/pages-'):-len('.xml.gz')]) * SITEMAP_PAGE_SIZE
+                    page_ids = range(start, min(start + SITEMAP_PAGE_SIZE, site.page_count))
+                    body = gzip.compress(render_urlset(site.url.rstrip('/'), page_ids, site.revisions).encode('utf-8'))
+                    content_type = 'application/gzip'
+                else:
+                    return False
+                site.sitemap_requests += 1
+                body = body if isinstance(body, bytes) else body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return True
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = FixtureServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
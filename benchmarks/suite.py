@@ -0,0 +1,267 @@
+"""
+Reproducible offline benchmark suite, with results stored as JSON.
+
+Each scenario generates a synthetic site (page count, fan-out, page size, share of pages
+with volatile content, server latency), serves it from a local HTTP server and measures:
+- crawl: first crawl and recrawl time, pages per second, requests, bytes and 304s;
+- hash: parse and hash cost per page, for soup and fast extraction;
+- render: full and incremental llms.txt render time of the crawled tree;
+- create_llms: end-to-end time and Python heap peak.
+The TaskManager is then run with many scheduled tasks over several sites to measure
+scheduled runs per second (at most tasks / interval) and start lag.
+
+Nothing touches the network, the LLM is not called, and the sites, seeds and settings
+are recorded with the results. Timings are the best of --repeat runs. With --compare,
+every metric is checked against an earlier result file and the run exits with status 1
+if any got worse by more than --tolerance.
+
+    python -m benchmarks.suite --output data/benchmarks/baseline.json
+    python -m benchmarks.suite --quick --compare data/benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Everything the app writes goes to a scratch directory, and pages are parsed inline so
+# results do not depend on the machine's core count; both are read at import
+DATA_DIR = tempfile.mkdtemp(prefix='bench_suite_')
+os.environ['LLMS_DB_PATH'] = os.path.join(DATA_DIR, 'llms.db')
+os.environ['LLMS_SNAPSHOT_DIR'] = os.path.join(DATA_DIR, 'snapshots')
+os.environ['LLMS_FULL_TEXT_DIR'] = os.path.join(DATA_DIR, 'full')
+os.environ['LLMS_CACHE_PATH'] = os.path.join(DATA_DIR, 'llm_cache.db')
+os.environ.setdefault('LLMS_PARSE_WORKERS', '0')
+
+from app import metrics  # noqa: E402
+from app.crawler import (PARSE_WORKERS, create_llms, crawl_site_as_tree, parse_page_timed,  # noqa: E402
+                         render_markdown_incremental)
+from app.snapshots import SnapshotStore  # noqa: E402
+from app.store import TaskStore  # noqa: E402
+from benchmarks.fixture_site import FixtureSite, filler_for_page_bytes, render_page  # noqa: E402
+
+SCENARIOS = {
+    # name: page count, fan-out, page size in bytes, volatile share, server latency in seconds
+    'docs': {'pages': 500, 'fanout': 8, 'page_bytes': 4000, 'volatile': 0.0, 'latency': 0.005},
+    'slow': {'pages': 200, 'fanout': 5, 'page_bytes': 4000, 'volatile': 0.0, 'latency': 0.05},
+    'heavy': {'pages': 200, 'fanout': 5, 'page_bytes': 60000, 'volatile': 0.0, 'latency': 0.0},
+    'noisy': {'pages': 300, 'fanout': 6, 'page_bytes': 4000, 'volatile': 0.3, 'latency': 0.005},
+}
+SCHEDULER = {'sites': 8, 'tasks': 16, 'pages': 20, 'interval': 1, 'duration': 6.0}
+HASH_SAMPLE_PAGES = 50
+
+
+def metric(value, unit, better):
+    return {'value': round(value, 6) if isinstance(value, float) else value, 'unit': unit, 'better': better}
+
+
+def best_of(repeat, func):
+    """Run func repeat times; return (best seconds, last result)."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_crawl(site, config, repeat):
+    pages = config['pages']
+    requests_before = site.requests_served
+    bytes_before = metrics.DOWNLOADED_BYTES.value()
+    elapsed, (root, hashmap, _) = best_of(repeat, lambda: crawl_site_as_tree(
+        site.url, [], max_pages=pages, max_depth=10, parse_workers=0))
+    requests = (site.requests_served - requests_before) // repeat
+    downloaded = (metrics.DOWNLOADED_BYTES.value() - bytes_before) // repeat
+
+    requests_before, not_modified_before = site.requests_served, site.not_modified_served
+    recrawl, (_, _, changes) = best_of(repeat, lambda: crawl_site_as_tree(
+        site.url, [], hashmap, max_pages=pages, max_depth=10, parse_workers=0))
+    recrawl_requests = (site.requests_served - requests_before) // repeat
+    recrawl_not_modified = (site.not_modified_served - not_modified_before) // repeat
+    results = {
+        'crawl_seconds': metric(elapsed, 's', 'lower'),
+        'crawl_pages': metric(len(hashmap), 'pages', 'higher'),
+        'crawl_pages_per_second': metric(len(hashmap) / elapsed, 'pages/s', 'higher'),
+        'crawl_requests': metric(requests, 'requests', 'lower'),
+        'crawl_downloaded_bytes': metric(downloaded, 'bytes', 'lower'),
+        'recrawl_seconds': metric(recrawl, 's', 'lower'),
+        'recrawl_requests': metric(recrawl_requests, 'requests', 'lower'),
+        'recrawl_not_modified': metric(recrawl_not_modified, 'responses', 'higher'),
+        'recrawl_pages_modified': metric(len(changes.modified), 'pages', 'lower'),
+    }
+    return results, root
+
+
+def bench_hash(config, repeat):
+    filler = filler_for_page_bytes(config['page_bytes'])
+    bodies = [render_page(page_id, config['pages'], config['fanout'], filler=filler).encode('utf-8')
+              for page_id in range(min(HASH_SAMPLE_PAGES, config['pages']))]
+    results = {}
+    for mode in ('soup', 'fast'):
+        best_parse, best_hash = None, None
+        for _ in range(repeat):
+            parse_total = hash_total = 0.0
+            for body in bodies:
+                _, (parse_seconds, hash_seconds) = parse_page_timed(body, 'http://127.0.0.1/', 'utf-8', mode)
+                parse_total += parse_seconds
+                hash_total += hash_seconds
+            best_parse = parse_total if best_parse is None else min(best_parse, parse_total)
+            best_hash = hash_total if best_hash is None else min(best_hash, hash_total)
+        results[f'{mode}_parse_ms_per_page'] = metric(best_parse * 1000 / len(bodies), 'ms', 'lower')
+        results[f'{mode}_hash_ms_per_page'] = metric(best_hash * 1000 / len(bodies), 'ms', 'lower')
+    return results
+
+
+def bench_render(root, repeat):
+    full, (_, sections, _) = best_of(repeat, lambda: render_markdown_incremental(root, None))
+    incremental, _ = best_of(repeat, lambda: render_markdown_incremental(root, sections))
+    return {
+        'render_full_ms': metric(full * 1000, 'ms', 'lower'),
+        'render_incremental_ms': metric(incremental * 1000, 'ms', 'lower'),
+    }
+
+
+def bench_create_llms(site, config, repeat):
+    def run():
+        with tempfile.TemporaryDirectory() as path:
+            return create_llms(site.url, max_pages=config['pages'], snapshot_store=SnapshotStore(path))
+    elapsed, _ = best_of(repeat, run)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'create_llms_seconds': metric(elapsed, 's', 'lower'),
+        'create_llms_peak_mib': metric(peak / 2 ** 20, 'MiB', 'lower'),
+    }
+
+
+def bench_scheduler(config):
+    import run  # noqa: E402
+    sites = [FixtureSite(page_count=config['pages'], fanout=4, delay=0.005) for _ in range(config['sites'])]
+    for site in sites:
+        site.__enter__()
+    manager = run.TaskManager(store=TaskStore(os.path.join(DATA_DIR, 'scheduler.db')))
+    try:
+        for i in range(config['tasks']):
+            # A fixed interval (max equals min), so the run count does not depend on the change-rate estimate
+            manager.add_task(f'bench-{i}', sites[i % len(sites)].url, config['interval'], max_pages=config['pages'],
+                             max_interval_seconds=config['interval'])
+        runs_before = metrics.CRAWLS.value()
+        lag_before = metrics.SCHEDULER_LAG.totals(manager.scheduler.name)
+        time.sleep(config['duration'])
+        runs = metrics.CRAWLS.value() - runs_before
+        lag_count, lag_sum = metrics.SCHEDULER_LAG.totals(manager.scheduler.name)
+    finally:
+        manager.shutdown()
+        for site in sites:
+            site.__exit__(None, None, None)
+    starts = lag_count - lag_before[0]
+    return {
+        'scheduler_runs_per_second': metric(runs / config['duration'], 'runs/s', 'higher'),
+        'scheduler_mean_lag_seconds': metric((lag_sum - lag_before[1]) / starts if starts else 0.0, 's', 'lower'),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scenarios, scheduler, repeat):
+    results = {}
+    for name, config in scenarios.items():
+        print(f'scenario {name}: {config}')
+        with FixtureSite(page_count=config['pages'], fanout=config['fanout'], delay=config['latency'],
+                         filler=filler_for_page_bytes(config['page_bytes']), volatile=config['volatile']) as site:
+            crawl_results, root = bench_crawl(site, config, repeat)
+            results[name] = dict(crawl_results, **bench_hash(config, repeat), **bench_render(root, repeat),
+                                 **bench_create_llms(site, config, repeat))
+    print(f'scheduler: {scheduler}')
+    results['scheduler'] = bench_scheduler(scheduler)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print each metric's change against baseline; return the names of the ones worse by more than tolerance."""
+    regressions = []
+    for group, group_metrics in results.items():
+        for name, current in group_metrics.items():
+            previous = baseline.get('results', {}).get(group, {}).get(name)
+            if previous is None or not previous['value']:
+                continue
+            change = current['value'] / previous['value'] - 1
+            worse = change > tolerance if current['better'] == 'lower' else change < -tolerance
+            if worse:
+                regressions.append(f'{group}.{name}')
+            print(f"{'REGRESSION' if worse else '':10s} {group + '.' + name:45s} {previous['value']:>14} -> "
+                  f"{current['value']:>14} {current['unit']:8s} {change * 100:+7.1f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='JSON file to write (default data/benchmarks/<time>-<commit>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='relative change that counts as a regression')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--quick', action='store_true', help='a fifth of the pages, one repeat and a shorter scheduler run')
+    args = parser.parse_args()
+
+    scenarios = {name: dict(SCENARIOS[name]) for name in args.scenarios}
+    scheduler = dict(SCHEDULER)
+    repeat = args.repeat
+    if args.quick:
+        for config in scenarios.values():
+            config['pages'] = max(20, config['pages'] // 5)
+        scheduler['duration'] = 3.0
+        repeat = 1
+
+    started = time.perf_counter()
+    results = run_suite(scenarios, scheduler, repeat)
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'scenarios': scenarios, 'scheduler': scheduler, 'repeat': repeat, 'parse_workers': PARSE_WORKERS,
+                     'hash_sample_pages': HASH_SAMPLE_PAGES},
+        'elapsed_seconds': round(time.perf_counter() - started, 1),
+        'results': results,
+    }
+    output = args.output or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'benchmarks',
+                                         f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    for group, group_metrics in results.items():
+        for name, value in group_metrics.items():
+            print(f"{group + '.' + name:45s} {value['value']:>14} {value['unit']}")
+    print(f'wrote {output}')
+
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {args.compare} (commit {baseline.get('commit')}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            status = 1
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,52 +1,186 @@
-from flask import Flask, render_template, request, jsonify
-from app.crawler import create_llms
+from flask import Flask, Blueprint, render_template, request, jsonify, Response, stream_with_context
 from app.alternatives import firecrawl_get
+from app.jobs import JobManager
+from app.full_text import FULL_TEXT_DIR, iter_file_chunks
+from app.compression import negotiate, etag_matches, strong_etag
+from app.batch import BatchRunner, BATCH_DIR, BATCH_CONCURRENCY, BATCH_PER_DOMAIN, site_key
+from app.url_rules import compile_avoid_rules, validate_rules, InvalidRuleError, ALLOW_REGEX_RULES
+from app.store import TaskStore
+from app.revisit import DEFAULT_MAX_INTERVAL_SECONDS, new_history, observe, revisit_interval, change_rate
+from app import metrics
 import uuid
 import os
-from datetime import datetime, timedelta
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
+import re
+import json
+import time
+from datetime import datetime
+from app.scheduler import CrawlScheduler, estimate_crawl_memory
+from app.coordination import Coordinator, claim_task_run
 import threading
+from concurrent.futures import ThreadPoolExecutor
+
+LONG_POLL_MAX_SECONDS = 30
+# Whether processes from create_app() run scheduled crawls (any number may; see app.coordination) or only serve requests
+RUN_SCHEDULER = os.environ.get('LLMS_SCHEDULER', '1') != '0'
+BATCH_ID_RE = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+def llms_full_path(name):
+    return os.path.join(FULL_TEXT_DIR, f'{name}.txt')
+
+def parse_avoid_rules(text):
+    """Split the avoid box into rules, one per line; raises InvalidRuleError for a rule that cannot be used"""
+    return validate_rules([line.strip() for line in text.split('\n') if line.strip()], allow_regex=ALLOW_REGEX_RULES)
+
+def invalid_rule_response(error):
+    return jsonify({'error': str(error), 'rule': error.rule}), 400
 
 class ScheduledTask:
-    def __init__(self, task_id, base_url, time_created=None, time_last_run=None, last_status='pending', last_result=None, 
-                 avoid_url_substring_list=None, use_llm=False, llm_instructions='', new_url_hashmap=None, anything_changed=False, max_pages=20):
+    def __init__(self, task_id, base_url, store, trigger_interval_seconds=70, time_created=None, time_last_run=None, last_status='pending',
+                 avoid_url_substring_list=None, use_llm=False, llm_instructions='', anything_changed=False, max_pages=20,
+                 discovery='links', full_text=False, max_interval_seconds=None, revisit=None, profile=False,
+                 last_profile=None, last_changes=None, last_revisits=None):
         self.task_id = task_id
         self.base_url = base_url
+        # Results and per-URL crawl state live in the store, not on the task object
+        self.store = store
+        # The interval is adaptive: between trigger_interval_seconds and max_interval_seconds, by observed change rate
+        self.trigger_interval_seconds = trigger_interval_seconds
+        self.max_interval_seconds = max(max_interval_seconds or DEFAULT_MAX_INTERVAL_SECONDS, trigger_interval_seconds)
+        self.revisit = revisit or new_history(time.time())
+        self.last_revisits = last_revisits
         self.time_created = time_created or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         self.time_last_run = time_last_run
         self.last_status = last_status
-        self.last_result = last_result
         self.avoid_url_substring_list = avoid_url_substring_list or []
         self.use_llm = use_llm
         self.llm_instructions = llm_instructions
-        self.new_url_hashmap = new_url_hashmap
-        self.anything_changed = anything_changed
+        self.anything_changed = bool(anything_changed)
+        self.last_changes = last_changes
         self.max_pages = max_pages
+        self.discovery = discovery
+        self.full_text = bool(full_text)
+        # With profile, each run records a per-stage crawl profile (see app.metrics)
+        self.profile = bool(profile)
+        self.last_profile = last_profile
 
-    def to_dict(self):
-        """Convert task to dictionary for JSON serialization"""
+    @property
+    def last_result(self):
+        return self.store.get_result(self.task_id)
+
+    @last_result.setter
+    def last_result(self, result):
+        self.store.set_result(self.task_id, result)
+
+    @property
+    def sections(self):
+        return self.store.get_sections(self.task_id)
+
+    @sections.setter
+    def sections(self, sections):
+        self.store.set_sections(self.task_id, sections)
+
+    @property
+    def new_url_hashmap(self):
+        return self.store.load_url_hashmap(self.task_id)
+
+    @new_url_hashmap.setter
+    def new_url_hashmap(self, hashmap):
+        self.store.replace_url_hashmap(self.task_id, hashmap)
+
+    def exists(self):
+        """Whether the task is still stored; the store drops writes of crawl state to a deleted task"""
+        return self.store.has_task(self.task_id)
+
+    def remove_full_text(self):
+        try:
+            os.remove(llms_full_path(self.task_id))
+        except FileNotFoundError:
+            pass
+
+    def _discard_if_deleted(self):
+        """Remove the llms-full.txt a run wrote if its task was deleted while it ran"""
+        if self.exists():
+            return
+        if self.full_text:
+            self.remove_full_text()
+        print(f"Task {self.task_id} was deleted during its run; its output was discarded")
+
+    @property
+    def avoid_rules(self):
+        """The compiled avoid rules, compiled on first use and shared by every task with the same rules"""
+        return compile_avoid_rules(self.avoid_url_substring_list)
+
+    @property
+    def revisit_bounds(self):
+        """(min, max) revisit seconds, or None when the interval is fixed"""
+        if self.max_interval_seconds <= self.trigger_interval_seconds:
+            return None
+        return self.trigger_interval_seconds, self.max_interval_seconds
+
+    @property
+    def effective_interval_seconds(self):
+        """Seconds until the next run, from the task's observed change rate"""
+        return round(revisit_interval(self.revisit, self.trigger_interval_seconds, self.max_interval_seconds))
+
+    @property
+    def change_rate_per_day(self):
+        rate = change_rate(self.revisit)
+        return round(rate * 86400, 3) if rate is not None else None
+
+    def metadata(self):
+        """Task settings and run status, without the stored result or per-URL crawl state"""
         return {
             'task_id': self.task_id,
             'base_url': self.base_url,
+            'trigger_interval_seconds': self.trigger_interval_seconds,
+            'max_interval_seconds': self.max_interval_seconds,
+            'effective_interval_seconds': self.effective_interval_seconds,
+            'change_rate_per_day': self.change_rate_per_day,
+            'last_revisits': self.last_revisits,
             'time_created': self.time_created,
             'time_last_run': self.time_last_run,
             'last_status': self.last_status,
-            'last_result': self.last_result,
             'avoid_url_substring_list': self.avoid_url_substring_list,
             'use_llm': self.use_llm,
             'llm_instructions': self.llm_instructions,
-            'new_url_hashmap': self.new_url_hashmap,
             'anything_changed': self.anything_changed,
-            'max_pages': self.max_pages
+            'last_changes': self.last_changes,
+            'max_pages': self.max_pages,
+            'discovery': self.discovery,
+            'full_text': self.full_text,
+            'profile': self.profile,
+            'last_profile': self.last_profile
         }
-    
+
+    def to_dict(self):
+        """Convert task to dictionary for JSON serialization"""
+        return dict(self.metadata(), last_result=self.last_result, new_url_hashmap=self.new_url_hashmap)
+
+    def to_summary(self, result=None):
+        """Task metadata for listings: no result body or hashmap, just the result's ETag, version, size and a preview"""
+        result = result or {}
+        return dict(
+            self.metadata(),
+            result_etag=result.get('etag'),
+            result_version=result.get('version', 0),
+            result_size=result.get('size', 0),
+            result_preview=result.get('preview'),
+            result_url=f'/llms/{self.task_id}.txt',
+        )
+
+    @property
+    def full_text_path(self):
+        """Where this task's llms-full.txt is written, or None if it does not produce one"""
+        return llms_full_path(self.task_id) if self.full_text else None
+
     def update_last_run(self, status='completed', content_updated=False, result=None):
         """Update the last run time and status"""
         self.time_last_run = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         self.last_status = status
         if content_updated and result is not None:
             self.last_result = result
+        # Only the run's columns: settings changed meanwhile, by this or another process, are kept
+        self.store.save_run_state(self)
     
     def run(self):
         """Execute the scheduled task"""
@@ -60,119 +194,254 @@ class ScheduledTask:
         print(f"  Last Run: {self.time_last_run}")
         print("-" * 50)
         
+        from app.crawler import create_llms
+        started = time.time()
+        profile = metrics.CrawlProfile() if self.profile else None
         try:
-            generated_llms, generated_llms_llm, new_url_hashmap, anything_changed = create_llms(self.base_url, self.avoid_url_substring_list, self.use_llm, self.llm_instructions, self.new_url_hashmap, max_pages=self.max_pages)
+            with metrics.profiling(profile):
+                generated_llms, generated_llms_llm, new_url_hashmap, changes, sections = create_llms(
+                    self.base_url, self.avoid_rules, self.use_llm, self.llm_instructions, self.new_url_hashmap,
+                    max_pages=self.max_pages, prev_sections=self.sections, discovery=self.discovery,
+                    full_text_path=self.full_text_path, revisit_bounds=self.revisit_bounds, keep_output=self.exists)
             llms_to_save = generated_llms
             if generated_llms_llm:
                 llms_to_save = generated_llms_llm
-            print(f"Ran llms for {self.base_url} at time {datetime.now()} with length {len(generated_llms)} and anything_changed: {anything_changed}")
-            self.update_last_run('completed', content_updated=anything_changed, result=llms_to_save)
+            # Keep the per-URL hashes and validators so the next run can revalidate instead of refetching
+            self.new_url_hashmap = new_url_hashmap
+            self.sections = sections
+            print(f"Ran llms for {self.base_url} at time {datetime.now()} with length {len(generated_llms)} and anything_changed: {bool(changes)}")
+            self.anything_changed = bool(changes)
+            self.last_changes = {kind: len(urls) for kind, urls in changes.to_dict().items()}
+            # Pages visited by this run carry its timestamp; the rest were not due and were reused
+            fetched = sum(1 for entry in new_url_hashmap.values() if (entry.get('revisit') or {}).get('checked_at', 0) >= started)
+            self.last_revisits = {'fetched': fetched, 'reused': len(new_url_hashmap) - fetched}
+            self.revisit = observe(self.revisit, bool(changes), started)
+            if profile is not None:
+                self.last_profile = profile.to_dict()
+            self.update_last_run('completed', content_updated=bool(changes), result=llms_to_save)
+            self._discard_if_deleted()
         except Exception as e:
             print(f"Error creating llms for {self.base_url}: {e} at time {datetime.now()}")
             self.update_last_run('error', f"Error: {e}")
 
+    def rebuild(self, on_page=None, on_markdown=None):
+        """Re-render the task's llms.txt from its last crawl's page snapshots, without fetching the site"""
+        from app.crawler import create_llms
+        generated_llms, generated_llms_llm, new_url_hashmap, changes, sections = create_llms(
+            self.base_url, self.avoid_rules, self.use_llm, self.llm_instructions, self.new_url_hashmap,
+            max_pages=self.max_pages, prev_sections=self.sections, discovery=self.discovery,
+            on_page=on_page, on_markdown=on_markdown, from_snapshot=True, full_text_path=self.full_text_path,
+            keep_output=self.exists)
+        self.new_url_hashmap = new_url_hashmap
+        self.sections = sections
+        self.anything_changed = True
+        self.last_changes = {kind: len(urls) for kind, urls in changes.to_dict().items()}
+        self.update_last_run('rebuilt', content_updated=True, result=generated_llms_llm or generated_llms)
+        self._discard_if_deleted()
+        return generated_llms, generated_llms_llm
+
 class TaskManager:
-    def __init__(self):
+    def __init__(self, store=None, run_scheduler=True):
         self.tasks = {}
-        # Configure scheduler for single worker environment
-        self.scheduler = BackgroundScheduler({
-            'apscheduler.job_defaults.max_instances': 1,  # Only allow 1 instance per job
-            'apscheduler.job_defaults.coalesce': True,    # Combine missed executions
-            'apscheduler.job_defaults.misfire_grace_time': 300  # 5 minutes grace period for missed jobs
-        })
-        self.scheduler.start()
+        self.store = store or TaskStore()
+        self._tasks_version = None
+        self._runs_version = None
+        self._sync_lock = threading.Lock()
+        # Bounded crawl workers with per-domain caps and memory-based admission; runs are delayed, never dropped
+        self.scheduler = CrawlScheduler()
+        # Due runs are shared by every process on this database (see app.coordination); without run_scheduler,
+        # this process only serves tasks and leaves their runs to the others
+        self.coordinator = None
+        self.load_tasks()
+        if run_scheduler:
+            self.scheduler.start()
+            self.coordinator = Coordinator(self.store, self.scheduler, self._run_task_wrapper)
+            self.coordinator.start()
+
+    def load_tasks(self):
+        """Reload tasks from the store and put any not on the shared schedule yet on it"""
+        self.sync()
+        for task in list(self.tasks.values()):
+            self._schedule(task)
+        print(f"Loaded {len(self.tasks)} scheduled tasks from {self.store.path}")
+
+    def sync(self):
+        """Catch up with changes any process made in the store since the last sync"""
+        versions = self.store.versions()
+        if versions == (self._tasks_version, self._runs_version):
+            return
+        tasks_version, runs_version = versions
+        with self._sync_lock:
+            if tasks_version != self._tasks_version:
+                # A task was added, changed or deleted: reload them all
+                tasks = {}
+                for row in self.store.load_tasks():
+                    tasks[row['task_id']] = ScheduledTask(store=self.store, **row)
+                self.tasks = tasks
+                self._tasks_version = tasks_version
+            elif runs_version != self._runs_version:
+                # Runs finished: refresh the status of just their tasks
+                for task_id, state in self.store.load_run_states(self._runs_version).items():
+                    task = self.tasks.get(task_id)
+                    if task is not None:
+                        for column, value in state.items():
+                            setattr(task, column, value)
+            self._runs_version = runs_version
+
+    def _schedule(self, task):
+        """Put the task on the shared schedule, first due one effective interval from now; a scheduled task keeps its due time"""
+        self.store.schedule_task(task.task_id, site_key(task.base_url), estimate_crawl_memory(task.max_pages),
+                                 time.time() + task.effective_interval_seconds)
     
-    def add_task(self, task_id, base_url, trigger_interval_seconds, last_result=None, avoid_url_substring_list=None, use_llm=False, llm_instructions='', new_url_hashmap=None, anything_changed=False, max_pages=20):
+    def add_task(self, task_id, base_url, trigger_interval_seconds, last_result=None, avoid_url_substring_list=None, use_llm=False, llm_instructions='', new_url_hashmap=None, anything_changed=False, max_pages=20, sections=None, discovery='links', full_text=False, max_interval_seconds=None, profile=False, last_profile=None):
         """Add a new task to the manager"""
-        # Limit the number of concurrent tasks to prevent memory issues
-        if len(self.tasks) >= 3:
-            print(f"WARNING: Too many scheduled tasks ({len(self.tasks)}). Removing oldest task.")
-            oldest_task_id = next(iter(self.tasks))
-            self.remove_task(oldest_task_id)
-        
-        task = ScheduledTask(task_id, base_url, last_result=last_result, 
+        task = ScheduledTask(task_id, base_url, self.store, trigger_interval_seconds=trigger_interval_seconds,
                            avoid_url_substring_list=avoid_url_substring_list, 
                            use_llm=use_llm, llm_instructions=llm_instructions,
-                           new_url_hashmap=new_url_hashmap, anything_changed=anything_changed, max_pages=max_pages)
+                           anything_changed=anything_changed, max_pages=max_pages,
+                           discovery=discovery, full_text=full_text,
+                           max_interval_seconds=max_interval_seconds, profile=profile, last_profile=last_profile)
+        self.store.save_task(task)
+        # Crawl state is only stored for tasks that exist, so it is written after the task
+        if last_result is not None:
+            task.last_result = last_result
+        if sections is not None:
+            task.sections = sections
+        if new_url_hashmap is not None:
+            task.new_url_hashmap = new_url_hashmap
+        self._schedule(task)
         self.tasks[task_id] = task
         
-        # Schedule the task to run every X seconds
-        self.scheduler.add_job(
-            func=self._run_task_wrapper,
-            trigger=IntervalTrigger(seconds=trigger_interval_seconds),
-            args=[task_id],
-            id=f"job_{task_id}",
-            replace_existing=True
-        )
-        
         print(f"Created new scheduled task: {task_id} for URL: {base_url}")
         return task
     
+    def update_task_settings(self, task_id, avoid_url_substring_list=None, use_llm=None, llm_instructions=None, max_pages=None):
+        """Change a task's output settings (None leaves a setting as is) and reschedule it"""
+        task = self.get_task(task_id)
+        if task is None:
+            return None
+        if avoid_url_substring_list is not None:
+            task.avoid_url_substring_list = avoid_url_substring_list
+        if use_llm is not None:
+            task.use_llm = use_llm
+        if llm_instructions is not None:
+            task.llm_instructions = llm_instructions
+        if max_pages is not None:
+            task.max_pages = max_pages
+        self.store.save_task(task)
+        # max_pages feeds the scheduler's memory estimate
+        self._schedule(task)
+        return task
+
+    def claim_run(self, task_id, kind):
+        """Claim a run of the task outside its schedule, e.g. a rebuild; None while a run of it is in progress in any process"""
+        return claim_task_run(self.store, task_id, kind)
+
     def remove_task(self, task_id):
         """Remove a task from the manager"""
-        if task_id in self.tasks:
-            # Remove from scheduler
-            job_id = f"job_{task_id}"
-            try:
-                self.scheduler.remove_job(job_id)
-                print(f"Removed scheduled job: {job_id}")
-            except Exception as e:
-                print(f"Error removing job {job_id}: {e}")
-            
-            # Remove from tasks dict
-            task = self.tasks.pop(task_id)
-            print(f"TASK DELETED: {task_id} for URL: {task.base_url}")
-            return task
-        return None
+        task = self.get_task(task_id)
+        if task is None:
+            return None
+        # Removes it from the shared schedule too; a run in progress finishes, but what it writes afterwards is
+        # dropped, and it is not rescheduled
+        self.tasks.pop(task_id, None)
+        self.store.delete_task(task_id)
+        task.remove_full_text()
+        print(f"TASK DELETED: {task_id} for URL: {task.base_url}")
+        return task
     
     def get_task(self, task_id):
         """Get a task by ID"""
+        self.sync()
         return self.tasks.get(task_id)
     
     def get_all_tasks(self):
         """Get all tasks as a list of dictionaries"""
-        return [task.to_dict() for task in self.tasks.values()]
+        self.sync()
+        return [task.to_dict() for task in list(self.tasks.values())]
+
+    def get_task_summaries(self):
+        """Get all tasks as summaries, reading result metadata in one query"""
+        self.sync()
+        results = self.store.result_summaries()
+        return [task.to_summary(results.get(task.task_id)) for task in list(self.tasks.values())]
     
     def _run_task_wrapper(self, task_id):
-        """Wrapper function to run a task (for scheduler compatibility)"""
+        """Run a task claimed by the coordinator; returns its next interval, or None if it no longer exists"""
+        task = self.get_task(task_id)
+        if task is None:
+            print(f"Task {task_id} not found!")
+            return None
         try:
-            # Check memory usage before running task
-            import psutil
-            memory_percent = psutil.virtual_memory().percent
-            if memory_percent > 80:
-                print(f"WARNING: High memory usage ({memory_percent}%). Skipping task {task_id}")
-                return
-            
-            task = self.get_task(task_id)
-            if task:
-                task.run()
-            else:
-                print(f"Task {task_id} not found!")
+            task.run()
         except Exception as e:
             print(f"Error in task {task_id}: {e}")
+        return task.effective_interval_seconds
 
-# Initialize the task manager
-task_manager = TaskManager()
+    def shutdown(self):
+        """Stop claiming runs, let the running ones finish, then leave the coordination"""
+        if self.coordinator is not None:
+            self.coordinator.stop_claiming()
+        self.scheduler.shutdown()
+        if self.coordinator is not None:
+            self.coordinator.shutdown()
 
-# Add initial dummy task
-# dummy_task = task_manager.add_task(
-#     'task_001',
-#     'https://example.com',
-#     30,
-#     '# Example llms.txt\n\nThis is a sample llms.txt file for testing purposes.\n\n## Allowed Models\n- GPT-4\n- Claude-3\n- Gemini\n\n## Disallowed Models\n- GPT-3.5\n- Older models\n\n## Rate Limits\n- 100 requests per hour\n- 1000 requests per day'
-# )
-# dummy_task.time_created = '2024-01-15 10:30:00'
-# dummy_task.time_last_run = '2024-01-20 14:45:00'
-# dummy_task.last_status = 'completed'
+# Set by create_app(); nothing is started at import, so parse-pool workers and tools importing this module stay light
+task_manager = None
+job_manager = None
+firecrawl_executor = None
 
-app = Flask(__name__)
+bp = Blueprint('llms', __name__)
 
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/generate', methods=['POST'])
+def run_generate_job(job, url, avoid_list, use_llm, llm_instructions, max_pages, schedule_updates, trigger_interval, discovery,
+                     full_text=False, max_interval=None, profile=False):
+    """Crawl in the job, with the firecrawl comparison fetched concurrently; publish outputs as each is ready."""
+    from app.crawler import create_llms
+    def firecrawl_done(future):
+        try:
+            job.set_output('output2', future.result())
+        except Exception as e:
+            print(f"Error fetching firecrawl llms.txt for {url}: {e}")
+            job.set_output('output2', f"Error: {e}")
+
+    firecrawl_future = firecrawl_executor.submit(firecrawl_get, url)
+    firecrawl_future.add_done_callback(firecrawl_done)
+
+    full_text_path = None
+    if full_text:
+        full_text_path = llms_full_path(f'jobs/{job.job_id}')
+        job.add_file(full_text_path)
+    crawl_profile = metrics.CrawlProfile() if profile else None
+    with metrics.profiling(crawl_profile):
+        generated_llms, generated_llms_llm, new_url_hashmap, changes, sections = create_llms(
+            url, avoid_list, use_llm, llm_instructions, max_pages=max_pages, discovery=discovery,
+            on_page=job.page, on_markdown=lambda markdown: job.set_output('output1', markdown), full_text_path=full_text_path)
+    last_profile = crawl_profile.to_dict() if crawl_profile is not None else None
+    if last_profile is not None:
+        job.publish('profile', last_profile)
+    if full_text:
+        job.publish('llms_full', {'url': f'/jobs/{job.job_id}/llms-full.txt'})
+    job.set_output('output3', generated_llms_llm)
+
+    # Only create scheduled task if checkbox is checked
+    if schedule_updates:
+        # Create a new scheduled task using the task manager
+        task_id = str(uuid.uuid4())
+        task = task_manager.add_task(task_id, url, trigger_interval, generated_llms, avoid_list, use_llm, llm_instructions, new_url_hashmap, bool(changes), max_pages, sections, discovery, full_text, max_interval, profile, last_profile)
+        print(f"Generated llms.txt for URL: {url} and created scheduled task recrawling every {trigger_interval}s to {task.max_interval_seconds}s")
+    else:
+        print(f"Generated llms.txt for URL: {url} (no scheduling)")
+
+    # firecrawl_get has its own timeout, so this wait is bounded
+    firecrawl_future.exception()
+
+@bp.route('/generate', methods=['POST'])
 def generate():
+    """Start a generate job and return its id; follow it via /jobs/<job_id> or /jobs/<job_id>/events"""
     try:
         url = request.json.get('url')
         schedule_updates = request.json.get('scheduleUpdates', False)
@@ -180,44 +449,219 @@ def generate():
         use_llm = request.json.get('useLLM', False)
         llm_instructions = request.json.get('llmInstructions', '')
         trigger_interval = request.json.get('triggerInterval', 70)
+        max_interval = request.json.get('maxInterval')
         max_pages = request.json.get('maxPages', 20)
+        discovery = 'sitemap' if request.json.get('useSitemap', False) else 'links'
+        full_text = bool(request.json.get('fullText', False))
+        profile = bool(request.json.get('profile', False))
         
         # Parse avoid substrings into a list (split by newlines and filter empty lines)
-        avoid_list = [line.strip() for line in avoid_substrings.split('\n') if line.strip()]
+        avoid_list = parse_avoid_rules(avoid_substrings)
         
         print(f"URL: {url}")
         print(f"Schedule updates: {schedule_updates}")
         print(f"Use LLM: {use_llm}")
         print(f"LLM Instructions: {llm_instructions}")
         print(f"Trigger interval: {trigger_interval} seconds")
+        print(f"Max interval: {max_interval or DEFAULT_MAX_INTERVAL_SECONDS} seconds")
         print(f"Max pages: {max_pages}")
+        print(f"Discovery: {discovery}")
+        print(f"llms-full.txt: {full_text}")
+        print(f"Profile: {profile}")
         print(f"Avoid substrings: {avoid_list}")
         
-        # Generate llms.txt content
-        generated_llms, generated_llms_llm, new_url_hashmap, anything_changed = create_llms(url, avoid_list, use_llm, llm_instructions, max_pages=max_pages)
-        firecrawl_llms = firecrawl_get(url)
-        
-        # Only create scheduled task if checkbox is checked
-        if schedule_updates:
-            # Create a new scheduled task using the task manager
-            task_id = str(uuid.uuid4())
-            task_manager.add_task(task_id, url, trigger_interval, generated_llms, avoid_list, use_llm, llm_instructions, new_url_hashmap, anything_changed, max_pages)
-            print(f"Generated llms.txt for URL: {url} and created scheduled task with {trigger_interval}s interval")
-        else:
-            print(f"Generated llms.txt for URL: {url} (no scheduling)")
-        
-        return jsonify({'output1': generated_llms, 'output2': firecrawl_llms, 'output3': generated_llms_llm})
+        job = job_manager.submit(run_generate_job, url, avoid_list, use_llm, llm_instructions, max_pages,
+                                 schedule_updates, trigger_interval, discovery, full_text, max_interval, profile)
+        return jsonify({
+            'job_id': job.job_id,
+            'status_url': f'/jobs/{job.job_id}',
+            'events_url': f'/jobs/{job.job_id}/events'
+        }), 202
     
+    except InvalidRuleError as e:
+        return invalid_rule_response(e)
     except Exception as e:
         print(f"Error in generate endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/scheduled-tasks')
+def run_rebuild_job(job, task, claim):
+    """Rebuild a task's llms.txt from its page snapshots, publishing outputs like a generate job."""
+    try:
+        generated_llms, generated_llms_llm = task.rebuild(
+            on_page=job.page, on_markdown=lambda markdown: job.set_output('output1', markdown))
+    finally:
+        # Lets the task's scheduled runs go ahead again
+        claim.finish()
+    job.set_output('output3', generated_llms_llm)
+    print(f"Rebuilt llms.txt for task {task.task_id} from snapshots")
+
+@bp.route('/tasks/<task_id>/rebuild', methods=['POST'])
+def rebuild_task(task_id):
+    """Apply new avoidSubstrings / maxPages / useLLM / llmInstructions to a task and rebuild it without recrawling"""
+    settings = request.get_json(silent=True) or {}
+    avoid_substrings = settings.get('avoidSubstrings')
+    try:
+        avoid_list = None if avoid_substrings is None else parse_avoid_rules(avoid_substrings)
+    except InvalidRuleError as e:
+        return invalid_rule_response(e)
+    if task_manager.get_task(task_id) is None:
+        return jsonify({'error': f'Task {task_id} not found'}), 404
+    # A rebuild is a run of the task like a scheduled one, so it never overlaps one in any process
+    claim = task_manager.claim_run(task_id, 'rebuild')
+    if claim is None:
+        return jsonify({'error': f'Task {task_id} is running; rebuild it once the run has finished'}), 409
+    try:
+        task = task_manager.update_task_settings(
+            task_id,
+            avoid_url_substring_list=avoid_list,
+            use_llm=settings.get('useLLM'),
+            llm_instructions=settings.get('llmInstructions'),
+            max_pages=settings.get('maxPages'))
+        if task is None:
+            claim.finish()
+            return jsonify({'error': f'Task {task_id} not found'}), 404
+        job = job_manager.submit(run_rebuild_job, task, claim)
+    except Exception:
+        claim.finish()
+        raise
+    return jsonify({
+        'job_id': job.job_id,
+        'status_url': f'/jobs/{job.job_id}',
+        'events_url': f'/jobs/{job.job_id}/events'
+    }), 202
+
+def batch_results_path(batch_id):
+    return os.path.join(BATCH_DIR, f'{batch_id}.jsonl')
+
+def run_batch_job(job, batch_id, runner):
+    """Run a batch, publishing a `site` event (without the llms.txt bodies) as each site finishes"""
+    runner.on_result = lambda record: job.publish('site', {key: value for key, value in record.items()
+                                                           if key not in ('llms_txt', 'llms_txt_llm')})
+    summary = runner.run()
+    job.publish('batch', dict(summary, batch_id=batch_id, results_url=f'/batches/{batch_id}.jsonl'))
+
+@bp.route('/batch', methods=['POST'])
+def start_batch():
+    """Generate llms.txt for a list of sites; pass a previous batchId to resume it, skipping the sites already done"""
+    settings = request.get_json(silent=True) or {}
+    batch_id = settings.get('batchId') or uuid.uuid4().hex
+    if not BATCH_ID_RE.fullmatch(batch_id):
+        return jsonify({'error': 'batchId may only contain letters, digits, - and _'}), 400
+    try:
+        runner = BatchRunner(settings.get('sites') or [], batch_results_path(batch_id),
+                             concurrency=int(settings.get('concurrency', BATCH_CONCURRENCY)),
+                             per_domain=int(settings.get('perDomain', BATCH_PER_DOMAIN)))
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'error': f'Invalid batch: {e}'}), 400
+    if not runner.sites:
+        return jsonify({'error': 'No sites given'}), 400
+    job = job_manager.submit(run_batch_job, batch_id, runner)
+    return jsonify({
+        'batch_id': batch_id,
+        'job_id': job.job_id,
+        'status_url': f'/jobs/{job.job_id}',
+        'events_url': f'/jobs/{job.job_id}/events',
+        'results_url': f'/batches/{batch_id}.jsonl'
+    }), 202
+
+@bp.route('/batches/<batch_id>.jsonl')
+def batch_results(batch_id):
+    """Stream a batch's results so far, one JSON object per finished site"""
+    path = batch_results_path(batch_id)
+    if not BATCH_ID_RE.fullmatch(batch_id) or not os.path.exists(path):
+        return jsonify({'error': f'Batch {batch_id} not found'}), 404
+    return Response(iter_file_chunks(path), mimetype='application/x-ndjson')
+
+@bp.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Long-poll a job: wait up to `timeout` seconds for events after sequence number `after`"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    after = request.args.get('after', 0, type=int)
+    timeout = min(request.args.get('timeout', 0, type=float), LONG_POLL_MAX_SECONDS)
+    events = job.wait_events(after, timeout)
+    return jsonify(dict(job.to_dict(), events=events))
+
+@bp.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream a job's events as server-sent events, resuming after Last-Event-ID if given"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id:
+        # A client echoes back an id we sent; anything else is not an event of this stream
+        if not last_event_id.strip().isdigit():
+            return jsonify({'error': f'Invalid Last-Event-ID: {last_event_id!r}'}), 400
+        after = int(last_event_id)
+    else:
+        after = max(0, request.args.get('after', 0, type=int))
+    return Response(stream_with_context(job.sse_stream(after)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def llms_full_download(path):
+    """Stream an llms-full.txt file in chunks rather than loading it into memory"""
+    return Response(iter_file_chunks(path), mimetype='text/plain; charset=utf-8',
+                    headers={'Content-Disposition': 'attachment; filename="llms-full.txt"'})
+
+@bp.route('/jobs/<job_id>/llms-full.txt')
+def job_llms_full(job_id):
+    """Download the llms-full.txt written by a generate job with fullText"""
+    job = job_manager.get(job_id)
+    path = llms_full_path(f'jobs/{job_id}')
+    if job is None or path not in job.files or not os.path.exists(path):
+        return jsonify({'error': f'No llms-full.txt for job {job_id}'}), 404
+    return llms_full_download(path)
+
+@bp.route('/llms-full/<task_id>.txt')
+def task_llms_full(task_id):
+    """Download the llms-full.txt from a scheduled task's last run"""
+    task = task_manager.get_task(task_id)
+    if task is None or not task.full_text_path or not os.path.exists(task.full_text_path):
+        return jsonify({'error': f'No llms-full.txt for task {task_id}'}), 404
+    return llms_full_download(task.full_text_path)
+
+@bp.route('/scheduled-tasks')
 def get_scheduled_tasks():
-    """Return all scheduled tasks"""
-    return jsonify(task_manager.get_all_tasks())
+    """Return all scheduled tasks; with ?summary=1, only their metadata, revalidated by ETag"""
+    if not request.args.get('summary'):
+        return jsonify(task_manager.get_all_tasks())
+    body = json.dumps(task_manager.get_task_summaries(), sort_keys=True).encode('utf-8')
+    version = strong_etag(body)
+    headers = {'ETag': f'"{version}"', 'Cache-Control': 'no-cache'}
+    # Clients that cannot set headers pass the version they last saw as ?since=
+    if etag_matches(request.headers.get('If-None-Match') or request.args.get('since'), {version}):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='application/json', headers=headers)
+
+@bp.route('/llms/<task_id>.txt')
+def serve_llms(task_id):
+    """Serve a task's llms.txt from its precompressed bodies, answering If-None-Match with 304"""
+    task = task_manager.get_task(task_id)
+    result = task.store.get_served_result(task_id) if task else None
+    if result is None:
+        return jsonify({'error': f'No llms.txt for task {task_id}'}), 404
+    encoding = negotiate(request.headers.get('Accept-Encoding'), result)
+    # Each encoding is a different representation, so it gets its own strong ETag
+    etag = result['etag'] if encoding is None else f"{result['etag']}-{encoding}"
+    headers = {'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache',
+               'X-Result-Version': str(result['version'])}
+    variants = {result['etag']} | {f"{result['etag']}-{coding}" for coding in ('gzip', 'br') if result[coding] is not None}
+    if etag_matches(request.headers.get('If-None-Match'), variants):
+        return Response(status=304, headers=headers)
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return Response(result[encoding or 'identity'], mimetype='text/plain; charset=utf-8', headers=headers)
 
-@app.route('/delete/<task_id>', methods=['POST'])
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Crawl, LLM and scheduler metrics of this process in the Prometheus text format"""
+    if not metrics.ENABLED:
+        return jsonify({'error': 'Metrics are disabled (LLMS_METRICS=0)'}), 404
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/delete/<task_id>', methods=['POST'])
 def delete_task(task_id):
     """Delete a specific task by ID"""
     deleted_task = task_manager.remove_task(task_id)
@@ -234,11 +678,27 @@ def delete_task(task_id):
             'message': f'Task {task_id} not found'
         }), 404
 
+def create_app(run_scheduler=None):
+    """Create the Flask app and this process's task and job managers; the scheduler starts only if run_scheduler (default LLMS_SCHEDULER)"""
+    global task_manager, job_manager, firecrawl_executor
+    if run_scheduler is None:
+        run_scheduler = RUN_SCHEDULER
+    if task_manager is None:
+        task_manager = TaskManager(run_scheduler=run_scheduler)
+        # Generate requests run as background jobs; the firecrawl comparison runs beside each crawl
+        job_manager = JobManager(store=task_manager.store)
+        firecrawl_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='firecrawl')
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
     print("Press Ctrl+C to stop")
     try:
         app.run(debug=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5001)))
     except KeyboardInterrupt:
         print("\nShutting down scheduler...")
-        task_manager.scheduler.shutdown()
+        task_manager.shutdown()
+        job_manager.shutdown()
         print("Scheduler stopped")
@@ -0,0 +1,39 @@
+"""
+Everything the app writes goes to a scratch directory. Settings are read from the
+environment at import, so they are set here, before any test module imports the app.
+"""
+import os
+import tempfile
+
+import pytest
+
+DATA_DIR = tempfile.mkdtemp(prefix='llms_tests_')
+os.environ['LLMS_DB_PATH'] = os.path.join(DATA_DIR, 'llms.db')
+os.environ['LLMS_SNAPSHOT_DIR'] = os.path.join(DATA_DIR, 'snapshots')
+os.environ['LLMS_FULL_TEXT_DIR'] = os.path.join(DATA_DIR, 'full')
+os.environ['LLMS_CACHE_PATH'] = os.path.join(DATA_DIR, 'llm_cache.db')
+os.environ['LLMS_BATCH_DIR'] = os.path.join(DATA_DIR, 'batches')
+os.environ['LLMS_PARSE_WORKERS'] = '0'
+
+
+@pytest.fixture
+def store(tmp_path):
+    from app.store import TaskStore
+    return TaskStore(str(tmp_path / 'llms.db'))
+
+
+@pytest.fixture
+def manager(store):
+    """A TaskManager that runs nothing by itself; tests run tasks directly."""
+    import run
+    manager = run.TaskManager(store=store, run_scheduler=False)
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def slow_site():
+    """A local site slow enough that a test can act while a crawl of it is running."""
+    from benchmarks.fixture_site import FixtureSite
+    with FixtureSite(page_count=12, fanout=3, delay=0.05) as site:
+        yield site
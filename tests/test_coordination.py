@@ -0,0 +1,123 @@
+"""Runs shared through the task database: claims, their leases and rebuilds."""
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import run
+from app.jobs import JobManager
+from tests.test_task_manager import wait_for
+
+
+@pytest.fixture
+def client(manager, monkeypatch):
+    jobs = JobManager()
+    monkeypatch.setattr(run, 'task_manager', manager)
+    monkeypatch.setattr(run, 'job_manager', jobs)
+    app = Flask(__name__)
+    app.register_blueprint(run.bp)
+    yield app.test_client()
+    jobs.shutdown()
+
+
+def claim_due_run(store, task_id, worker_id='worker-a', lease_seconds=15):
+    """Make the task due, enqueue its run and claim it as worker_id."""
+    now = time.time()
+    store.connection().execute('UPDATE task_schedule SET next_due = ? WHERE task_id = ?', (now, task_id))
+    store.connection().commit()
+    store.enqueue_due_runs(now)
+    return store.claim_run(worker_id, now, lease_seconds)
+
+
+def test_rebuild_refused_while_a_scheduled_run_is_claimed(manager, client):
+    manager.add_task('busy', 'http://127.0.0.1:9/', 70)
+    scheduled = claim_due_run(manager.store, 'busy')
+    assert scheduled is not None
+    response = client.post('/tasks/busy/rebuild', json={'maxPages': 5})
+    assert response.status_code == 409
+    # The refused rebuild changed nothing
+    assert manager.get_task('busy').max_pages == 20
+    assert manager.store.finish_run(scheduled, 'worker-a', time.time())
+    response = client.post('/tasks/busy/rebuild', json={'maxPages': 5})
+    assert response.status_code == 202
+    job = run.job_manager.get(response.get_json()['job_id'])
+    wait_for(lambda: job.done)
+    assert job.status == 'completed', job.error
+    assert manager.get_task('busy').max_pages == 5
+
+
+def test_scheduled_run_waits_for_a_rebuild(manager):
+    manager.add_task('rebuilt', 'http://127.0.0.1:9/', 70)
+    claim = manager.claim_run('rebuilt', 'rebuild')
+    assert claim is not None
+    assert manager.claim_run('rebuilt', 'rebuild') is None
+    assert claim_due_run(manager.store, 'rebuilt') is None
+    assert claim.finish()
+    scheduled = manager.store.claim_run('worker-a', time.time(), 15)
+    assert scheduled is not None and scheduled['task_id'] == 'rebuilt'
+
+
+def test_rebuild_of_a_missing_task(client):
+    assert client.post('/tasks/missing/rebuild', json={}).status_code == 404
+
+
+def test_dead_claim_is_reclaimed_once(store):
+    now = time.time()
+    store.schedule_task('orphan', 'orphan.example', 0, now)
+    store.enqueue_due_runs(now)
+    dead = store.claim_run('dead', now, 1)
+    assert dead is not None and dead['attempt'] == 1
+    # Renewed leases are never taken over
+    assert store.claim_run('alive', now + 0.5, 1) is None
+    reclaimed = store.claim_run('alive', now + 2, 1)
+    assert reclaimed['run_id'] == dead['run_id'] and reclaimed['attempt'] == 2
+    # The process that lost the claim cannot record the run
+    assert not store.finish_run(dead, 'dead', now)
+    assert store.finish_run(reclaimed, 'alive', now + 2, next_due=now + 70)
+    rows = store.connection().execute('SELECT status, claimed_by FROM task_runs').fetchall()
+    assert [tuple(row) for row in rows] == [('done', 'alive')]
+
+
+def test_coordinators_never_overlap_runs(store):
+    from app.coordination import Coordinator
+    from app.scheduler import CrawlScheduler
+    lock = threading.Lock()
+    running = {}
+    overlaps = []
+    done = []
+
+    def run_task(task_id):
+        with lock:
+            running[task_id] = running.get(task_id, 0) + 1
+            if running[task_id] > 1:
+                overlaps.append(task_id)
+        time.sleep(0.02)
+        with lock:
+            running[task_id] -= 1
+            done.append(task_id)
+        # Due again at once, so every coordinator keeps competing for every task
+        return 0
+
+    now = time.time()
+    for i in range(6):
+        # No domain, so the per-domain cap does not hide a second run of a task
+        store.schedule_task(f'task-{i}', None, 0, now)
+    coordinators = []
+    for _ in range(3):
+        scheduler = CrawlScheduler(max_workers=4, name='test')
+        scheduler.start()
+        coordinator = Coordinator(store, scheduler, run_task, lease_seconds=5, poll_seconds=0.05)
+        coordinator.start()
+        coordinators.append(coordinator)
+    try:
+        wait_for(lambda: len(done) >= 60, timeout=30)
+    finally:
+        for coordinator in coordinators:
+            coordinator.stop_claiming()
+            coordinator.scheduler.shutdown()
+            coordinator.shutdown()
+    assert not overlaps
+    # Every run that started was recorded done exactly once
+    recorded = store.connection().execute("SELECT COUNT(*) FROM task_runs WHERE status = 'done'").fetchone()[0]
+    assert recorded == len(done)
@@ -0,0 +1,17 @@
+"""Fast extraction keeps the same pages as soup mode."""
+import pytest
+
+from app.crawler import parse_page
+
+
+@pytest.mark.parametrize('body', [b'', b' ', b'\r\n\t \n', b'<!-- only a comment -->', b'<html></html>'])
+def test_empty_pages_are_kept(body):
+    soup = parse_page(body, 'http://example.com/', 'utf-8', 'soup')
+    fast = parse_page(body, 'http://example.com/', 'utf-8', 'fast')
+    assert fast['title'] == soup['title'] == 'No Title'
+    for key in ('description', 'content_hash', 'canonical', 'links'):
+        assert fast[key] == soup[key]
+
+
+def test_full_text_of_empty_page():
+    assert parse_page(b'', 'http://example.com/', 'utf-8', 'fast', full_text=True)['text'] == ''
@@ -0,0 +1,72 @@
+"""The single-pass fingerprint must hash every page as the original clean_html_for_hashing did."""
+import random
+import warnings
+
+import pytest
+from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+
+from app.crawler import clean_html_for_hashing
+from benchmarks.bench_fingerprint import load_corpus, reference_clean_html_for_hashing
+
+MALFORMED = [
+    '<p>a<img src="x.png">caption</img>b</p>',
+    '<div>one<br>two</br>three</div>',
+    '<ul><li>a<br/><li>b</ul><wbr/><title>t</title>',
+    '<link><link/>text <a><span>x</span></a>',
+    '<meta/><b>kept after a void element that is removed</b>',
+    '<source><p><meta data-time="1">only volatile children</p>',
+    '<br class="x"><a>link</a></br><hr>',
+    '<p>a<?php echo 1; ?>b<?php echo 2; ?>c</p>',
+    '<?php ?><?php ?><br/><?php ?>after</br>',
+    '<?xml version="1.0"?><br href="/a"><?php echo 1; ?><br/>x<y<meta>',
+    'x<y<?xml version="1.0"?></ul>',
+    '<input>?>hello<br class="ads">hello</form><source><![CDATA[x]]>',
+]
+
+TAGS = ['div', 'p', 'img', 'br', 'span', 'a', 'hr', 'input', 'meta', 'script', 'b', 'li', 'ul', 'table', 'td',
+        'tr', 'wbr', 'source', 'link', 'form', 'title', 'head', 'body', 'html']
+ATTRS = ['class="x"', 'href="/a"', 'src="b.png"', 'data-time="1"', 'id="temp1"', 'alt="q"', 'class="ads"', 'title="t"']
+OTHER = ['<?php echo 1; ?>', '<?php ?>', '<?xml version="1.0"?>', '<!-- c -->', '<![CDATA[x]]>', '<!DOCTYPE html>',
+         '<!x>', '&amp;', '&nbsp;', '<', '>', '&']
+TEXT = ['hello', 'world. Foo', '  \n ', 'x<y', 'a & b']
+
+
+def random_document(rng):
+    """Tag soup: unbalanced tags, void elements with end tags, processing instructions, stray markup."""
+    pieces = []
+    for _ in range(rng.randint(1, 25)):
+        kind, tag = rng.random(), rng.choice(TAGS)
+        if kind < 0.35:
+            pieces.append(f'<{tag} {rng.choice(ATTRS)}>' if rng.random() < 0.5 else f'<{tag}>')
+        elif kind < 0.55:
+            pieces.append(f'</{tag}>')
+        elif kind < 0.7:
+            pieces.append(rng.choice(OTHER))
+        elif kind < 0.75:
+            pieces.append(f'<{tag}/>')
+        else:
+            pieces.append(rng.choice(TEXT))
+    return ''.join(pieces)
+
+
+def assert_same_fingerprint(html):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', XMLParsedAsHTMLWarning)
+        soup = BeautifulSoup(html, 'html.parser')
+        assert clean_html_for_hashing(soup) == reference_clean_html_for_hashing(soup), html
+
+
+def test_fixture_pages():
+    for html in load_corpus().values():
+        assert_same_fingerprint(html)
+
+
+@pytest.mark.parametrize('html', MALFORMED)
+def test_malformed_documents(html):
+    assert_same_fingerprint(html)
+
+
+def test_random_documents():
+    rng = random.Random(2024)
+    for _ in range(1000):
+        assert_same_fingerprint(random_document(rng))
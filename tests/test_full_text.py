@@ -0,0 +1,55 @@
+"""llms-full.txt: atomic replacement, and the text of pages reused from snapshots."""
+import os
+import threading
+
+import pytest
+
+from app.crawler import PageNode, parse_page
+from app.full_text import PageTextSpool, save_llms_full
+from app.snapshots import SnapshotStore
+
+PAGE = (b'<html><head><title>Guide</title><script>var tracking = 1;</script></head>'
+        b'<body><h1>Guide</h1><p>First <b>step</b>.</p><style>p { color: red }</style><p>Second step.</p></body></html>')
+
+
+def test_concurrent_writers_of_one_file(tmp_path):
+    path = str(tmp_path / 'task.txt')
+    outputs, errors = set(), []
+
+    def write(writer):
+        root = PageNode('https://example.com/', 0)
+        root.title = f'Writer {writer}'
+        with PageTextSpool() as spool:
+            spool.add(root.url, f'text of writer {writer} ' * 20000)
+            outputs.add(f'# {root.title}\nSource: {root.url}\n\n{spool.get(root.url)}\n\n')
+            try:
+                for _ in range(10):
+                    save_llms_full(path, root, spool)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    with open(path, encoding='utf-8') as f:
+        assert f.read() in outputs
+    assert os.listdir(tmp_path) == ['task.txt']
+
+
+@pytest.mark.parametrize('mode', ['soup', 'fast'])
+def test_snapshot_pages_read_like_downloaded_ones(tmp_path, mode):
+    crawled = parse_page(PAGE, 'https://example.com/', mode=mode, full_text=True)
+    store = SnapshotStore(str(tmp_path / 'snapshots'))
+    store.put(crawled['content_hash'], PAGE)
+    root = PageNode('https://example.com/', 0)
+    root.update(crawled['title'], crawled['description'])
+    root.content_hash = crawled['content_hash']
+    path = str(tmp_path / 'full.txt')
+    with PageTextSpool() as spool:
+        # Nothing spooled: the page was reused without a download
+        assert save_llms_full(path, root, spool, store, mode) == 1
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == f"# Guide\nSource: https://example.com/\n\n{crawled['text']}\n\n"
@@ -0,0 +1,27 @@
+"""Sections of llms.txt reused from the previous run."""
+from app.crawler import PageNode, render_markdown_incremental
+
+
+def crawled_tree(description):
+    root = PageNode('https://site.example/', 0)
+    root.update('Site', 'The site')
+    root.content_hash = 'root'
+    page = PageNode('https://site.example/docs', 1)
+    page.update('Docs', description)
+    # The fingerprint leaves out <meta>, so a new description keeps the content hash
+    page.content_hash = 'docs'
+    root.add_child(page)
+    return root
+
+
+def test_unchanged_sections_are_reused():
+    _, sections, _ = render_markdown_incremental(crawled_tree('Old desc'))
+    markdown, _, rerendered = render_markdown_incremental(crawled_tree('Old desc'), sections)
+    assert rerendered == 0 and 'Old desc' in markdown
+
+
+def test_description_change_rerenders_its_section():
+    _, sections, _ = render_markdown_incremental(crawled_tree('Old desc'))
+    markdown, _, rerendered = render_markdown_incremental(crawled_tree('New desc'), sections)
+    assert rerendered == 1
+    assert 'New desc' in markdown and 'Old desc' not in markdown
@@ -0,0 +1,83 @@
+"""Background jobs, read from the process running them or from another one sharing the database."""
+import threading
+
+import pytest
+
+from app.jobs import JobManager, StoredJob
+from app.store import TaskStore
+
+
+@pytest.fixture
+def managers(store):
+    """Job managers of two server processes sharing one task database."""
+    running = JobManager(store=store)
+    other = JobManager(store=TaskStore(store.path))
+    yield running, other
+    running.shutdown()
+    other.shutdown()
+
+
+def crawl_job(job, release, path):
+    job.page({'url': 'https://example.com/'})
+    job.add_file(path)
+    release.wait(10)
+    job.set_output('output1', '# Example')
+
+
+def test_job_followed_from_another_process(managers, tmp_path):
+    running, other = managers
+    release = threading.Event()
+    path = str(tmp_path / 'full.txt')
+    job = running.submit(crawl_job, release, path)
+
+    seen = other.get(job.job_id)
+    assert isinstance(seen, StoredJob)
+    first = seen.wait_events(0, timeout=5)
+    assert [event['type'] for event in first] == ['page']
+    assert seen.files == [path] and not seen.done
+    # Nothing new yet: the poll waits out its timeout
+    assert seen.wait_events(1, timeout=0.3) == []
+
+    release.set()
+    stream = ''.join(seen.sse_stream(after=1))
+    assert 'event: output' in stream and stream.endswith('"error": null}\n\n')
+    state = other.get(job.job_id).to_dict()
+    assert state['status'] == 'completed' and state['pages'] == 1
+    assert state['outputs'] == {'output1': '# Example'} and state['last_event'] == 3
+
+
+def test_finished_job_stream_ends_on_reconnect(managers):
+    running, other = managers
+    job = running.submit(lambda job: None)
+    job.wait_events(0, timeout=5)
+    for manager in managers:
+        assert list(manager.get(job.job_id).sse_stream(after=job.last_event)) == []
+
+
+def test_unknown_and_expired_jobs(managers, tmp_path):
+    running, other = managers
+    assert other.get('missing') is None
+    path = tmp_path / 'full.txt'
+    path.write_text('text')
+    job = running.submit(lambda job: job.add_file(str(path)))
+    job.wait_events(0, timeout=5)
+    running.ttl_seconds = other.ttl_seconds = -1
+    # Any process prunes the jobs of every process, with their files
+    other._prune()
+    assert other.get(job.job_id) is None and not path.exists()
+
+
+def test_event_stream_resumes_after_last_event_id(managers, monkeypatch):
+    from flask import Flask
+    import run
+    running, _ = managers
+    monkeypatch.setattr(run, 'job_manager', running)
+    app = Flask(__name__)
+    app.register_blueprint(run.bp)
+    client = app.test_client()
+    job = running.submit(lambda job: job.page({'url': 'https://example.com/'}))
+    job.wait_events(1, timeout=5)
+    url = f'/jobs/{job.job_id}/events'
+    assert client.get(url, headers={'Last-Event-ID': 'garbage'}).status_code == 400
+    body = client.get(url, headers={'Last-Event-ID': '1'}).get_data(as_text=True)
+    assert body.startswith('id: 2\nevent: done\n')
@@ -0,0 +1,31 @@
+"""The snapshot store's byte budget holds across every process sharing it."""
+import os
+
+from app.snapshots import SnapshotStore
+
+
+def stored_sizes(store):
+    return store._conn.execute('SELECT COALESCE(SUM(stored_size), 0) FROM page_bodies').fetchone()[0]
+
+
+def test_budget_is_shared_by_stores_on_one_directory(tmp_path):
+    # Two stores on one directory stand for two server processes
+    first, second = SnapshotStore(str(tmp_path), max_bytes=20000), SnapshotStore(str(tmp_path), max_bytes=20000)
+    for i in range(200):
+        store = first if i % 2 else second
+        store.put(f'{i:064x}', os.urandom(1000))
+        assert store.stats()['stored_bytes'] == stored_sizes(store) <= 20000
+    assert first.stats()['stored_bytes'] == second.stats()['stored_bytes']
+    blobs = [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith('.gz')]
+    assert len(blobs) == first.stats()['entries']
+    assert first.evictions + second.evictions == 200 - len(blobs)
+
+
+def test_total_of_an_existing_store(tmp_path):
+    store = SnapshotStore(str(tmp_path), max_bytes=10 ** 9)
+    for i in range(10):
+        store.put(f'{i:064x}', os.urandom(500))
+    store._conn.execute('DROP TABLE page_bodies_total')
+    store._conn.commit()
+    # Stores from before the shared total existed get it computed when opened
+    assert SnapshotStore(str(tmp_path)).stats()['stored_bytes'] == stored_sizes(store) > 5000
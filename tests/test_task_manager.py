@@ -0,0 +1,58 @@
+"""Scheduled tasks and their stored crawl state."""
+import os
+import threading
+import time
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def stored_rows(store, task_id):
+    conn = store.connection()
+    return {table: conn.execute(f'SELECT COUNT(*) FROM {table} WHERE task_id = ?', (task_id,)).fetchone()[0]
+            for table in ('tasks', 'task_results', 'task_sections', 'url_state', 'task_schedule', 'task_runs')}
+
+
+def test_run_stores_crawl_state(manager, slow_site):
+    task = manager.add_task('kept', slow_site.url, 70, max_pages=12, full_text=True)
+    task.run()
+    rows = stored_rows(manager.store, 'kept')
+    assert rows['url_state'] == 12 and rows['task_results'] == 1 and rows['task_sections'] == 1
+    assert os.path.exists(task.full_text_path)
+
+
+def test_task_deleted_during_run_leaves_nothing(manager, slow_site):
+    task = manager.add_task('deleted', slow_site.url, 70, max_pages=12, full_text=True)
+    path = task.full_text_path
+    run = threading.Thread(target=task.run)
+    run.start()
+    wait_for(lambda: slow_site.root_requests > 0)
+    manager.remove_task('deleted')
+    run.join()
+    assert slow_site.requests_served > 1, 'the crawl went on after the task was deleted'
+    assert set(stored_rows(manager.store, 'deleted').values()) == {0}
+    assert not os.path.exists(path)
+
+
+def test_finished_run_refreshes_only_its_task_elsewhere(manager):
+    import run
+    from app.store import TaskStore
+    other = run.TaskManager(store=TaskStore(manager.store.path), run_scheduler=False)
+    try:
+        task = manager.add_task('ran', 'http://127.0.0.1:9/', 70)
+        manager.add_task('idle', 'http://127.0.0.1:9/', 70)
+        seen = other.get_task('ran')
+        idle = other.get_task('idle')
+        tasks_version = manager.store.versions()[0]
+        task.update_last_run('completed')
+        assert manager.store.versions()[0] == tasks_version
+        # The other process keeps its task objects and picks up the new status
+        assert other.get_task('ran') is seen and other.get_task('idle') is idle
+        assert seen.last_status == 'completed' and seen.time_last_run == task.time_last_run
+        assert idle.last_status == 'pending'
+    finally:
+        other.shutdown()
@@ -0,0 +1,33 @@
+"""Avoid rules are validated before they are compiled or run against URLs."""
+import pytest
+
+from app.url_rules import InvalidRuleError, compile_avoid_rules, validate_rule
+
+
+@pytest.mark.parametrize('rule', ['re:(', 're:a{10000000000}', 're:(a+)+$', 're:^(\\w+\\s?)*$', 're:(a|aa)*',
+                                  're:(.*a){20}', 're:(?=(a+)+)b', 're:' + 'x' * 300])
+def test_rejected_rules(rule):
+    with pytest.raises(InvalidRuleError) as error:
+        validate_rule(rule)
+    assert error.value.rule == rule
+
+
+@pytest.mark.parametrize('rule', ['/careers', 'glob:*/tag/*', 're:/page/\\d+$', 're:/(en|fr)/', 're:(ab){2,5}'])
+def test_accepted_rules(rule):
+    validate_rule(rule)
+
+
+def test_regex_rules_can_be_disabled():
+    validate_rule('glob:*.pdf', allow_regex=False)
+    with pytest.raises(InvalidRuleError):
+        validate_rule('re:\\.pdf$', allow_regex=False)
+
+
+def test_matchers_are_shared_by_rule_list():
+    matcher = compile_avoid_rules(['/careers', 're:/page/\\d+$'])
+    assert compile_avoid_rules(['/careers', 're:/page/\\d+$']) is matcher
+    assert matcher.matches('https://example.com/page/3')
+    assert matcher.matches('https://example.com/careers/jobs')
+    assert not matcher.matches('https://example.com/docs')
+    with pytest.raises(InvalidRuleError):
+        compile_avoid_rules(['re:('])